@@ -0,0 +1,767 @@
+"""
+Замер скорости стадий ETL фильмов.
+
+transform: исходный путь (строка -> DTO -> pydantic -> model_dump),
+быстрый путь (строка -> dict) и быстрый путь в пуле процессов.
+extract: полная выгрузка фильмов запросом с jsonb_agg против COPY плоских
+таблиц с группировкой в памяти; нужен Postgres с данными.
+seed: синтетический каталог в схеме content заданного размера; популярность
+персон распределена с тяжёлым хвостом, как в реальных фильмографиях.
+cycle: полный и инкрементальный циклы run_once на каталоге из seed с отчётом
+о docs/sec, пиковом RSS и времени стадий; Elasticsearch можно заменить
+встроенной заглушкой bulk API (--fake-es), а синхронный цикл —
+асинхронным конвейером etl.aio (--async).
+
+Запуск из каталога etl с PYTHONPATH=src (в образе ETL он уже задан):
+        python benchmarks/benchmark.py [transform] [--docs N] [--workers N]
+        python benchmarks/benchmark.py extract [--chunk-size N]
+        python benchmarks/benchmark.py seed [--films N] [--persons N] [--genres N]
+                                            [--reset]
+        python benchmarks/benchmark.py cycle [--fake-es] [--async]
+                                             [--touch-films N] [--touch-persons N]
+
+seed и cycle пишут в базу из DBSettings — запускать на отдельной базе.
+"""
+
+import argparse
+import asyncio
+import bisect
+import csv
+import datetime
+import io
+import itertools
+import json
+import logging
+import random
+import resource
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import psycopg2.extras
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from etl.aio.extractor import create_pg_pool
+from etl.aio.loader import AsyncElasticsearchLoader
+from etl.aio.pipeline import run_once as run_once_async
+from etl.db.connection import create_pg_connection
+from etl.db.exporter import PostgresBulkExporter
+from etl.db.extractor import PostgresExtractor, film_work_from_row
+from etl.db.pool import PostgresConnectionPool
+from etl.db.settings import DBSettings
+from etl.es.loader import ElasticsearchLoader
+from etl.es.settings import EsSettings
+from etl.main import run_once
+from etl.metrics import DOCUMENTS_LOADED, STAGE_SECONDS
+from etl.state.state import State
+from etl.state.storage import JsonFileStorage
+from etl.transformer.film_work import (
+    film_work_row_to_document,
+    film_work_rows_to_documents,
+    transform_film_work,
+)
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
+from psycopg2.extensions import connection as PgConnection
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("actor", "director", "writer")
+
+CONTENT_SCHEMA_SQL = """
+    CREATE SCHEMA IF NOT EXISTS content;
+
+    CREATE TABLE IF NOT EXISTS content.film_work (
+        id uuid PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT,
+        creation_date DATE,
+        rating FLOAT,
+        type TEXT NOT NULL,
+        created_at timestamp with time zone DEFAULT NOW(),
+        updated_at timestamp with time zone DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_film_work_updated_at
+        ON content.film_work (updated_at, id);
+
+    CREATE TABLE IF NOT EXISTS content.genre (
+        id uuid PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        created_at timestamp with time zone DEFAULT NOW(),
+        updated_at timestamp with time zone DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_genre_updated_at
+        ON content.genre (updated_at, id);
+
+    CREATE TABLE IF NOT EXISTS content.person (
+        id uuid PRIMARY KEY,
+        full_name TEXT NOT NULL,
+        created_at timestamp with time zone DEFAULT NOW(),
+        updated_at timestamp with time zone DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_person_updated_at
+        ON content.person (updated_at, id);
+
+    CREATE TABLE IF NOT EXISTS content.genre_film_work (
+        id uuid PRIMARY KEY,
+        genre_id uuid NOT NULL REFERENCES content.genre (id) ON DELETE CASCADE,
+        film_work_id uuid NOT NULL
+            REFERENCES content.film_work (id) ON DELETE CASCADE,
+        created_at timestamp with time zone DEFAULT NOW(),
+        updated_at timestamp with time zone DEFAULT NOW(),
+        UNIQUE (genre_id, film_work_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_genre_film_work_film_work_id
+        ON content.genre_film_work (film_work_id);
+    CREATE INDEX IF NOT EXISTS idx_genre_film_work_genre_id
+        ON content.genre_film_work (genre_id);
+    CREATE INDEX IF NOT EXISTS idx_genre_film_work_updated_at
+        ON content.genre_film_work (updated_at, id);
+
+    CREATE TABLE IF NOT EXISTS content.person_film_work (
+        id uuid PRIMARY KEY,
+        person_id uuid NOT NULL REFERENCES content.person (id) ON DELETE CASCADE,
+        film_work_id uuid NOT NULL
+            REFERENCES content.film_work (id) ON DELETE CASCADE,
+        role TEXT NOT NULL,
+        created_at timestamp with time zone DEFAULT NOW(),
+        updated_at timestamp with time zone DEFAULT NOW(),
+        UNIQUE (person_id, film_work_id, role)
+    );
+    CREATE INDEX IF NOT EXISTS idx_person_film_work_film_work_id
+        ON content.person_film_work (film_work_id);
+    CREATE INDEX IF NOT EXISTS idx_person_film_work_updated_at
+        ON content.person_film_work (updated_at, id);
+"""
+
+# состав фильма: (роль, минимум, максимум)
+CAST_SIZES = (("director", 1, 2), ("writer", 1, 4), ("actor", 3, 20))
+SEED_CHUNK_SIZE = 10_000
+
+
+def make_film_work_rows(count: int, seed: int = 0) -> list[dict]:
+    # строки в том виде, в каком их отдаёт FILM_WORK_FOR_INDEX_SQL
+    rnd = random.Random(seed)
+    genres = [
+        {"id": str(uuid.UUID(int=rnd.getrandbits(128))), "name": f"Genre {i}"}
+        for i in range(30)
+    ]
+    persons = [str(uuid.UUID(int=rnd.getrandbits(128))) for _ in range(5000)]
+
+    rows = []
+    for i in range(count):
+        rows.append(
+            {
+                "id": uuid.UUID(int=rnd.getrandbits(128)),
+                "title": f"Film {i}",
+                "rating": round(rnd.uniform(1, 10), 1),
+                "description": "Lorem ipsum dolor sit amet " * 8,
+                "updated_at": datetime.datetime(2024, 1, 1),
+                "creation_date": datetime.date(2000 + i % 25, 1, 1),
+                "genres": rnd.sample(genres, 3),
+                "persons": [
+                    {
+                        "id": person_id,
+                        "full_name": f"Person {person_id[:8]}",
+                        "role": rnd.choice(ROLES),
+                    }
+                    for person_id in rnd.sample(persons, 12)
+                ],
+            },
+        )
+    return rows
+
+
+def pydantic_path(rows: list[dict]) -> list[dict]:
+    return [
+        transform_film_work(film_work_from_row(row)).model_dump(mode="json")
+        for row in rows
+    ]
+
+
+def fast_path(rows: list[dict]) -> list[dict]:
+    return [film_work_row_to_document(row) for row in rows]
+
+
+def measure(name: str, transform: Callable[[list[dict]], list[dict]], rows) -> float:
+    started = time.perf_counter()
+    documents = transform(rows)
+    elapsed = time.perf_counter() - started
+    rate = len(documents) / elapsed
+    logger.info(
+        "%-22s %8d docs %8.2fs %10.0f docs/sec", name, len(documents), elapsed, rate
+    )
+    return rate
+
+
+def benchmark_transform(args: argparse.Namespace) -> None:
+    rows = make_film_work_rows(args.docs)
+
+    # результат быстрого пути обязан совпадать с эталонным
+    sample = rows[:100]
+    if fast_path(sample) != pydantic_path(sample):
+        raise SystemExit("fast path documents differ from FilmEsDocument dump")
+
+    baseline = measure("pydantic", pydantic_path, rows)
+    fast = measure("fast path", fast_path, rows)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+
+        def pool_path(rows: list[dict]) -> list[dict]:
+            chunks = [
+                rows[start : start + args.chunk_size]
+                for start in range(0, len(rows), args.chunk_size)
+            ]
+            return [
+                document
+                for documents in pool.map(film_work_rows_to_documents, chunks)
+                for document in documents
+            ]
+
+        pool_path(rows[: args.chunk_size])  # прогрев процессов
+        pooled = measure(f"fast path x{args.workers} procs", pool_path, rows)
+
+    logger.info(
+        "speedup vs pydantic: fast path %.1fx, process pool %.1fx",
+        fast / baseline,
+        pooled / baseline,
+    )
+
+
+def benchmark_extract(args: argparse.Namespace) -> None:
+    # нужна база, например из postgres/database_dump.sql
+    conn = create_pg_connection(settings=DBSettings())
+    psycopg2.extras.register_uuid(conn_or_curs=conn)
+    conn.set_session(
+        isolation_level=ISOLATION_LEVEL_REPEATABLE_READ,
+        readonly=True,
+    )
+    try:
+        extractor = PostgresExtractor(connection=conn, itersize=args.chunk_size)
+
+        def query_path(_) -> list[dict]:
+            return [
+                film_work_row_to_document(row)
+                for film_work_ids in extractor.iter_all_film_work_ids()
+                for row in extractor.fetch_film_work_rows(film_work_ids)
+            ]
+
+        def copy_path(_) -> list[dict]:
+            exporter = PostgresBulkExporter(connection=conn)
+            return [
+                film_work_row_to_document(row)
+                for rows in exporter.iter_film_work_rows(chunk_size=args.chunk_size)
+                for row in rows
+            ]
+
+        by_id = {doc["id"]: doc for doc in query_path(None)}
+        if by_id != {doc["id"]: doc for doc in copy_path(None)}:
+            raise SystemExit("COPY export documents differ from query documents")
+
+        baseline = measure("jsonb_agg query", query_path, None)
+        copied = measure("COPY + in-memory join", copy_path, None)
+        logger.info("speedup vs query: %.1fx", copied / baseline)
+    finally:
+        conn.close()
+
+
+class CatalogueGenerator:
+    """
+    Синтетический каталог для замеров ETL. Персоны выбираются с весами
+    из распределения Парето: немногие снимаются в сотнях фильмов,
+    большинство в нескольких, поэтому правка персоны даёт реалистичный
+    фан-аут на фильмы.
+    """
+
+    def __init__(
+        self,
+        films: int,
+        persons: int,
+        genres: int,
+        seed: int = 0,
+    ) -> None:
+        self.films = films
+        self.rnd = random.Random(seed)
+        self.genre_ids = [self._uuid() for _ in range(genres)]
+        self.person_ids = [self._uuid() for _ in range(persons)]
+        # популярность персон с тяжёлым хвостом: у самых востребованных
+        # фильмов на порядки больше, чем у среднего актёра
+        self._person_weights = list(
+            itertools.accumulate(self.rnd.paretovariate(2.0) for _ in range(persons)),
+        )
+        # данные «старые»: изменения из cycle всегда свежее водяных знаков
+        self.base_time = datetime.datetime.now(datetime.timezone.utc).replace(
+            microsecond=0,
+        ) - datetime.timedelta(days=365)
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rnd.getrandbits(128), version=4))
+
+    def _timestamp(self) -> str:
+        offset = datetime.timedelta(seconds=self.rnd.randrange(300 * 24 * 3600))
+        return (self.base_time + offset).isoformat()
+
+    def _person(self) -> str:
+        point = self.rnd.random() * self._person_weights[-1]
+        return self.person_ids[bisect.bisect_left(self._person_weights, point)]
+
+    def genre_rows(self) -> list[tuple]:
+        return [
+            (genre_id, f"Genre {i}", self._timestamp())
+            for i, genre_id in enumerate(self.genre_ids)
+        ]
+
+    def person_rows(self) -> list[tuple]:
+        return [
+            (person_id, f"Person {i}", self._timestamp())
+            for i, person_id in enumerate(self.person_ids)
+        ]
+
+    def iter_film_chunks(self, chunk_size: int = SEED_CHUNK_SIZE):
+        # фильмы со связями пачками: каталог не держится в памяти целиком
+        for start in range(0, self.films, chunk_size):
+            films, genre_links, person_links = [], [], []
+            for i in range(start, min(start + chunk_size, self.films)):
+                film_id = self._uuid()
+                films.append(
+                    (
+                        film_id,
+                        f"Film {i}",
+                        "Lorem ipsum dolor sit amet " * self.rnd.randint(0, 12),
+                        datetime.date(1950 + i % 75, 1, 1).isoformat(),
+                        round(self.rnd.uniform(1, 10), 1),
+                        "movie",
+                        self._timestamp(),
+                    ),
+                )
+                for genre_id in self.rnd.sample(
+                    self.genre_ids,
+                    min(self.rnd.randint(1, 4), len(self.genre_ids)),
+                ):
+                    genre_links.append(
+                        (self._uuid(), genre_id, film_id, self._timestamp()),
+                    )
+                cast = {
+                    (self._person(), role)
+                    for role, low, high in CAST_SIZES
+                    for _ in range(self.rnd.randint(low, high))
+                }
+                for person_id, role in cast:
+                    person_links.append(
+                        (self._uuid(), person_id, film_id, role, self._timestamp()),
+                    )
+            yield films, genre_links, person_links
+
+
+def copy_rows(conn: PgConnection, table: str, columns: str, rows: list[tuple]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        ["\\N" if value is None else value for value in row] for row in rows
+    )
+    buffer.seek(0)
+    with conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+
+def benchmark_seed(args: argparse.Namespace) -> None:
+    generator = CatalogueGenerator(
+        films=args.films,
+        persons=args.persons,
+        genres=args.genres,
+        seed=args.seed,
+    )
+    conn = create_pg_connection(settings=DBSettings())
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(CONTENT_SCHEMA_SQL)
+            if args.reset:
+                cur.execute(
+                    "TRUNCATE content.film_work, content.genre, content.person "
+                    "CASCADE;",
+                )
+            started = time.perf_counter()
+            copy_rows(
+                conn,
+                "content.genre",
+                "id, name, updated_at",
+                generator.genre_rows(),
+            )
+            copy_rows(
+                conn,
+                "content.person",
+                "id, full_name, updated_at",
+                generator.person_rows(),
+            )
+            links = 0
+            for films, genre_links, person_links in generator.iter_film_chunks():
+                copy_rows(
+                    conn,
+                    "content.film_work",
+                    "id, title, description, creation_date, rating, type, updated_at",
+                    films,
+                )
+                copy_rows(
+                    conn,
+                    "content.genre_film_work",
+                    "id, genre_id, film_work_id, updated_at",
+                    genre_links,
+                )
+                copy_rows(
+                    conn,
+                    "content.person_film_work",
+                    "id, person_id, film_work_id, role, updated_at",
+                    person_links,
+                )
+                links += len(genre_links) + len(person_links)
+            cur.execute("ANALYZE;")
+    finally:
+        conn.close()
+
+    logger.info(
+        "Seeded %d films, %d persons, %d genres, %d links in %.1fs",
+        args.films,
+        args.persons,
+        args.genres,
+        links,
+        time.perf_counter() - started,
+    )
+
+
+class FakeBulkHandler(BaseHTTPRequestHandler):
+    # отвечает как Elasticsearch 8 на запросы, которые делает загрузчик ETL:
+    # проверка и создание индекса, _bulk; документы только считаются
+    server: "FakeBulkServer"
+
+    def _reply(self, status: int, body: dict | None = None) -> None:
+        payload = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+    def _index_name(self) -> str:
+        return self.path.split("?")[0].strip("/").split("/")[0]
+
+    def do_HEAD(self) -> None:
+        exists = self._index_name() in self.server.indices
+        self._reply(200 if exists else 404)
+
+    def do_PUT(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self._is_bulk():
+            self._bulk(body)
+            return
+
+        index_name = self._index_name()
+        self.server.indices.add(index_name)
+        self._reply(200, {"acknowledged": True, "index": index_name})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self._is_bulk():
+            self._bulk(body)
+            return
+
+        self._reply(200, {"acknowledged": True})
+
+    def do_DELETE(self) -> None:
+        self.server.indices.discard(self._index_name())
+        self._reply(200, {"acknowledged": True})
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0].endswith("/_mapping"):
+            self._reply(200, {self._index_name(): {"mappings": {}}})
+            return
+
+        self._reply(200, {"version": {"number": "8.13.2"}})
+
+    def _is_bulk(self) -> bool:
+        return self.path.split("?")[0].endswith("/_bulk")
+
+    def _bulk(self, body: bytes) -> None:
+        lines = [line for line in body.splitlines() if line]
+        items = []
+        # index и update всегда идут парой строк: действие и документ
+        for line in lines[::2]:
+            ((op_type, meta),) = json.loads(line).items()
+            meta = {"_index": meta["_index"], "_id": meta["_id"], "status": 200}
+            items.append({op_type: meta})
+        self.server.record(documents=len(items), size=len(body))
+        self._reply(200, {"took": 0, "errors": False, "items": items})
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class FakeBulkServer(ThreadingHTTPServer):
+    """
+    Заглушка Elasticsearch для замеров без кластера: отделяет стоимость
+    извлечения и трансформации от стоимости индексации.
+    """
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeBulkHandler)
+        self.indices: set[str] = set()
+        self.documents = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, documents: int, size: int) -> None:
+        with self._lock:
+            self.documents += documents
+            self.bytes += size
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+def stage_totals() -> dict[tuple[str, str], tuple[float, float]]:
+    # (index, stage) -> (секунды, число замеров) из гистограммы метрик
+    totals: dict[tuple[str, str], list[float]] = {}
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith(("_sum", "_count")):
+                key = (sample.labels["index"], sample.labels["stage"])
+                total = totals.setdefault(key, [0.0, 0.0])
+                total[0 if sample.name.endswith("_sum") else 1] = sample.value
+    return {key: (value[0], value[1]) for key, value in totals.items()}
+
+
+def documents_loaded() -> float:
+    return sum(
+        sample.value
+        for metric in DOCUMENTS_LOADED.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    )
+
+
+def touch_content(conn: PgConnection, films: int, persons: int) -> None:
+    # правки из админки: обновлённые персоны затрагивают все свои фильмы
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE content.film_work SET updated_at = now()
+            WHERE id IN (
+                SELECT id FROM content.film_work ORDER BY random() LIMIT %s
+            );
+            """,
+            (films,),
+        )
+        cur.execute(
+            """
+            UPDATE content.person SET updated_at = now()
+            WHERE id IN (
+                SELECT id FROM content.person ORDER BY random() LIMIT %s
+            );
+            """,
+            (persons,),
+        )
+
+
+def report_cycle(
+    name: str,
+    elapsed: float,
+    documents: float,
+    stages: dict[tuple[str, str], tuple[float, float]],
+) -> None:
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(
+        "%-12s %8.0f docs %8.2fs %10.0f docs/sec  peak RSS %.0f MB",
+        name,
+        documents,
+        elapsed,
+        documents / elapsed if elapsed else 0,
+        peak_rss_mb,
+    )
+    for (index_name, stage), (seconds, count) in sorted(stages.items()):
+        if count:
+            logger.info(
+                "    %-20s %-10s %8.2fs total %8.1fms avg over %d",
+                index_name,
+                stage,
+                seconds,
+                seconds / count * 1000,
+                count,
+            )
+
+
+def run_cycle(name: str, cycle: Callable[[], None]) -> None:
+    stages_before = stage_totals()
+    documents_before = documents_loaded()
+    started = time.perf_counter()
+    cycle()
+    elapsed = time.perf_counter() - started
+
+    stages = {}
+    for key, (seconds, count) in stage_totals().items():
+        seconds_before, count_before = stages_before.get(key, (0.0, 0.0))
+        stages[key] = (seconds - seconds_before, count - count_before)
+    report_cycle(name, elapsed, documents_loaded() - documents_before, stages)
+
+
+def benchmark_cycle(args: argparse.Namespace) -> None:
+    db_settings = DBSettings()
+
+    fake_es = None
+    if args.fake_es:
+        fake_es = FakeBulkServer()
+        fake_es.start()
+        es_url = fake_es.url
+    else:
+        es_settings = EsSettings()
+        es_url = f"http://{es_settings.ES_HOST}:{es_settings.ES_PORT}"
+
+    # отдельные индексы, чтобы не трогать рабочие
+    index_names = {
+        "movies_index_name": f"{args.index_prefix}_movies",
+        "genres_index_name": f"{args.index_prefix}_genres",
+        "persons_index_name": f"{args.index_prefix}_persons",
+    }
+    loader = ElasticsearchLoader(
+        client=Elasticsearch(es_url),
+        chunk_size=args.bulk_chunk_size,
+        **index_names,
+    )
+    for index_name in index_names.values():
+        loader.delete_index(index_name=index_name)
+
+    pool = PostgresConnectionPool(settings=db_settings)
+    # один цикл событий на все прогоны: пул asyncpg и клиент ES
+    # привязаны к циклу, в котором созданы
+    with (
+        tempfile.TemporaryDirectory() as state_dir,
+        asyncio.Runner() as runner,
+    ):
+        state = State(storage=JsonFileStorage(str(Path(state_dir) / "state.json")))
+
+        async_loader = None
+        async_pool = None
+        if args.async_mode:
+            async_loader = AsyncElasticsearchLoader(
+                client=AsyncElasticsearch(es_url),
+                chunk_size=args.bulk_chunk_size,
+                **index_names,
+            )
+            async_pool = runner.run(create_pg_pool(settings=db_settings))
+
+        def cycle() -> None:
+            if args.async_mode:
+                runner.run(
+                    run_once_async(
+                        state=state,
+                        loader=async_loader,
+                        pool=async_pool,
+                        itersize=db_settings.POSTGRES_ITERSIZE,
+                        queue_size=args.queue_size,
+                    )
+                )
+                return
+            run_once(
+                state=state,
+                loader=loader,
+                pool=pool,
+                itersize=db_settings.POSTGRES_ITERSIZE,
+            )
+
+        try:
+            run_cycle("full", cycle)
+            for i in range(args.incremental_cycles):
+                with pool.connection() as conn:
+                    touch_content(
+                        conn,
+                        films=args.touch_films,
+                        persons=args.touch_persons,
+                    )
+                run_cycle(f"incremental {i + 1}", cycle)
+        finally:
+            pool.close()
+            if async_pool is not None:
+                runner.run(async_pool.close())
+            if async_loader is not None:
+                runner.run(async_loader.close())
+
+    if fake_es is not None:
+        logger.info(
+            "fake bulk endpoint received %d documents, %.1f MB",
+            fake_es.documents,
+            fake_es.bytes / 1024 / 1024,
+        )
+        fake_es.shutdown()
+
+
+def main() -> None:
+    # etl.main настраивает логирование при импорте; здесь важен только отчёт
+    logging.basicConfig(level=logging.INFO, format="%(message)s", force=True)
+    logging.getLogger("etl").setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    parser = argparse.ArgumentParser(description="ETL stage benchmark")
+    parser.add_argument(
+        "stage",
+        nargs="?",
+        choices=("transform", "extract", "seed", "cycle"),
+        default="transform",
+    )
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=250)
+
+    parser.add_argument("--films", type=int, default=100_000)
+    parser.add_argument("--persons", type=int, default=50_000)
+    parser.add_argument("--genres", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="truncate content tables before seeding",
+    )
+
+    parser.add_argument(
+        "--fake-es",
+        action="store_true",
+        help="send bulk requests to an in-process stub instead of ES",
+    )
+    parser.add_argument("--index-prefix", default="bench")
+    parser.add_argument("--bulk-chunk-size", type=int, default=500)
+    parser.add_argument("--incremental-cycles", type=int, default=3)
+    parser.add_argument("--touch-films", type=int, default=1000)
+    parser.add_argument("--touch-persons", type=int, default=100)
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="run cycles through the asyncio pipeline",
+    )
+    parser.add_argument("--queue-size", type=int, default=4)
+    args = parser.parse_args()
+
+    stages = {
+        "transform": benchmark_transform,
+        "extract": benchmark_extract,
+        "seed": benchmark_seed,
+        "cycle": benchmark_cycle,
+    }
+    stages[args.stage](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import json
+import logging
+import re
+import uuid
+from collections.abc import AsyncIterator
+
+import asyncpg
+
+from etl.db.extractor import (
+    CHANGE_FEED_SQL,
+    CHANGE_SOURCES,
+    CHANGED_GENRES_SQL,
+    CHANGED_PERSONS_SQL,
+    FILM_WORK_FOR_INDEX_SQL,
+    PERSON_FILMS_SQL,
+    PERSON_IDS_BY_FILM_LINKS_SQL,
+    PERSONS_BY_IDS_SQL,
+    ChangeFeedPage,
+)
+from etl.db.settings import DBSettings
+from etl.dto.dto import GenreDTO, PersonDTO, PersonFilmDTO, Watermark
+
+logger = logging.getLogger(__name__)
+
+PARAM_RE = re.compile(r"%\((\w+)\)s|%s")
+
+KEYSET_TYPES = {"ts": "timestamptz", "id": "uuid", "limit": "int"}
+CHANGE_FEED_TYPES = {
+    "limit": "int",
+    **{f"{source}_ts": "timestamptz" for source in CHANGE_SOURCES},
+    **{f"{source}_id": "uuid" for source in CHANGE_SOURCES},
+}
+
+
+def to_asyncpg_sql(
+    sql: str,
+    types: dict[str, str] | None = None,
+) -> tuple[str, list[str]]:
+    # запросы синхронного экстрактора переводятся из %(name)s / %s в $n;
+    # тип параметра указывается явно: по "$1 IS NULL" postgres его не выводит
+    types = types or {}
+    names: list[str] = []
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name is None:
+            # позиционный %s
+            names.append(str(len(names)))
+            return f"${len(names)}"
+        if name not in names:
+            names.append(name)
+        position = names.index(name) + 1
+        cast = types.get(name)
+        return f"${position}::{cast}" if cast else f"${position}"
+
+    return PARAM_RE.sub(replace, sql), names
+
+
+CHANGE_FEED_QUERY = to_asyncpg_sql(CHANGE_FEED_SQL, CHANGE_FEED_TYPES)
+CHANGED_GENRES_QUERY = to_asyncpg_sql(CHANGED_GENRES_SQL, KEYSET_TYPES)
+CHANGED_PERSONS_QUERY = to_asyncpg_sql(CHANGED_PERSONS_SQL, KEYSET_TYPES)
+PERSON_IDS_BY_FILM_LINKS_QUERY = to_asyncpg_sql(
+    PERSON_IDS_BY_FILM_LINKS_SQL,
+    KEYSET_TYPES,
+)
+FILM_WORK_FOR_INDEX_QUERY, _ = to_asyncpg_sql(FILM_WORK_FOR_INDEX_SQL)
+PERSON_FILMS_QUERY, _ = to_asyncpg_sql(PERSON_FILMS_SQL)
+PERSONS_BY_IDS_QUERY, _ = to_asyncpg_sql(PERSONS_BY_IDS_SQL)
+
+
+async def init_connection(conn: asyncpg.Connection) -> None:
+    # jsonb приходит строкой; трансформеры ждут того же, что отдаёт psycopg2
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=json.dumps,
+        decoder=json.loads,
+        schema="pg_catalog",
+    )
+
+
+async def create_pg_pool(settings: DBSettings) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        host=settings.POSTGRES_HOST,
+        port=settings.POSTGRES_PORT,
+        database=settings.POSTGRES_DB,
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        min_size=settings.POSTGRES_POOL_MIN_SIZE,
+        max_size=settings.POSTGRES_POOL_MAX_SIZE,
+        timeout=5,
+        init=init_connection,
+    )
+
+
+class AsyncPostgresExtractor:
+    """
+    Асинхронный вариант PostgresExtractor поверх asyncpg: те же запросы
+    и водяные знаки, но ожидание базы не блокирует загрузку в Elasticsearch.
+    """
+
+    def __init__(self, connection: asyncpg.Connection, itersize: int = 1000) -> None:
+        self.conn = connection
+        self.itersize = itersize
+
+    async def _fetch(
+        self,
+        query: tuple[str, list[str]],
+        params: dict,
+    ) -> list[asyncpg.Record]:
+        sql, names = query
+        return await self.conn.fetch(sql, *(params[name] for name in names))
+
+    async def iter_change_feed(
+        self,
+        after: dict[str, Watermark],
+    ) -> AsyncIterator[ChangeFeedPage]:
+        # тот же общий запрос по пяти источникам, что и в PostgresExtractor
+        watermarks = dict(after)
+        try:
+            while True:
+                params: dict = {"limit": self.itersize}
+                for source in CHANGE_SOURCES:
+                    params[f"{source}_ts"] = watermarks[source].updated_at
+                    params[f"{source}_id"] = watermarks[source].id
+
+                (row,) = await self._fetch(CHANGE_FEED_QUERY, params)
+
+                has_more = False
+                for source in CHANGE_SOURCES:
+                    rows_count = row[f"{source}_count"]
+                    if rows_count:
+                        watermarks[source] = Watermark(
+                            updated_at=row[f"{source}_ts"],
+                            id=row[f"{source}_id"],
+                        )
+                    has_more = has_more or rows_count == self.itersize
+
+                film_work_ids = set(row["film_work_ids"] or ())
+                logger.info(
+                    "Fetched %d film_work ids from change feed",
+                    len(film_work_ids),
+                )
+                if film_work_ids:
+                    yield film_work_ids, dict(watermarks)
+                if not has_more:
+                    return
+        except Exception:
+            logger.exception("Failed to fetch change feed")
+            raise
+
+    async def fetch_film_work_rows(
+        self,
+        film_work_ids: set[uuid.UUID],
+    ) -> list[asyncpg.Record]:
+        if not film_work_ids:
+            return []
+
+        try:
+            rows = await self.conn.fetch(FILM_WORK_FOR_INDEX_QUERY, list(film_work_ids))
+            logger.info("Fetched %d film_work by ids.", len(rows))
+            return rows
+        except Exception:
+            logger.exception("Failed to fetch film work by ids")
+            raise
+
+    async def _iter_keyset_pages(
+        self,
+        query: tuple[str, list[str]],
+        after: Watermark,
+    ) -> AsyncIterator[tuple[list[asyncpg.Record], Watermark]]:
+        watermark = after
+        while True:
+            rows = await self._fetch(
+                query,
+                {
+                    "ts": watermark.updated_at,
+                    "id": watermark.id,
+                    "limit": self.itersize,
+                },
+            )
+            if not rows:
+                return
+            watermark = Watermark(
+                updated_at=rows[-1]["updated_at"],
+                id=rows[-1]["key_id"],
+            )
+            yield rows, watermark
+            if len(rows) < self.itersize:
+                return
+
+    async def iter_changed_genres(
+        self,
+        after: Watermark | None = None,
+    ) -> AsyncIterator[tuple[list[GenreDTO], Watermark]]:
+        try:
+            async for rows, watermark in self._iter_keyset_pages(
+                CHANGED_GENRES_QUERY, after or Watermark()
+            ):
+                genres = [GenreDTO(id=row["id"], name=row["name"]) for row in rows]
+                logger.info("Fetched %d genres", len(genres))
+                yield genres, watermark
+        except Exception:
+            logger.exception("Failed to fetch genres")
+            raise
+
+    async def iter_changed_persons(
+        self,
+        after: Watermark | None = None,
+    ) -> AsyncIterator[tuple[list[PersonDTO], Watermark]]:
+        try:
+            async for rows, watermark in self._iter_keyset_pages(
+                CHANGED_PERSONS_QUERY, after or Watermark()
+            ):
+                persons = [
+                    PersonDTO(id=row["id"], full_name=row["full_name"]) for row in rows
+                ]
+                await self._attach_films(persons)
+                logger.info("Fetched %d persons", len(persons))
+                yield persons, watermark
+        except Exception:
+            logger.exception("Failed to fetch persons")
+            raise
+
+    async def iter_person_ids_by_film_links(
+        self,
+        after: Watermark | None = None,
+    ) -> AsyncIterator[tuple[set[uuid.UUID], Watermark]]:
+        try:
+            async for rows, watermark in self._iter_keyset_pages(
+                PERSON_IDS_BY_FILM_LINKS_QUERY, after or Watermark()
+            ):
+                person_ids = {row["person_id"] for row in rows}
+                logger.info("Fetched %d persons by film links", len(person_ids))
+                yield person_ids, watermark
+        except Exception:
+            logger.exception("Failed to fetch persons by film links")
+            raise
+
+    async def fetch_persons_by_ids(
+        self,
+        person_ids: set[uuid.UUID],
+    ) -> list[PersonDTO]:
+        if not person_ids:
+            return []
+
+        try:
+            rows = await self.conn.fetch(PERSONS_BY_IDS_QUERY, list(person_ids))
+            persons = [
+                PersonDTO(id=row["id"], full_name=row["full_name"]) for row in rows
+            ]
+            await self._attach_films(persons)
+            logger.info("Fetched %d persons by ids", len(persons))
+            return persons
+        except Exception:
+            logger.exception("Failed to fetch persons by ids")
+            raise
+
+    async def _attach_films(self, persons: list[PersonDTO]) -> None:
+        if not persons:
+            return
+
+        films: dict[uuid.UUID, list[PersonFilmDTO]] = {}
+        rows = await self.conn.fetch(PERSON_FILMS_QUERY, [p.id for p in persons])
+        for row in rows:
+            films.setdefault(row["person_id"], []).append(
+                PersonFilmDTO(id=row["film_work_id"], roles=row["roles"] or []),
+            )
+        for person in persons:
+            person.films = films.get(person.id, [])
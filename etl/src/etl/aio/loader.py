@@ -0,0 +1,166 @@
+import logging
+import time
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_streaming_bulk
+
+from etl.es.indices import (
+    GENRES_INDEX,
+    MOVIES_INDEX,
+    PERSONS_INDEX,
+    IndexSpec,
+    IndexTuning,
+    create_index_tuning,
+    index_body,
+)
+from etl.es.loader import (
+    bulk_action,
+    index_not_found,
+    record_bulk_result,
+    warn_outdated_mappings,
+)
+from etl.es.settings import EsSettings
+from etl.metrics import BATCH_SIZE, STAGE_SECONDS
+from etl.state.dead_letter import DeadLetterQueue
+from etl.state.hashes import DocumentHashStore
+from etl.utils.backoff import backoff
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncElasticsearchLoader:
+    """
+    Загрузчик асинхронного конвейера. Пачка документов уходит одним
+    проходом async_streaming_bulk; параллельность даёт не пул потоков,
+    а извлечение следующей пачки, которое идёт во время загрузки.
+    """
+
+    def __init__(
+        self,
+        client: AsyncElasticsearch,
+        movies_index_name: str,
+        genres_index_name: str,
+        persons_index_name: str,
+        chunk_size: int = 500,
+        max_chunk_bytes: int = 10 * 1024 * 1024,
+        max_retries: int = 5,
+        dead_letters: DeadLetterQueue | None = None,
+        tuning: IndexTuning | None = None,
+        hash_store: DocumentHashStore | None = None,
+    ) -> None:
+        self.client = client
+        self.movies_index_name = movies_index_name
+        self.genres_index_name = genres_index_name
+        self.persons_index_name = persons_index_name
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_retries = max_retries
+        self.dead_letters = dead_letters
+        self.tuning = tuning or IndexTuning()
+        self.hash_store = hash_store
+        self._ready_indices: set[str] = set()
+
+    async def ensure_movies_index(self) -> None:
+        await self._ensure_index(self.movies_index_name, MOVIES_INDEX)
+
+    async def ensure_genres_index(self) -> None:
+        await self._ensure_index(self.genres_index_name, GENRES_INDEX)
+
+    async def ensure_persons_index(self) -> None:
+        await self._ensure_index(self.persons_index_name, PERSONS_INDEX)
+
+    async def _ensure_index(self, index_name: str, spec: IndexSpec) -> None:
+        if index_name in self._ready_indices:
+            return
+        await self._check_index(index_name, spec)
+        self._ready_indices.add(index_name)
+
+    @backoff()
+    async def _check_index(self, index_name: str, spec: IndexSpec) -> None:
+        if not await self.client.indices.exists(index=index_name):
+            await self.client.indices.create(
+                index=index_name,
+                body=index_body(spec, self.tuning),
+            )
+            logger.info("Created index %s", index_name)
+            if self.hash_store is not None:
+                self.hash_store.clear(index_name)
+            return
+
+        mappings = await self.client.indices.get_mapping(index=index_name)
+        warn_outdated_mappings(mappings, spec)
+        logger.debug("Index %s exists", index_name)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    async def bulk_load(
+        self,
+        documents: list[dict],
+        index_name: str,
+        op_type: str = "index",
+    ) -> set[str]:
+        if not documents:
+            logger.debug("No documents to load")
+            return set()
+
+        BATCH_SIZE.labels(index=index_name).observe(len(documents))
+        actions = [bulk_action(doc, index_name, op_type) for doc in documents]
+        started = time.perf_counter()
+        success, errors = await self._load_actions(actions, index_name)
+
+        failed_ids = record_bulk_result(
+            index_name=index_name,
+            op_type=op_type,
+            success=success,
+            errors=errors,
+            elapsed=time.perf_counter() - started,
+        )
+        if index_not_found(errors):
+            self._ready_indices.discard(index_name)
+        if failed_ids and self.dead_letters is not None:
+            self.dead_letters.add(index_name=index_name, doc_ids=failed_ids)
+        return failed_ids
+
+    @backoff()
+    async def _load_actions(
+        self,
+        actions: list[dict],
+        index_name: str,
+    ) -> tuple[int, list[dict]]:
+        success = 0
+        errors: list[dict] = []
+        with STAGE_SECONDS.labels(index=index_name, stage="load").time():
+            async for ok, item in async_streaming_bulk(
+                self.client,
+                actions,
+                chunk_size=self.chunk_size,
+                max_chunk_bytes=self.max_chunk_bytes,
+                max_retries=self.max_retries,
+                raise_on_error=False,
+            ):
+                if ok:
+                    success += 1
+                else:
+                    errors.append(item)
+        return success, errors
+
+
+def create_async_loader(
+    es_settings: EsSettings,
+    dead_letters: DeadLetterQueue | None = None,
+    hash_store: DocumentHashStore | None = None,
+) -> AsyncElasticsearchLoader:
+    client = AsyncElasticsearch(f"http://{es_settings.ES_HOST}:{es_settings.ES_PORT}")
+    return AsyncElasticsearchLoader(
+        client=client,
+        movies_index_name=es_settings.MOVIES_ES_INDEX,
+        genres_index_name=es_settings.GENRES_ES_INDEX,
+        persons_index_name=es_settings.PERSONS_ES_INDEX,
+        chunk_size=es_settings.ES_BULK_CHUNK_SIZE,
+        max_chunk_bytes=es_settings.ES_BULK_MAX_CHUNK_BYTES,
+        max_retries=es_settings.ES_BULK_MAX_RETRIES,
+        dead_letters=dead_letters,
+        tuning=create_index_tuning(settings=es_settings),
+        hash_store=hash_store,
+    )
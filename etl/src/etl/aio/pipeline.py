@@ -0,0 +1,251 @@
+"""
+Асинхронный вариант цикла ETL на asyncpg и AsyncElasticsearch.
+
+Извлечение и трансформация пачки N+1 идут, пока пачка N загружается
+в Elasticsearch: между ними ограниченная очередь, поэтому извлечение
+уходит вперёд загрузки не больше чем на queue_size пачек. Водяные знаки
+сохраняет загрузка, после своей пачки и в порядке извлечения.
+
+Вариант покрывает опрос жанров, персон и фильмов; оценки из MongoDB,
+повтор очереди отклонённых документов и режим LISTEN/NOTIFY остаются
+в синхронном цикле. Отклонённые документы попадают в ту же очередь.
+
+Запуск: python -m etl.main --async
+"""
+
+import asyncio
+import logging
+import uuid
+
+import asyncpg
+
+from etl.aio.extractor import AsyncPostgresExtractor, create_pg_pool
+from etl.aio.loader import AsyncElasticsearchLoader, create_async_loader
+from etl.db.extractor import CHANGE_SOURCES
+from etl.db.settings import DBSettings
+from etl.dto.dto import LoadBatch
+from etl.es.settings import EsSettings
+from etl.metrics import STAGE_SECONDS, timed_aiter
+from etl.state.dead_letter import DeadLetterQueue
+from etl.state.hashes import DocumentHashStore
+from etl.state.state import State
+from etl.transformer.film_work import film_work_rows_to_documents
+from etl.transformer.genre import transform_genre
+from etl.transformer.person import transform_person
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERRORS = (
+    OSError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+)
+
+BatchQueue = asyncio.Queue[LoadBatch | None]
+
+
+async def produce_genres(
+    extractor: AsyncPostgresExtractor,
+    loader: AsyncElasticsearchLoader,
+    state: State,
+    queue: BatchQueue,
+) -> None:
+    await loader.ensure_genres_index()
+    async for genres, watermark in timed_aiter(
+        extractor.iter_changed_genres(after=state.get_watermark("genre")),
+        index=loader.genres_index_name,
+        stage="extract",
+    ):
+        await queue.put(
+            LoadBatch(
+                index_name=loader.genres_index_name,
+                documents=[transform_genre(g).model_dump(mode="json") for g in genres],
+                watermarks={"genre": watermark},
+            )
+        )
+
+
+async def produce_persons(
+    extractor: AsyncPostgresExtractor,
+    loader: AsyncElasticsearchLoader,
+    state: State,
+    queue: BatchQueue,
+) -> None:
+    await loader.ensure_persons_index()
+    async for persons, watermark in timed_aiter(
+        extractor.iter_changed_persons(after=state.get_watermark("person")),
+        index=loader.persons_index_name,
+        stage="extract",
+    ):
+        await queue.put(
+            LoadBatch(
+                index_name=loader.persons_index_name,
+                documents=[
+                    transform_person(p).model_dump(mode="json") for p in persons
+                ],
+                watermarks={"person": watermark},
+            )
+        )
+
+    async for person_ids, watermark in timed_aiter(
+        extractor.iter_person_ids_by_film_links(
+            after=state.get_watermark("person_film"),
+        ),
+        index=loader.persons_index_name,
+        stage="extract",
+    ):
+        persons = await extractor.fetch_persons_by_ids(person_ids=person_ids)
+        await queue.put(
+            LoadBatch(
+                index_name=loader.persons_index_name,
+                documents=[
+                    transform_person(p).model_dump(mode="json") for p in persons
+                ],
+                watermarks={"person_film": watermark},
+            )
+        )
+
+
+async def produce_movies(
+    extractor: AsyncPostgresExtractor,
+    loader: AsyncElasticsearchLoader,
+    state: State,
+    queue: BatchQueue,
+) -> None:
+    after = {source: state.get_watermark(source) for source in CHANGE_SOURCES}
+    index_name = loader.movies_index_name
+
+    await loader.ensure_movies_index()
+    # как и в синхронном цикле, id сверяются только с предыдущей страницей
+    previous_film_work_ids: set[uuid.UUID] = set()
+
+    async for film_work_ids, watermarks in timed_aiter(
+        extractor.iter_change_feed(after=after),
+        index=index_name,
+        stage="extract",
+    ):
+        documents: list[dict] = []
+        new_film_work_ids = film_work_ids - previous_film_work_ids
+        if new_film_work_ids:
+            with STAGE_SECONDS.labels(index=index_name, stage="extract").time():
+                rows = await extractor.fetch_film_work_rows(new_film_work_ids)
+            # трансформация в потоке: цикл событий тем временем читает
+            # ответы bulk-запросов предыдущей пачки
+            with STAGE_SECONDS.labels(index=index_name, stage="transform").time():
+                documents = await asyncio.to_thread(film_work_rows_to_documents, rows)
+
+        previous_film_work_ids = film_work_ids
+
+        # пачка без документов всё равно идёт в очередь ради водяных знаков
+        await queue.put(
+            LoadBatch(
+                index_name=index_name,
+                documents=documents,
+                watermarks=watermarks,
+                op_type="upsert",
+                check_hashes=True,
+            )
+        )
+
+
+async def produce(
+    extractor: AsyncPostgresExtractor,
+    loader: AsyncElasticsearchLoader,
+    state: State,
+    queue: BatchQueue,
+) -> None:
+    await produce_genres(extractor, loader, state, queue)
+    await produce_persons(extractor, loader, state, queue)
+    await produce_movies(extractor, loader, state, queue)
+    await queue.put(None)
+
+
+async def consume(
+    loader: AsyncElasticsearchLoader,
+    state: State,
+    queue: BatchQueue,
+    hash_store: DocumentHashStore | None = None,
+) -> None:
+    while (batch := await queue.get()) is not None:
+        # хэши проверяются здесь, а не при извлечении: commit сохраняет все
+        # ожидающие хэши индекса, и они не должны смешиваться между пачками
+        check_hashes = hash_store is not None and batch.check_hashes
+        documents = batch.documents
+        if check_hashes:
+            documents = list(
+                hash_store.filter_changed(
+                    index_name=batch.index_name,
+                    documents=documents,
+                )
+            )
+
+        try:
+            failed_ids = await loader.bulk_load(
+                documents=documents,
+                index_name=batch.index_name,
+                op_type=batch.op_type,
+            )
+            if check_hashes:
+                hash_store.commit(index_name=batch.index_name, failed_ids=failed_ids)
+        finally:
+            if check_hashes:
+                hash_store.discard(batch.index_name)
+        state.set_watermarks(batch.watermarks)
+
+
+async def run_once(
+    state: State,
+    loader: AsyncElasticsearchLoader,
+    pool: asyncpg.Pool,
+    itersize: int = 1000,
+    queue_size: int = 4,
+    hash_store: DocumentHashStore | None = None,
+) -> None:
+    # как и в синхронном цикле, все запросы видят один снимок данных;
+    # при ошибке одной из сторон TaskGroup отменяет вторую
+    queue: BatchQueue = asyncio.Queue(maxsize=queue_size)
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            extractor = AsyncPostgresExtractor(connection=conn, itersize=itersize)
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(produce(extractor, loader, state, queue))
+                tasks.create_task(consume(loader, state, queue, hash_store))
+
+
+async def run_async(
+    state: State,
+    db_settings: DBSettings,
+    es_settings: EsSettings,
+    poll_interval: float,
+    queue_size: int = 4,
+    hash_store: DocumentHashStore | None = None,
+    dead_letters: DeadLetterQueue | None = None,
+) -> None:
+    loader = create_async_loader(
+        es_settings=es_settings,
+        dead_letters=dead_letters,
+        hash_store=hash_store,
+    )
+    pool: asyncpg.Pool | None = None
+    logger.info("Async ETL started, queue size: %s", queue_size)
+    try:
+        while True:
+            try:
+                # пул создаётся в цикле: сервис стартует без базы
+                if pool is None:
+                    pool = await create_pg_pool(settings=db_settings)
+                await run_once(
+                    state=state,
+                    loader=loader,
+                    pool=pool,
+                    itersize=db_settings.POSTGRES_ITERSIZE,
+                    queue_size=queue_size,
+                    hash_store=hash_store,
+                )
+            except* CONNECTION_ERRORS:
+                logger.warning("Postgres unavailable, backing off")
+            await asyncio.sleep(poll_interval)
+    finally:
+        if pool is not None:
+            await pool.close()
+        await loader.close()
@@ -1,14 +1,24 @@
 import psycopg2
 from psycopg2.extensions import connection as PgConnection
-from src.etl.db.settings import DBSettings
+
+from etl.db.settings import DBSettings
+
+
+def pg_connection_params(settings: DBSettings) -> dict:
+    return {
+        "host": settings.POSTGRES_HOST,
+        "port": settings.POSTGRES_PORT,
+        "dbname": settings.POSTGRES_DB,
+        "user": settings.POSTGRES_USER,
+        "password": settings.POSTGRES_PASSWORD,
+        "connect_timeout": 5,
+        # долгоживущие соединения: обрыв замечаем без ожидания таймаута ОС
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 3,
+    }
 
 
 def create_pg_connection(settings: DBSettings) -> PgConnection:
-    return psycopg2.connect(
-        host=settings.POSTGRES_HOST,
-        port=settings.POSTGRES_PORT,
-        dbname=settings.POSTGRES_DB,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        connect_timeout=5,
-    )
+    return psycopg2.connect(**pg_connection_params(settings))
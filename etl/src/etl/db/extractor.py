@@ -1,359 +1,631 @@
 import datetime
 import logging
 import uuid
+from collections.abc import Iterator
 
 from psycopg2.extensions import connection as PgConnection
 from psycopg2.extras import RealDictCursor
 
-from etl.dto.dto import FilmPersonDTO, FilmWorkDTO, GenreDTO, PersonDTO
+from etl.dto.dto import (
+    FilmPersonDTO,
+    FilmWorkDTO,
+    GenreDTO,
+    PersonDTO,
+    PersonFilmDTO,
+    Watermark,
+)
 
 logger = logging.getLogger(__name__)
 
 
+# источники изменений фильмов; у каждого свой водяной знак в состоянии
+CHANGE_SOURCES = (
+    "film_work",
+    "movies_by_genre",
+    "movies_by_person",
+    "genre_film_work",
+    "person_film_work",
+)
+
+ChangeFeedPage = tuple[set[uuid.UUID], dict[str, Watermark]]
+
+FILM_WORK_FOR_INDEX_SQL = """
+      SELECT fw.id,
+             fw.title,
+             fw.rating,
+             fw.description,
+             fw.updated_at,
+             fw.creation_date,
+             COALESCE(
+                     jsonb_agg(
+                         DISTINCT jsonb_build_object(
+                    'id', g.id,
+                    'name', g.name
+                )
+            ) FILTER(WHERE g.name IS NOT NULL),
+                     '[]' ::jsonb
+             ) AS genres,
+             COALESCE(
+                     jsonb_agg(
+                         DISTINCT jsonb_build_object(
+                    'id', p.id,
+                    'full_name', p.full_name,
+                    'role', pfw.role
+                )
+            ) FILTER(WHERE p.full_name IS NOT NULL),
+                     '[]' ::jsonb
+             ) AS persons
+      FROM content.film_work fw
+               LEFT JOIN content.person_film_work pfw
+                         ON pfw.film_work_id = fw.id
+               LEFT JOIN content.genre_film_work gfw
+                         ON gfw.film_work_id = fw.id
+               LEFT JOIN content.genre g ON g.id = gfw.genre_id
+               LEFT JOIN content.person p ON p.id = pfw.person_id
+      WHERE fw.id = ANY (%s::uuid[])
+      GROUP BY fw.id;
+      """
+
+
+CHANGE_FEED_SQL = """
+      WITH film_work AS (
+          SELECT fw.id AS film_work_id, fw.updated_at, fw.id AS key_id
+          FROM content.film_work fw
+          WHERE %(film_work_ts)s IS NULL
+             OR (fw.updated_at, fw.id)
+                    > (%(film_work_ts)s, %(film_work_id)s)
+          ORDER BY fw.updated_at, fw.id
+          LIMIT %(limit)s
+      ),
+      movies_by_genre AS (
+          SELECT gfw.film_work_id, g.updated_at, gfw.id AS key_id
+          FROM content.genre g
+                   JOIN content.genre_film_work gfw ON g.id = gfw.genre_id
+          WHERE %(movies_by_genre_ts)s IS NULL
+             OR (g.updated_at, gfw.id)
+                    > (%(movies_by_genre_ts)s, %(movies_by_genre_id)s)
+          ORDER BY g.updated_at, gfw.id
+          LIMIT %(limit)s
+      ),
+      movies_by_person AS (
+          SELECT pfw.film_work_id, p.updated_at, pfw.id AS key_id
+          FROM content.person p
+                   JOIN content.person_film_work pfw ON p.id = pfw.person_id
+          WHERE %(movies_by_person_ts)s IS NULL
+             OR (p.updated_at, pfw.id)
+                    > (%(movies_by_person_ts)s, %(movies_by_person_id)s)
+          ORDER BY p.updated_at, pfw.id
+          LIMIT %(limit)s
+      ),
+      genre_film_work AS (
+          SELECT gfw.film_work_id, gfw.updated_at, gfw.id AS key_id
+          FROM content.genre_film_work gfw
+          WHERE %(genre_film_work_ts)s IS NULL
+             OR (gfw.updated_at, gfw.id)
+                    > (%(genre_film_work_ts)s, %(genre_film_work_id)s)
+          ORDER BY gfw.updated_at, gfw.id
+          LIMIT %(limit)s
+      ),
+      person_film_work AS (
+          SELECT pfw.film_work_id, pfw.updated_at, pfw.id AS key_id
+          FROM content.person_film_work pfw
+          WHERE %(person_film_work_ts)s IS NULL
+             OR (pfw.updated_at, pfw.id)
+                    > (%(person_film_work_ts)s, %(person_film_work_id)s)
+          ORDER BY pfw.updated_at, pfw.id
+          LIMIT %(limit)s
+      ),
+      changes AS (
+          SELECT 'film_work' AS source, * FROM film_work
+          UNION ALL
+          SELECT 'movies_by_genre', * FROM movies_by_genre
+          UNION ALL
+          SELECT 'movies_by_person', * FROM movies_by_person
+          UNION ALL
+          SELECT 'genre_film_work', * FROM genre_film_work
+          UNION ALL
+          SELECT 'person_film_work', * FROM person_film_work
+      )
+      SELECT array_agg(DISTINCT film_work_id) AS film_work_ids,
+             count(*) FILTER (WHERE source = 'film_work')
+                 AS film_work_count,
+             max(updated_at) FILTER (WHERE source = 'film_work')
+                 AS film_work_ts,
+             (array_agg(key_id ORDER BY updated_at DESC, key_id DESC)
+                 FILTER (WHERE source = 'film_work'))[1]
+                 AS film_work_id,
+             count(*) FILTER (WHERE source = 'movies_by_genre')
+                 AS movies_by_genre_count,
+             max(updated_at) FILTER (WHERE source = 'movies_by_genre')
+                 AS movies_by_genre_ts,
+             (array_agg(key_id ORDER BY updated_at DESC, key_id DESC)
+                 FILTER (WHERE source = 'movies_by_genre'))[1]
+                 AS movies_by_genre_id,
+             count(*) FILTER (WHERE source = 'movies_by_person')
+                 AS movies_by_person_count,
+             max(updated_at) FILTER (WHERE source = 'movies_by_person')
+                 AS movies_by_person_ts,
+             (array_agg(key_id ORDER BY updated_at DESC, key_id DESC)
+                 FILTER (WHERE source = 'movies_by_person'))[1]
+                 AS movies_by_person_id,
+             count(*) FILTER (WHERE source = 'genre_film_work')
+                 AS genre_film_work_count,
+             max(updated_at) FILTER (WHERE source = 'genre_film_work')
+                 AS genre_film_work_ts,
+             (array_agg(key_id ORDER BY updated_at DESC, key_id DESC)
+                 FILTER (WHERE source = 'genre_film_work'))[1]
+                 AS genre_film_work_id,
+             count(*) FILTER (WHERE source = 'person_film_work')
+                 AS person_film_work_count,
+             max(updated_at) FILTER (WHERE source = 'person_film_work')
+                 AS person_film_work_ts,
+             (array_agg(key_id ORDER BY updated_at DESC, key_id DESC)
+                 FILTER (WHERE source = 'person_film_work'))[1]
+                 AS person_film_work_id
+      FROM changes;
+      """
+
+CHANGED_GENRES_SQL = """
+      SELECT g.id, g.name, g.updated_at, g.id AS key_id
+      FROM content.genre g
+      WHERE %(ts)s IS NULL
+         OR (g.updated_at, g.id) > (%(ts)s, %(id)s)
+      ORDER BY g.updated_at, g.id
+      LIMIT %(limit)s;
+      """
+
+CHANGED_PERSONS_SQL = """
+      SELECT p.id, p.full_name, p.updated_at, p.id AS key_id
+      FROM content.person p
+      WHERE %(ts)s IS NULL
+         OR (p.updated_at, p.id) > (%(ts)s, %(id)s)
+      ORDER BY p.updated_at, p.id
+      LIMIT %(limit)s;
+      """
+
+PERSON_IDS_BY_FILM_LINKS_SQL = """
+      SELECT pfw.person_id, pfw.updated_at, pfw.id AS key_id
+      FROM content.person_film_work pfw
+      WHERE %(ts)s IS NULL
+         OR (pfw.updated_at, pfw.id) > (%(ts)s, %(id)s)
+      ORDER BY pfw.updated_at, pfw.id
+      LIMIT %(limit)s;
+      """
+
+PERSON_FILMS_SQL = """
+      SELECT pfw.person_id,
+             pfw.film_work_id,
+             array_agg(DISTINCT pfw.role)
+                 FILTER (WHERE pfw.role IS NOT NULL) AS roles
+      FROM content.person_film_work pfw
+               JOIN content.film_work fw ON fw.id = pfw.film_work_id
+      WHERE pfw.person_id = ANY (%s::uuid[])
+      GROUP BY pfw.person_id, pfw.film_work_id, fw.creation_date
+      ORDER BY pfw.person_id,
+               fw.creation_date DESC NULLS LAST,
+               pfw.film_work_id;
+      """
+
+PERSONS_BY_IDS_SQL = """
+      SELECT p.id, p.full_name
+      FROM content.person p
+      WHERE p.id = ANY (%s::uuid[]);
+      """
+
+
+def film_work_from_row(row: dict) -> FilmWorkDTO:
+    return FilmWorkDTO(
+        id=row["id"],
+        title=row["title"],
+        rating=row["rating"],
+        description=row["description"],
+        persons=[
+            FilmPersonDTO(
+                id=uuid.UUID(person["id"]),
+                full_name=person["full_name"],
+                role=person["role"],
+            )
+            for person in row["persons"]
+        ],
+        genres=[
+            GenreDTO(
+                id=uuid.UUID(genre["id"]),
+                name=genre["name"],
+            )
+            for genre in row["genres"]
+        ],
+        updated_at=row["updated_at"],
+        creation_date=row["creation_date"],
+    )
+
+
 class PostgresExtractor:
-    def __init__(self, connection: PgConnection) -> None:
+    def __init__(self, connection: PgConnection, itersize: int = 1000) -> None:
         self.conn = connection
+        self.itersize = itersize
 
-    def fetch_changed_film_work_ids(
+    def iter_change_feed(
         self,
-        film_work_ts: datetime.datetime | None = None,
-    ) -> tuple[set[uuid.UUID], datetime.datetime | None]:
-        sql = """
-              SELECT fw.id, fw.updated_at
-              FROM content.film_work fw
-              WHERE (%s IS NULL OR updated_at > %s)
-              ORDER BY fw.updated_at ASC;
-              """
-        film_work_ids: set[uuid.UUID] = set()
-        max_film_work_ts: datetime.datetime | None = film_work_ts
+        after: dict[str, Watermark],
+    ) -> Iterator[ChangeFeedPage]:
+        # один запрос на страницу вместо пяти: каждый источник отдаёт до
+        # itersize строк после своего (updated_at, id), id фильмов
+        # дедуплицируются в базе, новые водяные знаки приходят колонками
+        watermarks = dict(after)
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (film_work_ts, film_work_ts))
-                rows = cur.fetchall()
-
-            for row in rows:
-                film_work_ids.add(row["id"])
-                updated_at = row["updated_at"]
-                if max_film_work_ts is None or updated_at > max_film_work_ts:
-                    max_film_work_ts = updated_at
+            while True:
+                params: dict = {"limit": self.itersize}
+                for source in CHANGE_SOURCES:
+                    params[f"{source}_ts"] = watermarks[source].updated_at
+                    params[f"{source}_id"] = watermarks[source].id
+
+                with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(CHANGE_FEED_SQL, params)
+                    row = cur.fetchone()
+
+                has_more = False
+                for source in CHANGE_SOURCES:
+                    rows_count = row[f"{source}_count"]
+                    if rows_count:
+                        watermarks[source] = Watermark(
+                            updated_at=row[f"{source}_ts"],
+                            id=row[f"{source}_id"],
+                        )
+                    # неполная страница значит, что источник дочитан
+                    has_more = has_more or rows_count == self.itersize
 
-            logger.info(
-                "Fetched %d film_work ids after update film work, last updated_at=%s",
-                len(film_work_ids),
-                max_film_work_ts,
-            )
-            return film_work_ids, max_film_work_ts
+                film_work_ids = set(row["film_work_ids"] or ())
+                logger.info(
+                    "Fetched %d film_work ids from change feed",
+                    len(film_work_ids),
+                )
+                if film_work_ids:
+                    yield film_work_ids, dict(watermarks)
+                if not has_more:
+                    return
         except Exception:
-            logger.exception("Failed to fetch changed film_work_id")
+            logger.exception("Failed to fetch change feed")
             raise
 
-    def fetch_film_work_ids_by_changed_genres(
+    def fetch_film_work_rows(
         self,
-        genre_ts: datetime.datetime | None = None,
-    ) -> tuple[set[uuid.UUID], datetime.datetime | None]:
-        sql = """
-              SELECT gfw.film_work_id, g.updated_at
-              FROM content.genre g
-                       JOIN content.genre_film_work gfw ON g.id = gfw.genre_id
-              WHERE (%s IS NULL OR g.updated_at > %s)
-              ORDER BY g.updated_at ASC;
-              """
-        film_work_ids: set[uuid.UUID] = set()
-        max_genre_ts: datetime.datetime | None = genre_ts
+        film_work_ids: set[uuid.UUID],
+    ) -> list[dict]:
+        if not film_work_ids:
+            return []
 
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (genre_ts, genre_ts))
+                cur.execute(FILM_WORK_FOR_INDEX_SQL, (list(film_work_ids),))
                 rows = cur.fetchall()
 
-                for row in rows:
-                    film_work_ids.add(row["film_work_id"])
-                    updated_at = row["updated_at"]
-                    if max_genre_ts is None or updated_at > max_genre_ts:
-                        max_genre_ts = updated_at
-
-                logger.info(
-                    "Fetched %d film_work ids due to genre updates, last updated_at=%s",
-                    len(film_work_ids),
-                    max_genre_ts,
-                )
-                return film_work_ids, max_genre_ts
+            logger.info("Fetched %d film_work by ids.", len(rows))
+            return rows
         except Exception:
-            logger.exception("Failed to fetch changed genre")
+            logger.exception("Failed to fetch film work by ids")
             raise
 
-    def fetch_film_work_ids_by_changed_persons(
+    def fetch_film_work_for_index(
         self,
-        person_ts: datetime.datetime | None = None,
-    ) -> tuple[set[uuid.UUID], datetime.datetime | None]:
-        sql = """
-              SELECT pfw.film_work_id, p.updated_at
-              FROM content.person p
-                       JOIN content.person_film_work pfw ON p.id = pfw.person_id
-              WHERE (%s IS NULL OR p.updated_at > %s)
-              ORDER BY p.updated_at ASC;
-              """
-
-        film_work_ids: set[uuid.UUID] = set()
-        max_person_ts: datetime.datetime | None = person_ts
+        film_work_ids: set[uuid.UUID],
+    ) -> list[FilmWorkDTO]:
+        rows = self.fetch_film_work_rows(film_work_ids=film_work_ids)
+        return [film_work_from_row(row) for row in rows]
 
-        try:
+    def _iter_keyset_pages(
+        self,
+        sql: str,
+        after: Watermark,
+    ) -> Iterator[tuple[list[dict], Watermark]]:
+        # страницы по itersize строк строго после (updated_at, id) прошлой
+        # страницы: строки с одинаковым updated_at не теряются на границе
+        # страниц и не читаются повторно, а каждый запрос ограничен LIMIT
+        watermark = after
+        while True:
+            params = {
+                "ts": watermark.updated_at,
+                "id": watermark.id,
+                "limit": self.itersize,
+            }
             with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (person_ts, person_ts))
+                cur.execute(sql, params)
                 rows = cur.fetchall()
 
-                for row in rows:
-                    film_work_ids.add(row["film_work_id"])
-                    updated_at = row["updated_at"]
-                    if max_person_ts is None or updated_at > max_person_ts:
-                        max_person_ts = updated_at
+            if not rows:
+                return
+            watermark = Watermark(
+                updated_at=rows[-1]["updated_at"],
+                id=rows[-1]["key_id"],
+            )
+            yield rows, watermark
+            if len(rows) < self.itersize:
+                return
 
+    def iter_changed_genres(
+        self,
+        after: Watermark | None = None,
+    ) -> Iterator[tuple[list[GenreDTO], Watermark]]:
+        try:
+            for rows, watermark in self._iter_keyset_pages(
+                CHANGED_GENRES_SQL, after or Watermark()
+            ):
+                genres = [GenreDTO(id=row["id"], name=row["name"]) for row in rows]
                 logger.info(
-                    "Fetched %d film_work ids due to person updates, "
-                    "last updated_at=%s",
-                    len(film_work_ids),
-                    max_person_ts,
+                    "Fetched %d genres, last updated_at=%s",
+                    len(genres),
+                    watermark.updated_at,
                 )
-                return film_work_ids, max_person_ts
+                yield genres, watermark
         except Exception:
-            logger.exception("Failed to fetch changed person")
+            logger.exception("Failed to fetch genres")
             raise
 
-    def fetch_film_work_ids_by_changed_genre_film_work(
+    def iter_changed_persons(
         self,
-        genre_film_work_ts: datetime.datetime | None = None,
-    ) -> tuple[set[uuid.UUID], datetime.datetime | None]:
-        sql = """
-              SELECT gfw.film_work_id, gfw.updated_at
-              FROM content.genre_film_work gfw
-              WHERE (%s IS NULL OR gfw.updated_at > %s)
-              ORDER BY gfw.updated_at ASC;
-              """
-        film_work_ids: set[uuid.UUID] = set()
-        max_genre_film_work_ts: datetime.datetime | None = genre_film_work_ts
+        after: Watermark | None = None,
+    ) -> Iterator[tuple[list[PersonDTO], Watermark]]:
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (genre_film_work_ts, genre_film_work_ts))
-                rows = cur.fetchall()
-
-                for row in rows:
-                    film_work_ids.add(row["film_work_id"])
-                    updated_at = row["updated_at"]
-                    if (
-                        max_genre_film_work_ts is None
-                        or updated_at > max_genre_film_work_ts
-                    ):
-                        max_genre_film_work_ts = updated_at
-
+            for rows, watermark in self._iter_keyset_pages(
+                CHANGED_PERSONS_SQL, after or Watermark()
+            ):
+                persons = [
+                    PersonDTO(id=row["id"], full_name=row["full_name"]) for row in rows
+                ]
+                self._attach_films(persons)
                 logger.info(
-                    "Fetched %d film_work ids due to genre film work updates, "
-                    "last updated_at=%s",
-                    len(film_work_ids),
-                    max_genre_film_work_ts,
+                    "Fetched %d persons, last updated_at=%s",
+                    len(persons),
+                    watermark.updated_at,
                 )
-                return film_work_ids, max_genre_film_work_ts
+                yield persons, watermark
         except Exception:
-            logger.exception("Failed to fetch changed genre film work")
+            logger.exception("Failed to fetch persons")
             raise
 
-    def fetch_film_work_ids_by_changed_person_film_work(
+    def iter_person_ids_by_film_links(
         self,
-        person_film_work_ts: datetime.datetime | None = None,
-    ) -> tuple[set[uuid.UUID], datetime.datetime | None]:
-        sql = """
-              SELECT pfw.film_work_id, pfw.updated_at
-              FROM content.person_film_work pfw
-              WHERE (%s IS NULL OR pfw.updated_at > %s)
-              ORDER BY pfw.updated_at ASC;
-              """
-
-        film_work_ids: set[uuid.UUID] = set()
-        max_person_film_work_ts: datetime.datetime | None = person_film_work_ts
-
+        after: Watermark | None = None,
+    ) -> Iterator[tuple[set[uuid.UUID], Watermark]]:
+        # персоны, у которых изменился состав фильмов или роли
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (person_film_work_ts, person_film_work_ts))
-                rows = cur.fetchall()
-
-                for row in rows:
-                    film_work_ids.add(row["film_work_id"])
-                    updated_at = row["updated_at"]
-                    if (
-                        max_person_film_work_ts is None
-                        or updated_at > max_person_film_work_ts
-                    ):
-                        max_person_film_work_ts = updated_at
-
+            for rows, watermark in self._iter_keyset_pages(
+                PERSON_IDS_BY_FILM_LINKS_SQL, after or Watermark()
+            ):
+                person_ids = {row["person_id"] for row in rows}
                 logger.info(
-                    "Fetched %d film_work ids due to person film work updates, "
-                    "last updated_at=%s",
-                    len(film_work_ids),
-                    max_person_film_work_ts,
+                    "Fetched %d persons by film links, last updated_at=%s",
+                    len(person_ids),
+                    watermark.updated_at,
                 )
-                return film_work_ids, max_person_film_work_ts
+                yield person_ids, watermark
         except Exception:
-            logger.exception("Failed to fetch changed person film work")
+            logger.exception("Failed to fetch persons by film links")
             raise
 
-    def fetch_film_work_for_index(
+    def fetch_person_films(
         self,
-        film_work_ids: set[uuid.UUID],
-    ) -> list[FilmWorkDTO]:
-        if not film_work_ids:
-            return []
+        person_ids: set[uuid.UUID],
+    ) -> dict[uuid.UUID, list[PersonFilmDTO]]:
+        if not person_ids:
+            return {}
 
-        sql = """
-              SELECT fw.id,
-                     fw.title,
-                     fw.rating,
-                     fw.description,
-                     fw.updated_at,
-                     fw.creation_date,
-                     COALESCE(
-                             jsonb_agg(
-                                 DISTINCT jsonb_build_object(
-                            'id', g.id,
-                            'name', g.name
-                        )
-                    ) FILTER(WHERE g.name IS NOT NULL),
-                             '[]' ::jsonb
-                     ) AS genres,
-                     COALESCE(
-                             jsonb_agg(
-                                 DISTINCT jsonb_build_object(
-                            'id', p.id,
-                            'full_name', p.full_name,
-                            'role', pfw.role
-                        )
-                    ) FILTER(WHERE p.full_name IS NOT NULL),
-                             '[]' ::jsonb
-                     ) AS persons
-              FROM content.film_work fw
-                       LEFT JOIN content.person_film_work pfw
-                                 ON pfw.film_work_id = fw.id
-                       LEFT JOIN content.genre_film_work gfw
-                                 ON gfw.film_work_id = fw.id
-                       LEFT JOIN content.genre g ON g.id = gfw.genre_id
-                       LEFT JOIN content.person p ON p.id = pfw.person_id
-              WHERE fw.id = ANY (%s::uuid[])
-              GROUP BY fw.id;
-              """
-        film_work_list: list[FilmWorkDTO] = []
         try:
+            films: dict[uuid.UUID, list[PersonFilmDTO]] = {}
             with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (list(film_work_ids),))
-                rows = cur.fetchall()
-
-                for row in rows:
-                    film_work_list.append(
-                        FilmWorkDTO(
-                            id=row["id"],
-                            title=row["title"],
-                            rating=row["rating"],
-                            description=row["description"],
-                            persons=[
-                                FilmPersonDTO(
-                                    id=uuid.UUID(person["id"]),
-                                    full_name=person["full_name"],
-                                    role=person["role"],
-                                )
-                                for person in row["persons"]
-                            ],
-                            genres=[
-                                GenreDTO(
-                                    id=uuid.UUID(genre["id"]),
-                                    name=genre["name"],
-                                )
-                                for genre in row["genres"]
-                            ],
-                            updated_at=row["updated_at"],
-                            creation_date=row["creation_date"],
+                cur.execute(PERSON_FILMS_SQL, (list(person_ids),))
+                for row in cur.fetchall():
+                    films.setdefault(row["person_id"], []).append(
+                        PersonFilmDTO(
+                            id=row["film_work_id"],
+                            roles=row["roles"] or [],
                         ),
                     )
 
-                logger.info(
-                    "Fetched %d film_work by ids.",
-                    len(film_work_list),
-                )
-                return film_work_list
+            logger.info("Fetched films for %d persons", len(films))
+            return films
         except Exception:
-            logger.exception("Failed to fetch film work by ids")
+            logger.exception("Failed to fetch person films")
             raise
 
-    def fetch_changed_genres(
+    def _attach_films(self, persons: list[PersonDTO]) -> None:
+        # документ персоны всегда пишется целиком вместе с фильмами,
+        # иначе обновление имени стёрло бы список фильмов
+        films = self.fetch_person_films({p.id for p in persons})
+        for person in persons:
+            person.films = films.get(person.id, [])
+
+    def fetch_film_work_ids_by_genres_and_persons(
         self,
-        genres_ts: datetime.datetime | None = None,
-    ) -> tuple[list[GenreDTO], datetime.datetime | None]:
+        genre_ids: set[uuid.UUID],
+        person_ids: set[uuid.UUID],
+    ) -> set[uuid.UUID]:
+        if not genre_ids and not person_ids:
+            return set()
+
         sql = """
-              SELECT g.id, g.name, g.updated_at
-              FROM content.genre g
-              WHERE (%s IS NULL OR g.updated_at > %s)
-              ORDER BY g.updated_at ASC;
+              SELECT gfw.film_work_id
+              FROM content.genre_film_work gfw
+              WHERE gfw.genre_id = ANY (%s::uuid[])
+              UNION
+              SELECT pfw.film_work_id
+              FROM content.person_film_work pfw
+              WHERE pfw.person_id = ANY (%s::uuid[]);
               """
+        try:
+            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(sql, (list(genre_ids), list(person_ids)))
+                film_work_ids = {row["film_work_id"] for row in cur.fetchall()}
+
+            logger.info(
+                "Fetched %d film_work ids by %d genres and %d persons",
+                len(film_work_ids),
+                len(genre_ids),
+                len(person_ids),
+            )
+            return film_work_ids
+        except Exception:
+            logger.exception("Failed to fetch film_work ids by genres and persons")
+            raise
 
-        genres: list[GenreDTO] = []
-        max_genre_ts: datetime.datetime | None = genres_ts
+    def fetch_genres_by_ids(self, genre_ids: set[uuid.UUID]) -> list[GenreDTO]:
+        if not genre_ids:
+            return []
 
+        sql = """
+              SELECT g.id, g.name
+              FROM content.genre g
+              WHERE g.id = ANY (%s::uuid[]);
+              """
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (genres_ts, genres_ts))
-                rows = cur.fetchall()
+                cur.execute(sql, (list(genre_ids),))
+                genres = [
+                    GenreDTO(id=row["id"], name=row["name"]) for row in cur.fetchall()
+                ]
 
-                for row in rows:
-                    genres.append(
-                        GenreDTO(
-                            id=row["id"],
-                            name=row["name"],
-                        ),
-                    )
-                    updated_at = row["updated_at"]
-                    if max_genre_ts is None or max_genre_ts < updated_at:
-                        max_genre_ts = updated_at
+            logger.info("Fetched %d genres by ids", len(genres))
+            return genres
+        except Exception:
+            logger.exception("Failed to fetch genres by ids")
+            raise
 
-                logger.info(
-                    "Fetched %d genres, last updated_at=%s",
-                    len(genres),
-                    max_genre_ts,
-                )
-                return genres, max_genre_ts
+    def fetch_persons_by_ids(self, person_ids: set[uuid.UUID]) -> list[PersonDTO]:
+        if not person_ids:
+            return []
+
+        try:
+            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(PERSONS_BY_IDS_SQL, (list(person_ids),))
+                persons = [
+                    PersonDTO(id=row["id"], full_name=row["full_name"])
+                    for row in cur.fetchall()
+                ]
+
+            self._attach_films(persons)
+            logger.info("Fetched %d persons by ids", len(persons))
+            return persons
         except Exception:
-            logger.exception("Failed to fetch genres")
+            logger.exception("Failed to fetch persons by ids")
             raise
 
-    def fetch_changed_persons(
+    def fetch_snapshot_time(self) -> datetime.datetime:
+        # now() — время начала транзакции, то есть момент её снимка
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT now();")
+            return cur.fetchone()[0]
+
+    def fetch_oldest_open_write(self) -> datetime.datetime:
+        # начало самой старой пишущей транзакции, открытой в момент снимка:
+        # её строки в снимок не попали, а updated_at у них раньше now();
+        # без прав pg_read_all_stats чужие xact_start скрыты (NULL),
+        # тогда остаётся now()
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT least(now(), min(xact_start))
+                FROM pg_stat_activity
+                WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid();
+                """
+            )
+            return cur.fetchone()[0]
+
+    def fetch_oldest_unprocessed(
         self,
-        persons_ts: datetime.datetime | None = None,
-    ) -> tuple[list[PersonDTO], datetime.datetime | None]:
+        after: dict[str, Watermark],
+    ) -> datetime.datetime | None:
+        # самый старый updated_at среди строк за водяными знаками change
+        # feed; None — все источники дочитаны
         sql = """
-              SELECT p.id, p.full_name, p.updated_at
-              FROM content.person p
-              WHERE (%s IS NULL OR p.updated_at > %s)
-              ORDER BY p.updated_at ASC;
+              SELECT least(
+                  (SELECT min(fw.updated_at)
+                   FROM content.film_work fw
+                   WHERE %(film_work_ts)s IS NULL
+                      OR (fw.updated_at, fw.id)
+                             > (%(film_work_ts)s, %(film_work_id)s)),
+                  (SELECT min(g.updated_at)
+                   FROM content.genre g
+                            JOIN content.genre_film_work gfw ON g.id = gfw.genre_id
+                   WHERE %(movies_by_genre_ts)s IS NULL
+                      OR (g.updated_at, gfw.id)
+                             > (%(movies_by_genre_ts)s, %(movies_by_genre_id)s)),
+                  (SELECT min(p.updated_at)
+                   FROM content.person p
+                            JOIN content.person_film_work pfw ON p.id = pfw.person_id
+                   WHERE %(movies_by_person_ts)s IS NULL
+                      OR (p.updated_at, pfw.id)
+                             > (%(movies_by_person_ts)s, %(movies_by_person_id)s)),
+                  (SELECT min(gfw.updated_at)
+                   FROM content.genre_film_work gfw
+                   WHERE %(genre_film_work_ts)s IS NULL
+                      OR (gfw.updated_at, gfw.id)
+                             > (%(genre_film_work_ts)s, %(genre_film_work_id)s)),
+                  (SELECT min(pfw.updated_at)
+                   FROM content.person_film_work pfw
+                   WHERE %(person_film_work_ts)s IS NULL
+                      OR (pfw.updated_at, pfw.id)
+                             > (%(person_film_work_ts)s, %(person_film_work_id)s))
+              ) AS oldest;
               """
-        persons: list[PersonDTO] = []
-        max_persons_ts: datetime.datetime | None = persons_ts
+        params: dict = {}
+        for source in CHANGE_SOURCES:
+            params[f"{source}_ts"] = after[source].updated_at
+            params[f"{source}_id"] = after[source].id
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, (persons_ts, persons_ts))
-                rows = cur.fetchall()
+            with self.conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchone()[0]
+        except Exception:
+            logger.exception("Failed to fetch oldest unprocessed change")
+            raise
 
-                for row in rows:
-                    persons.append(
-                        PersonDTO(
-                            id=row["id"],
-                            full_name=row["full_name"],
-                        ),
-                    )
-                    updated_at = row["updated_at"]
-                    if max_persons_ts is None or max_persons_ts < updated_at:
-                        max_persons_ts = updated_at
+    def export_snapshot(self) -> str:
+        # id снимка текущей транзакции: другие соединения импортируют его
+        # через SET TRANSACTION SNAPSHOT и видят те же данные
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_export_snapshot();")
+            return cur.fetchone()[0]
 
-                logger.info(
-                    "Fetched %d persons, last updated_at=%s",
-                    len(persons),
-                    max_persons_ts,
-                )
-                return persons, max_persons_ts
+    def import_snapshot(self, snapshot_id: str) -> None:
+        # должен быть первым запросом транзакции REPEATABLE READ
+        with self.conn.cursor() as cur:
+            cur.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot_id,))
+
+    def iter_all_film_work_ids(
+        self,
+        shard: int = 0,
+        shards: int = 1,
+    ) -> Iterator[set[uuid.UUID]]:
+        # страницы по первичному ключу, как и остальные выборки экстрактора:
+        # каждый запрос ограничен LIMIT, серверный курсор не нужен.
+        # Шард — остаток от деления хэша id на число шардов; маска
+        # убирает знак, т.к. hashtext возвращает int4
+        sql = """
+              SELECT fw.id
+              FROM content.film_work fw
+              WHERE (%(after)s::uuid IS NULL OR fw.id > %(after)s::uuid)
+                AND (%(shards)s = 1
+                     OR (hashtext(fw.id::text)::bigint & 2147483647)
+                            %% %(shards)s = %(shard)s)
+              ORDER BY fw.id
+              LIMIT %(limit)s;
+              """
+        params = {
+            "after": None,
+            "shard": shard,
+            "shards": shards,
+            "limit": self.itersize,
+        }
+        try:
+            while True:
+                with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(sql, params)
+                    rows = cur.fetchall()
+                if not rows:
+                    return
+                yield {row["id"] for row in rows}
+                if len(rows) < self.itersize:
+                    return
+                params["after"] = rows[-1]["id"]
         except Exception:
-            logger.exception("Failed to fetch persons")
+            logger.exception("Failed to fetch all film_work ids")
             raise
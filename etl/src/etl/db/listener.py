@@ -0,0 +1,85 @@
+import logging
+import select
+import time
+import uuid
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extensions import connection as PgConnection
+
+from etl.dto.dto import ContentChanges
+
+logger = logging.getLogger(__name__)
+
+CONTENT_CHANGES_CHANNEL = "content_changes"
+
+
+class PostgresChangeListener:
+    """
+    Получает id изменённых строк content.* из уведомлений NOTIFY,
+    которые отправляет триггер content.notify_content_change.
+    Формат уведомления: "<film_work|genre|person|person_films>:<id>".
+    """
+
+    def __init__(
+        self,
+        connection: PgConnection,
+        debounce_seconds: float = 0.2,
+        max_batch_size: int = 1000,
+    ) -> None:
+        self.conn = connection
+        self.debounce_seconds = debounce_seconds
+        self.max_batch_size = max_batch_size
+
+    def listen(self) -> None:
+        self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.conn.cursor() as cur:
+            cur.execute(f"LISTEN {CONTENT_CHANGES_CHANNEL};")
+        logger.info("Listening to %s", CONTENT_CHANGES_CHANNEL)
+
+    def wait(self, timeout: float) -> ContentChanges:
+        changes = ContentChanges()
+        if not self._wait_readable(timeout):
+            return changes
+
+        # после первого уведомления немного ждём остальные, чтобы массовое
+        # редактирование ушло в индекс одной пачкой
+        deadline = time.monotonic() + self.debounce_seconds
+        received = 0
+        while True:
+            self.conn.poll()
+            while self.conn.notifies:
+                notify = self.conn.notifies.pop(0)
+                self._add(changes, notify.payload)
+                received += 1
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or received >= self.max_batch_size:
+                break
+            self._wait_readable(remaining)
+
+        logger.info("Received %d change notifications", received)
+        return changes
+
+    def _wait_readable(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self.conn], [], [], timeout)
+        return bool(readable)
+
+    @staticmethod
+    def _add(changes: ContentChanges, payload: str) -> None:
+        table, _, row_id = payload.partition(":")
+        try:
+            entity_id = uuid.UUID(row_id)
+        except ValueError:
+            logger.warning("Skip malformed notification %r", payload)
+            return
+
+        if table == "film_work":
+            changes.film_work_ids.add(entity_id)
+        elif table == "genre":
+            changes.genre_ids.add(entity_id)
+        elif table == "person":
+            changes.person_ids.add(entity_id)
+        elif table == "person_films":
+            changes.person_film_ids.add(entity_id)
+        else:
+            logger.warning("Skip notification for unknown table %r", table)
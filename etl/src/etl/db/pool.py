@@ -0,0 +1,116 @@
+import contextlib
+import logging
+import threading
+from collections.abc import Iterator
+
+import psycopg2
+import psycopg2.extras
+from psycopg2.extensions import connection as PgConnection
+from psycopg2.pool import ThreadedConnectionPool
+
+from etl.db.connection import pg_connection_params
+from etl.db.settings import DBSettings
+from etl.utils.backoff import backoff
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class PostgresConnectionPool:
+    """
+    Пул долгоживущих соединений ETL поверх ThreadedConnectionPool.
+    Перед выдачей соединение проверяется запросом SELECT 1, сломанные
+    соединения закрываются и открываются заново с повторами через backoff.
+    """
+
+    def __init__(
+        self,
+        settings: DBSettings,
+        min_size: int = 1,
+        max_size: int = 4,
+    ) -> None:
+        self.settings = settings
+        # min_size соединений держатся открытыми между циклами,
+        # остальные до max_size закрываются после использования
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool: ThreadedConnectionPool | None = None
+        # ThreadedConnectionPool не ждёт свободного соединения, а падает
+        self._slots = threading.BoundedSemaphore(max_size)
+        # адаптер uuid регистрируется глобально один раз, а не на каждом цикле
+        psycopg2.extras.register_uuid()
+
+    @contextlib.contextmanager
+    def connection(
+        self,
+        isolation_level: int | str = "DEFAULT",
+        readonly: bool = False,
+    ) -> Iterator[PgConnection]:
+        with self._slots:
+            conn = self._acquire()
+            broken = False
+            try:
+                # None в set_session оставляет прежний режим: соединение
+                # из пула могло остаться в режиме предыдущего владельца
+                conn.set_session(isolation_level=isolation_level, readonly=readonly)
+                yield conn
+            except CONNECTION_ERRORS:
+                broken = True
+                raise
+            finally:
+                if not broken and not conn.closed:
+                    broken = not self._reset(conn)
+                self._pool.putconn(conn, close=broken or bool(conn.closed))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+    @backoff(exceptions=CONNECTION_ERRORS)
+    def _acquire(self) -> PgConnection:
+        if self._pool is None:
+            # пул создаётся при первом обращении: сервис стартует,
+            # даже если база ещё недоступна
+            self._pool = ThreadedConnectionPool(
+                minconn=self.min_size,
+                maxconn=self.max_size,
+                **pg_connection_params(self.settings),
+            )
+
+        conn = self._pool.getconn()
+        if self._is_alive(conn):
+            return conn
+
+        logger.warning("Dropping broken Postgres connection")
+        self._pool.putconn(conn, close=True)
+        # новое соединение; при недоступной базе backoff повторит попытку
+        conn = self._pool.getconn()
+        if not self._is_alive(conn):
+            self._pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("Postgres connection is not alive")
+        return conn
+
+    @staticmethod
+    def _reset(conn: PgConnection) -> bool:
+        # незакрытая транзакция откатывается, режим сессии возвращается
+        # к настройкам сервера
+        try:
+            conn.rollback()
+            conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+        except CONNECTION_ERRORS:
+            return False
+        return True
+
+    @staticmethod
+    def _is_alive(conn: PgConnection) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+        except CONNECTION_ERRORS:
+            return False
+        return True
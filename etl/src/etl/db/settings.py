@@ -7,6 +7,9 @@ class DBSettings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_HOST: str
     POSTGRES_PORT: int
+    POSTGRES_ITERSIZE: int = 1000
+    POSTGRES_POOL_MIN_SIZE: int = 1
+    POSTGRES_POOL_MAX_SIZE: int = 4
 
     class Config:
         env_file = ".env"
@@ -1,12 +1,19 @@
 import datetime
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PersonFilmDTO:
+    id: uuid.UUID
+    roles: list[str]
 
 
 @dataclass
 class PersonDTO:
     id: uuid.UUID
     full_name: str
+    films: list[PersonFilmDTO] = field(default_factory=list)
 
 
 @dataclass
@@ -35,9 +42,31 @@ class FilmWorkDTO:
 
 
 @dataclass
-class MovieState:
-    film_work_ts: datetime.datetime | None
-    genre_ts: datetime.datetime | None
-    person_ts: datetime.datetime | None
-    genre_film_work_ts: datetime.datetime | None
-    person_film_work_ts: datetime.datetime | None
+class Watermark:
+    updated_at: datetime.datetime | None = None
+    id: uuid.UUID | None = None
+
+
+@dataclass
+class ContentChanges:
+    film_work_ids: set[uuid.UUID] = field(default_factory=set)
+    genre_ids: set[uuid.UUID] = field(default_factory=set)
+    person_ids: set[uuid.UUID] = field(default_factory=set)
+    # персоны, у которых изменились только связи с фильмами
+    person_film_ids: set[uuid.UUID] = field(default_factory=set)
+
+
+@dataclass
+class MovieRatingDTO:
+    movie_id: uuid.UUID
+    avg_score: float | None
+    count: int
+
+
+@dataclass
+class LoadBatch:
+    index_name: str
+    documents: list[dict]
+    watermarks: dict[str, Watermark]
+    op_type: str = "index"
+    check_hashes: bool = False
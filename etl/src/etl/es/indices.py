@@ -0,0 +1,175 @@
+"""
+Реестр индексов Elasticsearch: схема каждого индекса с номером версии
+и настройки, которые зависят от окружения и от режима работы индекса.
+
+Версия схемы пишется в _meta маппинга; если индекс в кластере старше
+объявленной версии, ETL предупреждает, что его нужно пересобрать через
+python -m etl.rebuild.
+"""
+
+from dataclasses import dataclass, field
+
+from etl.es.settings import EsSettings
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    version: int
+    mappings: dict
+    analysis: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class IndexTuning:
+    number_of_shards: int = 1
+    number_of_replicas: int = 1
+    refresh_interval: str = "1s"
+
+    def serving_settings(self) -> dict:
+        return {
+            "refresh_interval": self.refresh_interval,
+            "number_of_replicas": self.number_of_replicas,
+        }
+
+    @staticmethod
+    def bulk_settings() -> dict:
+        # на время полной загрузки: без обновления поиска и без реплик
+        return {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+def create_index_tuning(settings: EsSettings) -> IndexTuning:
+    return IndexTuning(
+        number_of_shards=settings.ES_NUMBER_OF_SHARDS,
+        number_of_replicas=settings.ES_NUMBER_OF_REPLICAS,
+        refresh_interval=settings.ES_REFRESH_INTERVAL,
+    )
+
+
+def index_body(spec: IndexSpec, tuning: IndexTuning, bulk: bool = False) -> dict:
+    settings = {
+        "number_of_shards": tuning.number_of_shards,
+        **(tuning.bulk_settings() if bulk else tuning.serving_settings()),
+    }
+    if spec.analysis:
+        settings["analysis"] = spec.analysis
+    return {
+        "settings": settings,
+        "mappings": {**spec.mappings, "_meta": {"version": spec.version}},
+    }
+
+
+MOVIES_INDEX = IndexSpec(
+    # 2: user_rating и user_rating_count
+    version=2,
+    analysis={
+        "filter": {
+            "english_stop": {"type": "stop", "stopwords": "_english_"},
+            "english_stemmer": {"type": "stemmer", "language": "english"},
+            "english_possessive_stemmer": {
+                "type": "stemmer",
+                "language": "possessive_english",
+            },
+            "russian_stop": {"type": "stop", "stopwords": "_russian_"},
+            "russian_stemmer": {"type": "stemmer", "language": "russian"},
+        },
+        "analyzer": {
+            "ru_en": {
+                "tokenizer": "standard",
+                "filter": [
+                    "lowercase",
+                    "english_stop",
+                    "english_stemmer",
+                    "english_possessive_stemmer",
+                    "russian_stop",
+                    "russian_stemmer",
+                ],
+            }
+        },
+    },
+    mappings={
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "imdb_rating": {"type": "float"},
+            # агрегаты оценок из ugc_content_api, пишутся частичным update
+            "user_rating": {"type": "float"},
+            "user_rating_count": {"type": "integer"},
+            "creation_date": {"type": "date"},
+            "genres": {
+                "type": "nested",
+                "dynamic": "strict",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "name": {
+                        "type": "text",
+                    },
+                },
+            },
+            "title": {
+                "type": "text",
+                "analyzer": "ru_en",
+                "fields": {"raw": {"type": "keyword"}},
+            },
+            "description": {"type": "text", "analyzer": "ru_en"},
+            "directors_names": {"type": "text", "analyzer": "ru_en"},
+            "actors_names": {"type": "text", "analyzer": "ru_en"},
+            "writers_names": {"type": "text", "analyzer": "ru_en"},
+            "directors": {
+                "type": "nested",
+                "dynamic": "strict",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "name": {"type": "text", "analyzer": "ru_en"},
+                },
+            },
+            "actors": {
+                "type": "nested",
+                "dynamic": "strict",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "name": {"type": "text", "analyzer": "ru_en"},
+                },
+            },
+            "writers": {
+                "type": "nested",
+                "dynamic": "strict",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "name": {"type": "text", "analyzer": "ru_en"},
+                },
+            },
+        },
+    },
+)
+
+GENRES_INDEX = IndexSpec(
+    version=1,
+    mappings={
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "name": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
+        },
+    },
+)
+
+PERSONS_INDEX = IndexSpec(
+    # 2: фильмы персоны с ролями
+    version=2,
+    mappings={
+        "dynamic": "strict",
+        "properties": {
+            "id": {"type": "keyword"},
+            "name": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
+            # фильмы персоны с ролями: список фильмов персоны в API
+            # читается из этого поля вместо nested-запроса к movies
+            "films": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "roles": {"type": "keyword"},
+                },
+            },
+        },
+    },
+)
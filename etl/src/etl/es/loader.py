@@ -1,13 +1,108 @@
 import logging
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import streaming_bulk
 
+from etl.es.indices import (
+    GENRES_INDEX,
+    MOVIES_INDEX,
+    PERSONS_INDEX,
+    IndexSpec,
+    IndexTuning,
+    index_body,
+)
+from etl.metrics import (
+    BATCH_SIZE,
+    BULK_ERRORS,
+    DOCUMENTS_LOADED,
+    DOCUMENTS_PER_SECOND,
+    STAGE_SECONDS,
+)
+from etl.state.dead_letter import DeadLetterQueue
+from etl.state.hashes import DocumentHashStore
 from etl.utils.backoff import backoff
 
 logger = logging.getLogger(__name__)
 
 
+def bulk_action(doc: dict, index_name: str, op_type: str = "index") -> dict:
+    # op_type: index — документ целиком, update — частичное обновление
+    # существующего документа, upsert — частичное обновление или
+    # создание; update/upsert не затирают поля, которых нет в документе;
+    # delete — удаление, из документа нужен только id
+    action: dict = {"_index": index_name, "_id": str(doc["id"])}
+    if op_type == "index":
+        action["_source"] = doc
+    elif op_type == "delete":
+        action["_op_type"] = "delete"
+    else:
+        action.update({"_op_type": "update", "doc": doc})
+        if op_type == "upsert":
+            action["doc_as_upsert"] = True
+    return action
+
+
+def warn_outdated_mappings(mappings: dict, spec: IndexSpec) -> None:
+    for name, mapping in mappings.items():
+        version = mapping["mappings"].get("_meta", {}).get("version", 1)
+        if version < spec.version:
+            logger.warning(
+                "Index %s has mapping v%s, expected v%s; rebuild it with "
+                "python -m etl.rebuild",
+                name,
+                version,
+                spec.version,
+            )
+
+
+def index_not_found(errors: list[dict]) -> bool:
+    return any(
+        next(iter(item.values())).get("error", {}).get("type")
+        == "index_not_found_exception"
+        for item in errors
+    )
+
+
+def record_bulk_result(
+    index_name: str,
+    op_type: str,
+    success: int,
+    errors: list[dict],
+    elapsed: float,
+) -> set[str]:
+    # метрики и логи одного прохода bulk_load; возвращает id документов,
+    # которые не удалось загрузить
+    DOCUMENTS_LOADED.labels(index=index_name).inc(success)
+    BULK_ERRORS.labels(index=index_name).inc(len(errors))
+    if elapsed > 0:
+        DOCUMENTS_PER_SECOND.labels(index=index_name).set(success / elapsed)
+
+    logger.info("Bulk result: success=%s", success)
+    if errors:
+        logger.error("Bulk errors: %s", errors[:3])
+
+    # частичное обновление документа, которого ещё нет в индексе, тоже
+    # ошибка: в очереди оно дождётся, пока документ появится
+    missing = sum(
+        1
+        for item in errors
+        if op_type == "update" and item["update"].get("status") == 404
+    )
+    if missing:
+        logger.info("%d updates of missing documents in %s", missing, index_name)
+
+    # документа, который удаляем, в индексе уже нет — это не ошибка
+    return {
+        str(next(iter(item.values())).get("_id"))
+        for item in errors
+        if not (op_type == "delete" and item["delete"].get("status") == 404)
+    }
+
+
 class ElasticsearchLoader:
     def __init__(
         self,
@@ -15,166 +110,224 @@ class ElasticsearchLoader:
         movies_index_name: str,
         genres_index_name: str,
         persons_index_name: str,
+        chunk_size: int = 500,
+        max_chunk_bytes: int = 10 * 1024 * 1024,
+        thread_count: int = 4,
+        queue_size: int = 4,
+        max_retries: int = 5,
+        dead_letters: DeadLetterQueue | None = None,
+        tuning: IndexTuning | None = None,
+        hash_store: DocumentHashStore | None = None,
     ) -> None:
         self.client = client
         self.movies_index_name = movies_index_name
         self.genres_index_name = genres_index_name
         self.persons_index_name = persons_index_name
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.thread_count = thread_count
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.dead_letters = dead_letters
+        self.tuning = tuning or IndexTuning()
+        self.hash_store = hash_store
+        # индексы, уже проверенные или созданные этим процессом: в горячем
+        # цикле ensure_*_index не ходит в кластер
+        self._ready_indices: set[str] = set()
 
-    @backoff()
     def ensure_movies_index(self) -> None:
-        if self.client.indices.exists(index=self.movies_index_name):
-            logger.debug("Index %s exists", self.movies_index_name)
-            return
+        self._ensure_index(self.movies_index_name, MOVIES_INDEX)
 
-        body = {
-            "settings": {
-                "refresh_interval": "1s",
-                "analysis": {
-                    "filter": {
-                        "english_stop": {"type": "stop", "stopwords": "_english_"},
-                        "english_stemmer": {"type": "stemmer", "language": "english"},
-                        "english_possessive_stemmer": {
-                            "type": "stemmer",
-                            "language": "possessive_english",
-                        },
-                        "russian_stop": {"type": "stop", "stopwords": "_russian_"},
-                        "russian_stemmer": {"type": "stemmer", "language": "russian"},
-                    },
-                    "analyzer": {
-                        "ru_en": {
-                            "tokenizer": "standard",
-                            "filter": [
-                                "lowercase",
-                                "english_stop",
-                                "english_stemmer",
-                                "english_possessive_stemmer",
-                                "russian_stop",
-                                "russian_stemmer",
-                            ],
-                        }
-                    },
-                },
-            },
-            "mappings": {
-                "dynamic": "strict",
-                "properties": {
-                    "id": {"type": "keyword"},
-                    "imdb_rating": {"type": "float"},
-                    "creation_date": {"type": "date"},
-                    "genres": {
-                        "type": "nested",
-                        "dynamic": "strict",
-                        "properties": {
-                            "id": {"type": "keyword"},
-                            "name": {
-                                "type": "text",
-                            },
-                        },
-                    },
-                    "title": {
-                        "type": "text",
-                        "analyzer": "ru_en",
-                        "fields": {"raw": {"type": "keyword"}},
-                    },
-                    "description": {"type": "text", "analyzer": "ru_en"},
-                    "directors_names": {"type": "text", "analyzer": "ru_en"},
-                    "actors_names": {"type": "text", "analyzer": "ru_en"},
-                    "writers_names": {"type": "text", "analyzer": "ru_en"},
-                    "directors": {
-                        "type": "nested",
-                        "dynamic": "strict",
-                        "properties": {
-                            "id": {"type": "keyword"},
-                            "name": {"type": "text", "analyzer": "ru_en"},
-                        },
-                    },
-                    "actors": {
-                        "type": "nested",
-                        "dynamic": "strict",
-                        "properties": {
-                            "id": {"type": "keyword"},
-                            "name": {"type": "text", "analyzer": "ru_en"},
-                        },
-                    },
-                    "writers": {
-                        "type": "nested",
-                        "dynamic": "strict",
-                        "properties": {
-                            "id": {"type": "keyword"},
-                            "name": {"type": "text", "analyzer": "ru_en"},
-                        },
-                    },
-                },
-            },
-        }
+    def ensure_genres_index(self) -> None:
+        self._ensure_index(self.genres_index_name, GENRES_INDEX)
 
-        try:
-            self.client.indices.create(index=self.movies_index_name, body=body)
-            logger.info("Created index %s", self.movies_index_name)
-        except Exception:
-            logger.error("Failed to create movies index")
-            raise
+    def ensure_persons_index(self) -> None:
+        self._ensure_index(self.persons_index_name, PERSONS_INDEX)
+
+    def _ensure_index(self, index_name: str, spec: IndexSpec) -> None:
+        if index_name in self._ready_indices:
+            return
+        self._check_index(index_name, spec)
+        self._ready_indices.add(index_name)
 
     @backoff()
-    def ensure_genres_index(self) -> None:
-        if self.client.indices.exists(index=self.genres_index_name):
-            logger.debug("Index %s exists", self.genres_index_name)
+    def _check_index(self, index_name: str, spec: IndexSpec) -> None:
+        # имя может быть как самим индексом, так и алиасом на него
+        if not self.client.indices.exists(index=index_name):
+            self.create_index(
+                index_name=index_name,
+                body=index_body(spec, self.tuning),
+            )
+            # хэши описывают документы прежнего индекса, в новом их нет
+            if self.hash_store is not None:
+                self.hash_store.clear(index_name)
             return
 
-        body = {
-            "mappings": {
-                "dynamic": "strict",
-                "properties": {
-                    "id": {"type": "keyword"},
-                    "name": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
-                },
-            }
-        }
+        mappings = self.client.indices.get_mapping(index=index_name)
+        warn_outdated_mappings(mappings, spec)
+        logger.debug("Index %s exists", index_name)
+
+    def create_index(self, index_name: str, body: dict) -> None:
         try:
-            self.client.indices.create(index=self.genres_index_name, body=body)
-            logger.info("Created index %s", self.genres_index_name)
+            self.client.indices.create(index=index_name, body=body)
+            logger.info("Created index %s", index_name)
         except Exception:
-            logger.error("Failed to create genres index")
+            logger.error("Failed to create index %s", index_name)
             raise
 
     @backoff()
-    def ensure_persons_index(self) -> None:
-        if self.client.indices.exists(index=self.persons_index_name):
-            logger.debug("Index %s exists", self.persons_index_name)
-            return
+    def get_alias_indices(self, alias: str) -> list[str]:
+        if not self.client.indices.exists_alias(name=alias):
+            return []
+        return list(self.client.indices.get_alias(name=alias).keys())
 
-        body = {
-            "mappings": {
-                "dynamic": "strict",
-                "properties": {
-                    "id": {"type": "keyword"},
-                    "name": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
-                },
-            }
-        }
-        try:
-            self.client.indices.create(index=self.persons_index_name, body=body)
-            logger.info("Created index %s", self.persons_index_name)
-        except Exception:
-            logger.error("Failed to create persons index")
-            raise
+    @backoff()
+    def next_index_version(self, alias: str) -> int:
+        indices = self.client.indices.get(
+            index=f"{alias}_v*",
+            ignore_unavailable=True,
+            allow_no_indices=True,
+        )
+        versions = [
+            int(version)
+            for name in indices
+            if (version := name.removeprefix(f"{alias}_v")).isdigit()
+        ]
+        return max(versions, default=0) + 1
+
+    @backoff()
+    def update_index_settings(self, index_name: str, settings: dict) -> None:
+        self.client.indices.put_settings(index=index_name, settings=settings)
+        logger.info("Updated settings of %s: %s", index_name, settings)
+
+    @backoff()
+    def optimize_index(self, index_name: str) -> None:
+        self.client.indices.refresh(index=index_name)
+        self.client.options(request_timeout=3600).indices.forcemerge(
+            index=index_name,
+            max_num_segments=1,
+        )
+        logger.info("Force merged %s", index_name)
 
     @backoff()
+    def swap_alias(self, alias: str, index_name: str) -> list[str]:
+        # перенос алиаса одним запросом: поиск без паузы переключается на
+        # новый индекс; индекс с именем алиаса (из времён до алиасов)
+        # удаляется в том же запросе
+        old_indices = self.get_alias_indices(alias)
+        actions: list[dict] = [
+            {"remove": {"index": old_index, "alias": alias}}
+            for old_index in old_indices
+            if old_index != index_name
+        ]
+        if not old_indices and self.client.indices.exists(index=alias):
+            actions.append({"remove_index": {"index": alias}})
+        actions.append({"add": {"index": index_name, "alias": alias}})
+
+        self.client.indices.update_aliases(actions=actions)
+        logger.info("Alias %s now points to %s", alias, index_name)
+        return [old_index for old_index in old_indices if old_index != index_name]
+
+    @backoff()
+    def delete_index(self, index_name: str) -> None:
+        self.client.indices.delete(index=index_name, ignore_unavailable=True)
+        self._ready_indices.discard(index_name)
+        logger.info("Deleted index %s", index_name)
+
     def bulk_load(
         self,
-        documents: list[dict],
+        documents: Iterable[dict],
         index_name: str,
-    ) -> None:
-        if not documents:
+        op_type: str = "index",
+        dead_letter_queue: str | None = None,
+    ) -> set[str]:
+        # op_type — см. bulk_action; dead_letter_queue — имя очереди
+        # для упавших документов, по умолчанию имя индекса
+        #
+        # документы читаются лениво и уходят в пул потоков пачками по
+        # chunk_size; пока в работе thread_count + queue_size пачек, чтение
+        # (а с ним и трансформация) ждёт свободного места
+        slots = threading.BoundedSemaphore(self.thread_count + self.queue_size)
+        futures: list[Future] = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.thread_count) as pool:
+            for chunk in self._iter_chunks(documents, index_name, op_type):
+                BATCH_SIZE.labels(index=index_name).observe(len(chunk))
+                slots.acquire()
+                future = pool.submit(self._load_chunk, chunk, index_name)
+                future.add_done_callback(lambda _: slots.release())
+                futures.append(future)
+
+        if not futures:
             logger.debug("No documents to load")
-            return
+            return set()
 
-        actions = [
-            {"_index": index_name, "_id": str(doc["id"]), "_source": doc}
-            for doc in documents
-        ]
-        success, errors = bulk(self.client, actions, raise_on_error=False)
-        logger.info("Bulk result: success=%s", success)
-        if errors:
-            logger.error("Bulk errors: %s", errors[:3])
+        success = 0
+        errors: list[dict] = []
+        for future in futures:
+            chunk_success, chunk_errors = future.result()
+            success += chunk_success
+            errors.extend(chunk_errors)
+
+        # скорость считается по всему проходу, вместе с извлечением
+        # и трансформацией, которые идут параллельно загрузке
+        failed_ids = record_bulk_result(
+            index_name=index_name,
+            op_type=op_type,
+            success=success,
+            errors=errors,
+            elapsed=time.perf_counter() - started,
+        )
+
+        # индекс удалили в обход ETL: в следующем цикле проверим его заново
+        if index_not_found(errors):
+            self._ready_indices.discard(index_name)
+
+        # id документов, которые не удалось загрузить; без очереди
+        # они теряются до следующего изменения строки в базе
+        if failed_ids and self.dead_letters is not None:
+            self.dead_letters.add(
+                index_name=dead_letter_queue or index_name,
+                doc_ids=failed_ids,
+            )
+        return failed_ids
+
+    def _iter_chunks(
+        self,
+        documents: Iterable[dict],
+        index_name: str,
+        op_type: str = "index",
+    ) -> Iterator[list[dict]]:
+        chunk: list[dict] = []
+        for doc in documents:
+            chunk.append(bulk_action(doc, index_name, op_type))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @backoff()
+    def _load_chunk(
+        self,
+        actions: list[dict],
+        index_name: str,
+    ) -> tuple[int, list[dict]]:
+        # streaming_bulk сам повторяет только отклонённые с 429 документы
+        # (es_rejected_execution), ошибки соединения повторяют пачку целиком
+        success = 0
+        errors: list[dict] = []
+        with STAGE_SECONDS.labels(index=index_name, stage="load").time():
+            for ok, item in streaming_bulk(
+                self.client,
+                actions,
+                chunk_size=self.chunk_size,
+                max_chunk_bytes=self.max_chunk_bytes,
+                max_retries=self.max_retries,
+                raise_on_error=False,
+            ):
+                if ok:
+                    success += 1
+                else:
+                    errors.append(item)
+        return success, errors
@@ -9,11 +9,29 @@ class EsPerson(BaseModel):
     name: str
 
 
+class EsPersonFilm(BaseModel):
+    id: uuid.UUID
+    roles: list[str]
+
+
+class EsPersonDocument(BaseModel):
+    id: uuid.UUID
+    name: str
+    films: list[EsPersonFilm]
+
+
 class EsGenre(BaseModel):
     id: uuid.UUID
     name: str
 
 
+class EsMovieRating(BaseModel):
+    # частичный документ фильма: обновляет только поля оценок
+    id: uuid.UUID
+    user_rating: float | None
+    user_rating_count: int
+
+
 class FilmEsDocument(BaseModel):
     id: uuid.UUID
     imdb_rating: float | None
@@ -7,6 +7,14 @@ class EsSettings(BaseSettings):
     MOVIES_ES_INDEX: str
     GENRES_ES_INDEX: str
     PERSONS_ES_INDEX: str
+    ES_BULK_CHUNK_SIZE: int = 500
+    ES_BULK_MAX_CHUNK_BYTES: int = 10 * 1024 * 1024
+    ES_BULK_THREAD_COUNT: int = 4
+    ES_BULK_QUEUE_SIZE: int = 4
+    ES_BULK_MAX_RETRIES: int = 5
+    ES_NUMBER_OF_SHARDS: int = 1
+    ES_NUMBER_OF_REPLICAS: int = 1
+    ES_REFRESH_INTERVAL: str = "1s"
 
     class Config:
         env_file = ".env"
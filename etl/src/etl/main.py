@@ -1,26 +1,44 @@
+import argparse
+import asyncio
 import datetime
 import logging
 import os
 import time
 import uuid
+from concurrent.futures import Executor
 
 import psycopg2
-import psycopg2.extras
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch
-from psycopg2.extensions import connection as PgConnection
+from prometheus_client import start_http_server
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
+from pymongo.errors import ConnectionFailure
 
+from etl.aio.pipeline import run_async
 from etl.db.connection import create_pg_connection
-from etl.db.extractor import PostgresExtractor
+from etl.db.extractor import CHANGE_SOURCES, PostgresExtractor
+from etl.db.listener import PostgresChangeListener
+from etl.db.pool import PostgresConnectionPool
 from etl.db.settings import DBSettings
-from etl.dto.dto import FilmWorkDTO, MovieState
+from etl.dto.dto import ContentChanges
+from etl.es.indices import create_index_tuning
 from etl.es.loader import ElasticsearchLoader
 from etl.es.settings import EsSettings
+from etl.metrics import DEAD_LETTERS, REPLICATION_LAG, STAGE_SECONDS, timed_iter
+from etl.mongo.extractor import MongoRatingsExtractor, create_ratings_extractor
+from etl.mongo.settings import MongoSettings
+from etl.state.dead_letter import DeadLetterQueue
+from etl.state.hashes import DocumentHashStore
+from etl.state.settings import StateSettings
 from etl.state.state import State
-from etl.state.storage import JsonFileStorage
-from etl.transformer.film_work import transform_film_work
+from etl.state.storage import create_storage
+from etl.transformer.film_work import (
+    film_work_row_to_document,
+    film_work_rows_to_documents,
+)
 from etl.transformer.genre import transform_genre
 from etl.transformer.person import transform_person
+from etl.transformer.rating import transform_rating
 
 logging.basicConfig(
     level=os.getenv("LOG_LEVEL", "DEBUG"),
@@ -31,183 +49,618 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", 10))
-
-
-def process_movies(
+ETL_PUSH_MODE = os.getenv("ETL_PUSH_MODE", "false").lower() == "true"
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", 300))
+TRANSFORM_CHUNK_SIZE = 250
+# порт HTTP-эндпоинта /metrics для Prometheus; 0 — не поднимать
+ETL_METRICS_PORT = int(os.getenv("ETL_METRICS_PORT", 8001))
+DEAD_LETTER_BATCH_SIZE = int(os.getenv("DEAD_LETTER_BATCH_SIZE", 100))
+DEAD_LETTER_MAX_ATTEMPTS = int(os.getenv("DEAD_LETTER_MAX_ATTEMPTS", 10))
+# перенос пользовательских оценок из MongoDB в индекс фильмов
+ETL_RATINGS_SYNC = os.getenv("ETL_RATINGS_SYNC", "false").lower() == "true"
+# пачек, которые асинхронный цикл извлекает впрок, пока идёт загрузка
+ETL_ASYNC_QUEUE_SIZE = int(os.getenv("ETL_ASYNC_QUEUE_SIZE", 4))
+
+
+def load_film_works(
+    extractor: PostgresExtractor,
     loader: ElasticsearchLoader,
-    conn: PgConnection,
-    film_work_ts: datetime.datetime | None = None,
-    genre_ts: datetime.datetime | None = None,
-    person_ts: datetime.datetime | None = None,
-    genre_film_work_ts: datetime.datetime | None = None,
-    person_film_work_ts: datetime.datetime | None = None,
-) -> MovieState:
-    # получаем данные
-    extractor = PostgresExtractor(connection=conn)
-    all_film_work_ids: set[uuid.UUID] = set()
-
-    ids, film_work_ts = extractor.fetch_changed_film_work_ids(
-        film_work_ts=film_work_ts,
+    film_work_ids: set[uuid.UUID],
+    index_name: str | None = None,
+    hash_store: DocumentHashStore | None = None,
+    transform_pool: Executor | None = None,
+    op_type: str = "upsert",
+) -> set[str]:
+    index_name = index_name or loader.movies_index_name
+    with STAGE_SECONDS.labels(index=index_name, stage="extract").time():
+        rows = extractor.fetch_film_work_rows(film_work_ids=film_work_ids)
+    failed_ids = load_film_work_rows(
+        loader=loader,
+        rows=rows,
+        index_name=index_name,
+        hash_store=hash_store,
+        transform_pool=transform_pool,
+        op_type=op_type,
     )
-    all_film_work_ids |= ids
-
-    ids, genre_ts = extractor.fetch_film_work_ids_by_changed_genres(
-        genre_ts=genre_ts,
+    # фильмы, которых уже нет в базе, удаляются из индекса
+    return failed_ids | delete_documents(
+        loader=loader,
+        index_name=index_name,
+        doc_ids={str(i) for i in film_work_ids} - {str(row["id"]) for row in rows},
+        hash_store=hash_store,
     )
-    all_film_work_ids |= ids
 
-    ids, person_ts = extractor.fetch_film_work_ids_by_changed_persons(
-        person_ts=person_ts,
-    )
-    all_film_work_ids |= ids
 
-    ids, genre_film_work_ts = extractor.fetch_film_work_ids_by_changed_genre_film_work(
-        genre_film_work_ts=genre_film_work_ts,
+def load_film_work_rows(
+    loader: ElasticsearchLoader,
+    rows: list[dict],
+    index_name: str | None = None,
+    hash_store: DocumentHashStore | None = None,
+    transform_pool: Executor | None = None,
+    op_type: str = "upsert",
+) -> set[str]:
+    # по умолчанию документ фильма обновляется частично: поля оценок,
+    # которые пишет process_ratings, при этом сохраняются
+    if transform_pool is None:
+        # трансформация ленивая: документы собираются по мере того,
+        # как загрузчик забирает пачки
+        film_work_documents = (film_work_row_to_document(row) for row in rows)
+    else:
+        # при полной загрузке строки трансформируются в пуле процессов
+        # пачками; порядок документов для загрузки не важен
+        chunks = [
+            rows[start : start + TRANSFORM_CHUNK_SIZE]
+            for start in range(0, len(rows), TRANSFORM_CHUNK_SIZE)
+        ]
+        film_work_documents = (
+            document
+            for documents in transform_pool.map(film_work_rows_to_documents, chunks)
+            for document in documents
+        )
+
+    index_name = index_name or loader.movies_index_name
+    film_work_documents = timed_iter(
+        film_work_documents,
+        index=index_name,
+        stage="transform",
     )
-    all_film_work_ids |= ids
 
-    ids, person_film_work_ts = (
-        extractor.fetch_film_work_ids_by_changed_person_film_work(
-            person_film_work_ts=person_film_work_ts,
+    # фан-аут по жанрам и персонам часто даёт тот же документ, что уже
+    # лежит в индексе, — такие документы в Elasticsearch не отправляем
+    if hash_store is not None:
+        film_work_documents = hash_store.filter_changed(
+            index_name=index_name,
+            documents=film_work_documents,
         )
-    )
-    all_film_work_ids |= ids
 
-    if not all_film_work_ids:
-        logger.info("No changes detected")
-        return MovieState(
-            film_work_ts=film_work_ts,
-            genre_ts=genre_ts,
-            person_ts=person_ts,
-            genre_film_work_ts=genre_film_work_ts,
-            person_film_work_ts=person_film_work_ts,
+    # загружаем данные; если загрузка упала, ожидающие хэши сбрасываются
+    try:
+        failed_ids = loader.bulk_load(
+            documents=film_work_documents,
+            index_name=index_name,
+            op_type=op_type,
         )
+        if hash_store is not None:
+            hash_store.commit(index_name=index_name, failed_ids=failed_ids)
+    finally:
+        if hash_store is not None:
+            hash_store.discard(index_name)
 
-    changed_film_works: list[FilmWorkDTO] = extractor.fetch_film_work_for_index(
-        film_work_ids=all_film_work_ids,
-    )
+    return failed_ids
 
-    # трансформируем данные
-    film_work_documents: list[dict] = []
-    for film_work in changed_film_works:
-        transformed_film_work = transform_film_work(film_work=film_work)
-        film_work_documents.append(
-            transformed_film_work.model_dump(mode="json"),
-        )
 
-    # загружаем данные
-    loader.ensure_movies_index()
-    loader.bulk_load(
-        documents=film_work_documents,
-        index_name="movies",
-    )
+def process_movies(
+    loader: ElasticsearchLoader,
+    extractor: PostgresExtractor,
+    state: State,
+    hash_store: DocumentHashStore | None = None,
+) -> None:
+    # источники изменений читаются по ключу (updated_at, id) страницами
+    # общего запроса; после загрузки страницы водяные знаки сразу
+    # сохраняются, так что перезапуск продолжает с последней страницы
+    after = {source: state.get_watermark(source) for source in CHANGE_SOURCES}
 
-    return MovieState(
-        film_work_ts=film_work_ts,
-        genre_ts=genre_ts,
-        person_ts=person_ts,
-        genre_film_work_ts=genre_film_work_ts,
-        person_film_work_ts=person_film_work_ts,
-    )
+    loader.ensure_movies_index()
+    # id сверяются только с предыдущей страницей: соседние страницы разных
+    # источников чаще всего пересекаются, а память не растёт с каталогом;
+    # повтор более раннего фильма отсеет хранилище хэшей
+    previous_film_work_ids: set[uuid.UUID] = set()
+    loaded_count = 0
+
+    for film_work_ids, watermarks in timed_iter(
+        extractor.iter_change_feed(after=after),
+        index=loader.movies_index_name,
+        stage="extract",
+    ):
+        new_film_work_ids = film_work_ids - previous_film_work_ids
+        if new_film_work_ids:
+            load_film_works(
+                extractor=extractor,
+                loader=loader,
+                film_work_ids=new_film_work_ids,
+                hash_store=hash_store,
+            )
+            loaded_count += len(new_film_work_ids)
+        previous_film_work_ids = film_work_ids
+        state.set_watermarks(watermarks)
+
+    if not loaded_count:
+        logger.info("No changes detected")
 
 
 def process_genres(
     loader: ElasticsearchLoader,
-    conn: PgConnection,
-    genre_ts: datetime.datetime | None = None,
-) -> datetime.datetime | None:
-    extractor = PostgresExtractor(connection=conn)
-    genres, genre_ts = extractor.fetch_changed_genres(genres_ts=genre_ts)
-    if not genres:
-        return genre_ts
-
-    docs = [transform_genre(g).model_dump(mode="json") for g in genres]
+    extractor: PostgresExtractor,
+    state: State,
+) -> None:
+    # водяной знак (updated_at, id) сохраняется после каждой страницы:
+    # массовое обновление разбирается пачками по itersize строк, а
+    # перезапуск продолжает с последней загруженной страницы
     loader.ensure_genres_index()
-    loader.bulk_load(
-        documents=docs,
-        index_name="genres",
-    )
-
-    return genre_ts
+    for genres, watermark in timed_iter(
+        extractor.iter_changed_genres(after=state.get_watermark("genre")),
+        index=loader.genres_index_name,
+        stage="extract",
+    ):
+        docs = [transform_genre(g).model_dump(mode="json") for g in genres]
+        loader.bulk_load(
+            documents=docs,
+            index_name=loader.genres_index_name,
+        )
+        state.set_watermarks({"genre": watermark})
 
 
 def process_persons(
     loader: ElasticsearchLoader,
-    conn: PgConnection,
-    person_ts: datetime.datetime | None = None,
-) -> datetime.datetime | None:
-    extractor = PostgresExtractor(connection=conn)
-    persons, person_ts = extractor.fetch_changed_persons(persons_ts=person_ts)
-    if not persons:
-        return person_ts
-
-    docs = [transform_person(p).model_dump(mode="json") for p in persons]
+    extractor: PostgresExtractor,
+    state: State,
+) -> None:
+    loader.ensure_persons_index()
+    for persons, watermark in timed_iter(
+        extractor.iter_changed_persons(after=state.get_watermark("person")),
+        index=loader.persons_index_name,
+        stage="extract",
+    ):
+        docs = [transform_person(p).model_dump(mode="json") for p in persons]
+        loader.bulk_load(
+            documents=docs,
+            index_name=loader.persons_index_name,
+        )
+        state.set_watermarks({"person": watermark})
+
+
+def process_person_films(
+    loader: ElasticsearchLoader,
+    extractor: PostgresExtractor,
+    state: State,
+) -> None:
+    # изменения person_film_work меняют список фильмов персоны,
+    # хотя сама строка content.person при этом не обновляется
     loader.ensure_persons_index()
-    loader.bulk_load(
-        documents=docs,
-        index_name="persons",
-    )
+    for person_ids, watermark in timed_iter(
+        extractor.iter_person_ids_by_film_links(
+            after=state.get_watermark("person_film"),
+        ),
+        index=loader.persons_index_name,
+        stage="extract",
+    ):
+        persons = extractor.fetch_persons_by_ids(person_ids=person_ids)
+        loader.bulk_load(
+            documents=[transform_person(p).model_dump(mode="json") for p in persons],
+            index_name=loader.persons_index_name,
+        )
+        state.set_watermarks({"person_film": watermark})
+
+
+def process_ratings(
+    loader: ElasticsearchLoader,
+    ratings_extractor: MongoRatingsExtractor,
+    state: State,
+) -> None:
+    loader.ensure_movies_index()
+    # изменённые и удалённые оценки — два журнала со своими водяными знаками
+    feeds = {
+        "ratings_ts": ratings_extractor.iter_changed_ratings,
+        "rating_deletions_ts": ratings_extractor.iter_deleted_ratings,
+    }
+    for state_key, iter_ratings in feeds.items():
+        for ratings, last_ts in timed_iter(
+            iter_ratings(since=state.get(state_key)),
+            index=loader.movies_index_name,
+            stage="extract",
+        ):
+            loader.bulk_load(
+                documents=[
+                    transform_rating(r).model_dump(mode="json") for r in ratings
+                ],
+                index_name=loader.movies_index_name,
+                op_type="update",
+                dead_letter_queue=ratings_queue(loader.movies_index_name),
+            )
+            state.set(state_key, last_ts)
+
+    if loader.dead_letters is not None:
+        retry_dead_ratings(
+            loader=loader,
+            ratings_extractor=ratings_extractor,
+            dead_letters=loader.dead_letters,
+        )
+
+
+def ratings_queue(index_name: str) -> str:
+    # оценки фильмов ждут в своей очереди: их повтор перечитывает
+    # агрегат из MongoDB, а не документ фильма из Postgres
+    return f"{index_name}:ratings"
+
+
+def retry_dead_ratings(
+    loader: ElasticsearchLoader,
+    ratings_extractor: MongoRatingsExtractor,
+    dead_letters: DeadLetterQueue,
+) -> None:
+    # чаще всего это оценка фильма, который ещё не попал в индекс:
+    # водяной знак оценок уже сдвинут, и без повтора она потеряется
+    queue = ratings_queue(loader.movies_index_name)
+    movie_ids = dead_letters.take(index_name=queue, limit=DEAD_LETTER_BATCH_SIZE)
+    if movie_ids:
+        ratings = ratings_extractor.fetch_ratings(movie_ids)
+        failed_ids = loader.bulk_load(
+            documents=[transform_rating(r).model_dump(mode="json") for r in ratings],
+            index_name=loader.movies_index_name,
+            op_type="update",
+            dead_letter_queue=queue,
+        )
+        dead_letters.resolve(index_name=queue, doc_ids=set(movie_ids) - failed_ids)
 
-    return person_ts
+    DEAD_LETTERS.labels(index=queue).set(dead_letters.count(queue))
 
 
 def run_once(
     state: State,
     loader: ElasticsearchLoader,
-    db_settings: DBSettings,
+    pool: PostgresConnectionPool,
+    itersize: int = 1000,
+    hash_store: DocumentHashStore | None = None,
+    ratings_extractor: MongoRatingsExtractor | None = None,
 ):
-    conn = create_pg_connection(settings=db_settings)
-    psycopg2.extras.register_uuid(conn_or_curs=conn)
-    try:
-        # получаем состояние из хранилища
+    # все запросы цикла видят один снимок данных: id, уже загруженные
+    # из одного источника, можно пропускать в остальных
+    with pool.connection(
+        isolation_level=ISOLATION_LEVEL_REPEATABLE_READ,
+        readonly=True,
+    ) as conn:
+        extractor = PostgresExtractor(connection=conn, itersize=itersize)
+
+        process_genres(loader=loader, extractor=extractor, state=state)
+        process_persons(loader=loader, extractor=extractor, state=state)
+        process_person_films(loader=loader, extractor=extractor, state=state)
+        process_movies(
+            loader=loader,
+            extractor=extractor,
+            state=state,
+            hash_store=hash_store,
+        )
+        if loader.dead_letters is not None:
+            retry_dead_letters(
+                loader=loader,
+                extractor=extractor,
+                dead_letters=loader.dead_letters,
+                hash_store=hash_store,
+            )
+
+    if ratings_extractor is not None:
+        process_ratings(
+            loader=loader,
+            ratings_extractor=ratings_extractor,
+            state=state,
+        )
 
-        genre_ts = state.get("genre_ts")
-        person_ts = state.get("person_ts")
+    update_replication_lag(state=state, pool=pool, itersize=itersize)
 
-        film_work_ts = state.get("film_work_ts")
-        genre_film_work_ts = state.get("genre_film_work_ts")
-        person_film_work_ts = state.get("person_film_work_ts")
 
-        genre_ts = process_genres(
+def retry_dead_letters(
+    loader: ElasticsearchLoader,
+    extractor: PostgresExtractor,
+    dead_letters: DeadLetterQueue,
+    hash_store: DocumentHashStore | None = None,
+) -> None:
+    # документы перечитываются из базы по id; документы удалённых из базы
+    # строк удаляются из индекса, а снова упавшие bulk_load вернёт
+    # в очередь с увеличенным числом попыток
+    movie_ids = dead_letters.take(
+        index_name=loader.movies_index_name,
+        limit=DEAD_LETTER_BATCH_SIZE,
+    )
+    if movie_ids:
+        failed_ids = load_film_works(
+            extractor=extractor,
+            loader=loader,
+            film_work_ids={uuid.UUID(doc_id) for doc_id in movie_ids},
+            hash_store=hash_store,
+        )
+        dead_letters.resolve(
+            index_name=loader.movies_index_name,
+            doc_ids=set(movie_ids) - failed_ids,
+        )
+
+    genre_ids = dead_letters.take(
+        index_name=loader.genres_index_name,
+        limit=DEAD_LETTER_BATCH_SIZE,
+    )
+    if genre_ids:
+        genres = extractor.fetch_genres_by_ids(
+            genre_ids={uuid.UUID(doc_id) for doc_id in genre_ids},
+        )
+        failed_ids = loader.bulk_load(
+            documents=[transform_genre(g).model_dump(mode="json") for g in genres],
+            index_name=loader.genres_index_name,
+        ) | delete_documents(
             loader=loader,
-            conn=conn,
-            genre_ts=genre_ts,
+            index_name=loader.genres_index_name,
+            doc_ids=set(genre_ids) - {str(g.id) for g in genres},
         )
-        person_ts = process_persons(
+        dead_letters.resolve(
+            index_name=loader.genres_index_name,
+            doc_ids=set(genre_ids) - failed_ids,
+        )
+
+    person_ids = dead_letters.take(
+        index_name=loader.persons_index_name,
+        limit=DEAD_LETTER_BATCH_SIZE,
+    )
+    if person_ids:
+        persons = extractor.fetch_persons_by_ids(
+            person_ids={uuid.UUID(doc_id) for doc_id in person_ids},
+        )
+        failed_ids = loader.bulk_load(
+            documents=[transform_person(p).model_dump(mode="json") for p in persons],
+            index_name=loader.persons_index_name,
+        ) | delete_documents(
             loader=loader,
-            conn=conn,
-            person_ts=person_ts,
+            index_name=loader.persons_index_name,
+            doc_ids=set(person_ids) - {str(p.id) for p in persons},
+        )
+        dead_letters.resolve(
+            index_name=loader.persons_index_name,
+            doc_ids=set(person_ids) - failed_ids,
+        )
+
+    for index_name in (
+        loader.movies_index_name,
+        loader.genres_index_name,
+        loader.persons_index_name,
+    ):
+        DEAD_LETTERS.labels(index=index_name).set(dead_letters.count(index_name))
+
+
+def update_replication_lag(
+    state: State,
+    pool: PostgresConnectionPool,
+    itersize: int = 1000,
+) -> None:
+    # отставание считается вне снимка цикла: за время цикла в базе могли
+    # появиться новые изменения, их и должна показывать метрика
+    after = {source: state.get_watermark(source) for source in CHANGE_SOURCES}
+    with pool.connection(readonly=True) as conn:
+        extractor = PostgresExtractor(connection=conn, itersize=itersize)
+        oldest = extractor.fetch_oldest_unprocessed(after=after)
+
+    if oldest is None:
+        REPLICATION_LAG.set(0)
+        return
+    lag = datetime.datetime.now(datetime.timezone.utc) - oldest
+    REPLICATION_LAG.set(max(lag.total_seconds(), 0))
+    logger.info("Replication lag: %.1fs", lag.total_seconds())
+
+
+def process_changes(
+    loader: ElasticsearchLoader,
+    extractor: PostgresExtractor,
+    changes: ContentChanges,
+    hash_store: DocumentHashStore | None = None,
+) -> None:
+    # id из уведомления, которого нет в базе, — удалённая строка:
+    # её документ удаляется из индекса
+    genres = extractor.fetch_genres_by_ids(genre_ids=changes.genre_ids)
+    deleted_genre_ids = {str(i) for i in changes.genre_ids} - {
+        str(g.id) for g in genres
+    }
+    if genres or deleted_genre_ids:
+        loader.ensure_genres_index()
+    if genres:
+        loader.bulk_load(
+            documents=[transform_genre(g).model_dump(mode="json") for g in genres],
+            index_name=loader.genres_index_name,
+        )
+    delete_documents(
+        loader=loader,
+        index_name=loader.genres_index_name,
+        doc_ids=deleted_genre_ids,
+    )
+
+    # у персон из person_film_ids изменились только связи: фильм связи
+    # приходит отдельным уведомлением film_work, фильмография персоны
+    # целиком не переиндексируется
+    person_ids = changes.person_ids | changes.person_film_ids
+    persons = extractor.fetch_persons_by_ids(person_ids=person_ids)
+    deleted_person_ids = {str(i) for i in person_ids} - {str(p.id) for p in persons}
+    if persons or deleted_person_ids:
+        loader.ensure_persons_index()
+    if persons:
+        loader.bulk_load(
+            documents=[transform_person(p).model_dump(mode="json") for p in persons],
+            index_name=loader.persons_index_name,
         )
-        movies_state = process_movies(
+    delete_documents(
+        loader=loader,
+        index_name=loader.persons_index_name,
+        doc_ids=deleted_person_ids,
+    )
+
+    film_work_ids = list(
+        changes.film_work_ids
+        | extractor.fetch_film_work_ids_by_genres_and_persons(
+            genre_ids=changes.genre_ids,
+            person_ids=changes.person_ids,
+        )
+    )
+    if not film_work_ids:
+        return
+
+    loader.ensure_movies_index()
+    for start in range(0, len(film_work_ids), extractor.itersize):
+        load_film_works(
+            extractor=extractor,
             loader=loader,
-            conn=conn,
-            film_work_ts=film_work_ts,
-            genre_ts=genre_ts,
-            person_ts=person_ts,
-            genre_film_work_ts=genre_film_work_ts,
-            person_film_work_ts=person_film_work_ts,
+            film_work_ids=set(film_work_ids[start : start + extractor.itersize]),
+            hash_store=hash_store,
         )
-        # сохраняем состояние
 
-        state.set("genre_ts", genre_ts)
-        state.set("person_ts", person_ts)
 
-        state.set("film_work_ts", movies_state.film_work_ts)
-        state.set("genre_film_work_ts", movies_state.genre_film_work_ts)
-        state.set("person_film_work_ts", movies_state.person_film_work_ts)
+def delete_documents(
+    loader: ElasticsearchLoader,
+    index_name: str,
+    doc_ids: set[str],
+    hash_store: DocumentHashStore | None = None,
+) -> set[str]:
+    if not doc_ids:
+        return set()
+    failed_ids = loader.bulk_load(
+        documents=[{"id": doc_id} for doc_id in doc_ids],
+        index_name=index_name,
+        op_type="delete",
+    )
+    logger.info("Deleted %d documents from %s", len(doc_ids), index_name)
+    if hash_store is not None:
+        hash_store.forget(index_name, doc_ids - failed_ids)
+    return failed_ids
+
+
+def run_changes(
+    loader: ElasticsearchLoader,
+    pool: PostgresConnectionPool,
+    changes: ContentChanges,
+    itersize: int = 1000,
+    hash_store: DocumentHashStore | None = None,
+) -> None:
+    with pool.connection() as conn:
+        process_changes(
+            loader=loader,
+            extractor=PostgresExtractor(connection=conn, itersize=itersize),
+            changes=changes,
+            hash_store=hash_store,
+        )
+
+
+def run_push(
+    state: State,
+    loader: ElasticsearchLoader,
+    db_settings: DBSettings,
+    pool: PostgresConnectionPool,
+    hash_store: DocumentHashStore | None = None,
+    ratings_extractor: MongoRatingsExtractor | None = None,
+) -> None:
+    # изменения приходят через LISTEN/NOTIFY, а опрос по updated_at
+    # остаётся редкой сверкой на случай пропущенных уведомлений;
+    # удаления видны только в уведомлениях, сверка их не находит;
+    # для LISTEN нужно отдельное соединение вне пула
+    itersize = db_settings.POSTGRES_ITERSIZE
+    listen_conn = create_pg_connection(settings=db_settings)
+    try:
+        listener = PostgresChangeListener(connection=listen_conn)
+        # подписываемся до сверки, чтобы не потерять изменения между ними
+        listener.listen()
+        run_once(
+            state=state,
+            loader=loader,
+            pool=pool,
+            itersize=itersize,
+            hash_store=hash_store,
+            ratings_extractor=ratings_extractor,
+        )
+        last_reconcile = time.monotonic()
+
+        while True:
+            next_reconcile = last_reconcile + RECONCILE_INTERVAL_SECONDS
+            changes = listener.wait(timeout=max(next_reconcile - time.monotonic(), 0))
+            if (
+                changes.film_work_ids
+                or changes.genre_ids
+                or changes.person_ids
+                or changes.person_film_ids
+            ):
+                run_changes(
+                    loader=loader,
+                    pool=pool,
+                    changes=changes,
+                    itersize=itersize,
+                    hash_store=hash_store,
+                )
+
+            if time.monotonic() >= next_reconcile:
+                run_once(
+                    state=state,
+                    loader=loader,
+                    pool=pool,
+                    itersize=itersize,
+                    hash_store=hash_store,
+                    ratings_extractor=ratings_extractor,
+                )
+                last_reconcile = time.monotonic()
     finally:
-        conn.close()
+        listen_conn.close()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Postgres to Elasticsearch ETL")
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="run the asyncio pipeline (asyncpg + AsyncElasticsearch)",
+    )
+    args = parser.parse_args()
+
     db_settings = DBSettings()
     es_settings = EsSettings()
 
-    storage_file_name = os.getenv("STORAGE_FILE_NAME", "state.json")
-    storage = JsonFileStorage(file_name=storage_file_name)
+    if ETL_METRICS_PORT:
+        start_http_server(ETL_METRICS_PORT)
+        logger.info("Metrics endpoint started on port %s", ETL_METRICS_PORT)
+
+    storage = create_storage(settings=StateSettings())
 
     state = State(storage=storage)
 
+    hash_store_file_name = os.getenv("HASH_STORE_FILE_NAME", "hashes.sqlite3")
+    hash_store = DocumentHashStore(file_name=hash_store_file_name)
+
+    # документы, отклонённые Elasticsearch, перезагружаются в следующих циклах
+    dead_letters = DeadLetterQueue(
+        file_name=os.getenv("DEAD_LETTER_FILE_NAME", "dead_letters.sqlite3"),
+        max_attempts=DEAD_LETTER_MAX_ATTEMPTS,
+    )
+
+    if args.async_mode:
+        asyncio.run(
+            run_async(
+                state=state,
+                db_settings=db_settings,
+                es_settings=es_settings,
+                poll_interval=POLL_INTERVAL_SECONDS,
+                queue_size=ETL_ASYNC_QUEUE_SIZE,
+                hash_store=hash_store,
+                dead_letters=dead_letters,
+            )
+        )
+        return
+
+    pool = PostgresConnectionPool(
+        settings=db_settings,
+        min_size=db_settings.POSTGRES_POOL_MIN_SIZE,
+        max_size=db_settings.POSTGRES_POOL_MAX_SIZE,
+    )
+
     es_host = es_settings.ES_HOST
     es_port = es_settings.ES_PORT
 
@@ -221,16 +674,48 @@ def main():
         movies_index_name=movies_index_name,
         genres_index_name=genres_index_name,
         persons_index_name=persons_index_name,
+        chunk_size=es_settings.ES_BULK_CHUNK_SIZE,
+        max_chunk_bytes=es_settings.ES_BULK_MAX_CHUNK_BYTES,
+        thread_count=es_settings.ES_BULK_THREAD_COUNT,
+        queue_size=es_settings.ES_BULK_QUEUE_SIZE,
+        max_retries=es_settings.ES_BULK_MAX_RETRIES,
+        dead_letters=dead_letters,
+        tuning=create_index_tuning(settings=es_settings),
+        hash_store=hash_store,
     )
 
-    logger.info("ETL service started")
+    ratings_extractor = None
+    if ETL_RATINGS_SYNC:
+        ratings_extractor = create_ratings_extractor(settings=MongoSettings())
+
+    logger.info("ETL service started, push mode: %s", ETL_PUSH_MODE)
     while True:
         try:
-            run_once(state=state, loader=loader, db_settings=db_settings)
-            time.sleep(POLL_INTERVAL_SECONDS)
+            if ETL_PUSH_MODE:
+                run_push(
+                    state=state,
+                    loader=loader,
+                    db_settings=db_settings,
+                    pool=pool,
+                    hash_store=hash_store,
+                    ratings_extractor=ratings_extractor,
+                )
+            else:
+                run_once(
+                    state=state,
+                    loader=loader,
+                    pool=pool,
+                    itersize=db_settings.POSTGRES_ITERSIZE,
+                    hash_store=hash_store,
+                    ratings_extractor=ratings_extractor,
+                )
+                time.sleep(POLL_INTERVAL_SECONDS)
         except (psycopg2.OperationalError, psycopg2.InterfaceError):
             logger.warning("Postgres unavailable, backing off")
             time.sleep(POLL_INTERVAL_SECONDS)
+        except ConnectionFailure:
+            logger.warning("MongoDB unavailable, backing off")
+            time.sleep(POLL_INTERVAL_SECONDS)
 
 
 if __name__ == "__main__":
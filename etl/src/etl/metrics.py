@@ -0,0 +1,88 @@
+"""
+Метрики ETL в формате Prometheus.
+
+Скорость индексации считается как rate(etl_documents_loaded_total[1m]),
+отставание — etl_replication_lag_seconds.
+"""
+
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from typing import TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+T = TypeVar("T")
+
+STAGE_SECONDS = Histogram(
+    "etl_stage_seconds",
+    "Time spent in an ETL stage",
+    ["index", "stage"],
+)
+DOCUMENTS_LOADED = Counter(
+    "etl_documents_loaded_total",
+    "Documents successfully written to Elasticsearch",
+    ["index"],
+)
+BULK_ERRORS = Counter(
+    "etl_bulk_errors_total",
+    "Documents rejected by Elasticsearch bulk requests",
+    ["index"],
+)
+BATCH_SIZE = Histogram(
+    "etl_batch_size_documents",
+    "Documents per bulk chunk",
+    ["index"],
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+DOCUMENTS_PER_SECOND = Gauge(
+    "etl_documents_per_second",
+    "Throughput of the last bulk load",
+    ["index"],
+)
+DEAD_LETTERS = Gauge(
+    "etl_dead_letters",
+    "Documents waiting in the dead-letter queue for another bulk attempt",
+    ["index"],
+)
+REPLICATION_LAG = Gauge(
+    "etl_replication_lag_seconds",
+    "Now minus the oldest updated_at not yet covered by movie watermarks",
+)
+
+
+def timed_iter(iterable: Iterable[T], index: str, stage: str) -> Iterator[T]:
+    # время, потраченное источником на выдачу элементов, без времени
+    # потребителя; в гистограмму попадает одним значением на весь проход
+    iterator = iter(iterable)
+    elapsed = 0.0
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - started
+        yield item
+    STAGE_SECONDS.labels(index=index, stage=stage).observe(elapsed)
+
+
+async def timed_aiter(
+    iterable: AsyncIterable[T],
+    index: str,
+    stage: str,
+) -> AsyncIterator[T]:
+    # то же для асинхронных источников; сюда входит и ожидание ответа базы,
+    # во время которого цикл событий занят загрузкой
+    iterator = aiter(iterable)
+    elapsed = 0.0
+    while True:
+        started = time.perf_counter()
+        try:
+            item = await anext(iterator)
+        except StopAsyncIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - started
+        yield item
+    STAGE_SECONDS.labels(index=index, stage=stage).observe(elapsed)
@@ -0,0 +1,162 @@
+import datetime
+import logging
+import uuid
+from collections.abc import Iterable, Iterator
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from etl.dto.dto import MovieRatingDTO
+from etl.mongo.settings import MongoSettings
+
+logger = logging.getLogger(__name__)
+
+
+class MongoRatingsExtractor:
+    """
+    Агрегаты пользовательских оценок фильмов из коллекции movie_ratings
+    сервиса ugc_content_api: средняя оценка и число оценок по фильму.
+    """
+
+    def __init__(self, db: Database, batch_size: int = 1000) -> None:
+        self.db = db
+        self.batch_size = batch_size
+
+    def iter_changed_ratings(
+        self,
+        since: datetime.datetime | None,
+    ) -> Iterator[tuple[list[MovieRatingDTO], datetime.datetime]]:
+        try:
+            yield from self._iter_rerated(self.db.movie_ratings, since)
+        except Exception:
+            logger.exception("Failed to fetch changed movie ratings")
+            raise
+
+    def iter_deleted_ratings(
+        self,
+        since: datetime.datetime | None,
+    ) -> Iterator[tuple[list[MovieRatingDTO], datetime.datetime]]:
+        # удалённая оценка не оставляет следа в movie_ratings: ugc_content_api
+        # пишет о ней запись в movie_rating_deletions, а агрегат фильма
+        # пересчитывается по оставшимся оценкам
+        try:
+            yield from self._iter_rerated(self.db.movie_rating_deletions, since)
+        except Exception:
+            logger.exception("Failed to fetch deleted movie ratings")
+            raise
+
+    def _iter_rerated(
+        self,
+        collection: Collection,
+        since: datetime.datetime | None,
+    ) -> Iterator[tuple[list[MovieRatingDTO], datetime.datetime]]:
+        # записи читаются по ключу (updated_at, _id); первая страница берёт
+        # updated_at >= since: оценки на границе пересчитываются повторно,
+        # но агрегат фильма от этого не меняется
+        query: dict = {} if since is None else {"updated_at": {"$gte": since}}
+        while True:
+            docs = list(
+                collection.find(
+                    query,
+                    {"movie_id": True, "updated_at": True},
+                )
+                .sort([("updated_at", 1), ("_id", 1)])
+                .limit(self.batch_size)
+            )
+            if not docs:
+                return
+
+            last = docs[-1]
+            ratings = self.fetch_ratings({doc["movie_id"] for doc in docs})
+            logger.info(
+                "Fetched %d movie ratings changed in %s",
+                len(ratings),
+                collection.name,
+            )
+            yield ratings, last["updated_at"]
+
+            if len(docs) < self.batch_size:
+                return
+            query = {
+                "$or": [
+                    {"updated_at": {"$gt": last["updated_at"]}},
+                    {"updated_at": last["updated_at"], "_id": {"$gt": last["_id"]}},
+                ],
+            }
+
+    def iter_all_ratings(self) -> Iterator[list[MovieRatingDTO]]:
+        pipeline = [
+            {
+                "$group": {
+                    "_id": "$movie_id",
+                    "avg_score": {"$avg": "$score"},
+                    "count": {"$sum": 1},
+                },
+            },
+        ]
+        try:
+            batch: list[MovieRatingDTO] = []
+            for doc in self.db.movie_ratings.aggregate(
+                pipeline,
+                allowDiskUse=True,
+                batchSize=self.batch_size,
+            ):
+                batch.append(self._map_rating(doc))
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        except Exception:
+            logger.exception("Failed to fetch movie ratings")
+            raise
+
+    def fetch_ratings(self, movie_ids: Iterable[str]) -> list[MovieRatingDTO]:
+        movie_ids = list(movie_ids)
+        pipeline = [
+            {"$match": {"movie_id": {"$in": movie_ids}}},
+            {
+                "$group": {
+                    "_id": "$movie_id",
+                    "avg_score": {"$avg": "$score"},
+                    "count": {"$sum": 1},
+                },
+            },
+        ]
+        try:
+            ratings = {
+                doc["_id"]: self._map_rating(doc)
+                for doc in self.db.movie_ratings.aggregate(pipeline)
+            }
+        except Exception:
+            logger.exception("Failed to aggregate movie ratings")
+            raise
+
+        # у фильма могли удалить все оценки — агрегат тогда обнуляется
+        return [
+            ratings.get(movie_id)
+            or MovieRatingDTO(movie_id=uuid.UUID(movie_id), avg_score=None, count=0)
+            for movie_id in movie_ids
+        ]
+
+    @staticmethod
+    def _map_rating(doc: dict) -> MovieRatingDTO:
+        return MovieRatingDTO(
+            movie_id=uuid.UUID(doc["_id"]),
+            avg_score=doc["avg_score"],
+            count=doc["count"],
+        )
+
+
+def create_ratings_extractor(settings: MongoSettings) -> MongoRatingsExtractor:
+    # tz_aware: водяной знак оценок хранится в состоянии с часовым поясом
+    client: MongoClient = MongoClient(
+        host=settings.MONGO_HOST,
+        port=settings.MONGO_PORT,
+        tz_aware=True,
+    )
+    return MongoRatingsExtractor(
+        db=client[settings.MONGO_DB],
+        batch_size=settings.MONGO_RATINGS_BATCH_SIZE,
+    )
@@ -0,0 +1,11 @@
+from pydantic.v1 import BaseSettings
+
+
+class MongoSettings(BaseSettings):
+    MONGO_HOST: str = "localhost"
+    MONGO_PORT: int = 27017
+    MONGO_DB: str = "ugc_content_api"
+    MONGO_RATINGS_BATCH_SIZE: int = 1000
+
+    class Config:
+        env_file = ".env"
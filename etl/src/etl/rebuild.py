@@ -0,0 +1,401 @@
+"""
+Полная переиндексация без простоя.
+
+Данные загружаются в новый индекс <alias>_v<n> с отключённым refresh
+и без реплик, после чего настройки возвращаются, сегменты сливаются,
+а алиас, из которого читает API, атомарно переключается на новый индекс.
+
+Запуск: python -m etl.rebuild movies|genres|persons [--transform-workers N]
+        python -m etl.rebuild movies --shards N
+        python -m etl.rebuild movies --copy-export
+"""
+
+import argparse
+import datetime
+import functools
+import logging
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import psycopg2.extras
+from elasticsearch import Elasticsearch
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
+from psycopg2.extensions import connection as PgConnection
+
+from etl.db.connection import create_pg_connection
+from etl.db.exporter import PostgresBulkExporter
+from etl.db.extractor import CHANGE_SOURCES, PostgresExtractor
+from etl.db.settings import DBSettings
+from etl.dto.dto import Watermark
+from etl.es.indices import (
+    GENRES_INDEX,
+    MOVIES_INDEX,
+    PERSONS_INDEX,
+    IndexSpec,
+    create_index_tuning,
+    index_body,
+)
+from etl.es.loader import ElasticsearchLoader
+from etl.es.settings import EsSettings
+from etl.main import ETL_RATINGS_SYNC, load_film_work_rows, load_film_works
+from etl.mongo.extractor import create_ratings_extractor
+from etl.mongo.settings import MongoSettings
+from etl.transformer.genre import transform_genre
+from etl.transformer.person import transform_person
+from etl.transformer.rating import transform_rating
+
+logger = logging.getLogger(__name__)
+
+# loader, conn, index_name, itersize, since -> None; since=None — все данные
+LoadFunc = Callable[
+    [ElasticsearchLoader, PgConnection, str, int, datetime.datetime | None],
+    None,
+]
+
+# index_name, snapshot_id -> None; полная загрузка из экспортированного снимка
+SnapshotLoadFunc = Callable[[str, str], None]
+
+# loader, index_name, since -> None; данные не из Postgres, since=None — все
+AfterLoadFunc = Callable[
+    [ElasticsearchLoader, str, datetime.datetime | None],
+    None,
+]
+
+# updated_at строкам и оценкам ставят приложения своими часами и до
+# коммита: догрузка начинается с запасом; повторная загрузка безвредна
+CLOCK_SKEW = datetime.timedelta(minutes=1)
+
+
+def create_loader(es_settings: EsSettings) -> ElasticsearchLoader:
+    client = Elasticsearch(f"http://{es_settings.ES_HOST}:{es_settings.ES_PORT}")
+    return ElasticsearchLoader(
+        client=client,
+        movies_index_name=es_settings.MOVIES_ES_INDEX,
+        genres_index_name=es_settings.GENRES_ES_INDEX,
+        persons_index_name=es_settings.PERSONS_ES_INDEX,
+        chunk_size=es_settings.ES_BULK_CHUNK_SIZE,
+        max_chunk_bytes=es_settings.ES_BULK_MAX_CHUNK_BYTES,
+        thread_count=es_settings.ES_BULK_THREAD_COUNT,
+        queue_size=es_settings.ES_BULK_QUEUE_SIZE,
+        max_retries=es_settings.ES_BULK_MAX_RETRIES,
+        tuning=create_index_tuning(settings=es_settings),
+    )
+
+
+def load_movies(
+    loader: ElasticsearchLoader,
+    conn: PgConnection,
+    index_name: str,
+    itersize: int,
+    since: datetime.datetime | None,
+    transform_pool: Executor | None = None,
+    shard: int = 0,
+    shards: int = 1,
+    copy_export: bool = False,
+) -> None:
+    if since is None and copy_export:
+        exporter = PostgresBulkExporter(connection=conn, shard=shard, shards=shards)
+        for rows in exporter.iter_film_work_rows(chunk_size=itersize):
+            load_film_work_rows(
+                loader=loader,
+                rows=rows,
+                index_name=index_name,
+                transform_pool=transform_pool,
+                op_type="index",
+            )
+        return
+
+    extractor = PostgresExtractor(connection=conn, itersize=itersize)
+    if since is None:
+        chunks = extractor.iter_all_film_work_ids(shard=shard, shards=shards)
+    else:
+        after = {source: Watermark(updated_at=since) for source in CHANGE_SOURCES}
+        chunks = (
+            film_work_ids
+            for film_work_ids, _ in extractor.iter_change_feed(after=after)
+        )
+
+    # в новый индекс документы пишутся целиком, при догрузке через алиас
+    # частично, чтобы не затереть оценки пользователей
+    op_type = "index" if since is None else "upsert"
+    for film_work_ids in chunks:
+        load_film_works(
+            extractor=extractor,
+            loader=loader,
+            film_work_ids=film_work_ids,
+            index_name=index_name,
+            transform_pool=transform_pool,
+            op_type=op_type,
+        )
+
+
+def load_ratings(
+    loader: ElasticsearchLoader,
+    index_name: str,
+    since: datetime.datetime | None,
+) -> None:
+    ratings_extractor = create_ratings_extractor(settings=MongoSettings())
+    if since is None:
+        # в новом индексе оценок ещё нет: переносим агрегаты всех фильмов
+        batches = ratings_extractor.iter_all_ratings()
+    else:
+        batches = (
+            ratings
+            for iter_ratings in (
+                ratings_extractor.iter_changed_ratings,
+                ratings_extractor.iter_deleted_ratings,
+            )
+            for ratings, _ in iter_ratings(since=since)
+        )
+    for ratings in batches:
+        loader.bulk_load(
+            documents=(transform_rating(r).model_dump(mode="json") for r in ratings),
+            index_name=index_name,
+            op_type="update",
+        )
+
+
+def load_genres(
+    loader: ElasticsearchLoader,
+    conn: PgConnection,
+    index_name: str,
+    itersize: int,
+    since: datetime.datetime | None,
+) -> None:
+    extractor = PostgresExtractor(connection=conn, itersize=itersize)
+    for genres, _ in extractor.iter_changed_genres(
+        after=Watermark(updated_at=since),
+    ):
+        loader.bulk_load(
+            documents=(transform_genre(g).model_dump(mode="json") for g in genres),
+            index_name=index_name,
+        )
+
+
+def load_persons(
+    loader: ElasticsearchLoader,
+    conn: PgConnection,
+    index_name: str,
+    itersize: int,
+    since: datetime.datetime | None,
+) -> None:
+    extractor = PostgresExtractor(connection=conn, itersize=itersize)
+    for persons, _ in extractor.iter_changed_persons(
+        after=Watermark(updated_at=since),
+    ):
+        loader.bulk_load(
+            documents=(transform_person(p).model_dump(mode="json") for p in persons),
+            index_name=index_name,
+        )
+
+    if since is None:
+        return
+    # при догрузке учитываем и изменения person_film_work: состав фильмов
+    # персоны меняется без обновления строки content.person
+    for person_ids, _ in extractor.iter_person_ids_by_film_links(
+        after=Watermark(updated_at=since),
+    ):
+        persons = extractor.fetch_persons_by_ids(person_ids=person_ids)
+        loader.bulk_load(
+            documents=(transform_person(p).model_dump(mode="json") for p in persons),
+            index_name=index_name,
+        )
+
+
+def load_movies_shard(
+    index_name: str,
+    snapshot_id: str,
+    shard: int,
+    shards: int,
+    copy_export: bool = False,
+) -> None:
+    # выполняется в отдельном процессе: свои соединения с Postgres и ES,
+    # но тот же снимок данных, что у координатора
+    db_settings = DBSettings()
+    loader = create_loader(es_settings=EsSettings())
+    conn = create_pg_connection(settings=db_settings)
+    psycopg2.extras.register_uuid(conn_or_curs=conn)
+    conn.set_session(
+        isolation_level=ISOLATION_LEVEL_REPEATABLE_READ,
+        readonly=True,
+    )
+    try:
+        PostgresExtractor(connection=conn).import_snapshot(snapshot_id=snapshot_id)
+        logger.info("Loading shard %d/%d into %s", shard + 1, shards, index_name)
+        load_movies(
+            loader,
+            conn,
+            index_name,
+            db_settings.POSTGRES_ITERSIZE,
+            None,
+            shard=shard,
+            shards=shards,
+            copy_export=copy_export,
+        )
+    finally:
+        conn.close()
+
+
+def load_movies_sharded(
+    index_name: str,
+    snapshot_id: str,
+    shards: int,
+    copy_export: bool = False,
+) -> None:
+    # фильмы делятся на шарды по хэшу id, каждый шард грузит свой процесс
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=shards, mp_context=context) as pool:
+        futures = [
+            pool.submit(
+                load_movies_shard,
+                index_name,
+                snapshot_id,
+                shard,
+                shards,
+                copy_export,
+            )
+            for shard in range(shards)
+        ]
+        for future in futures:
+            future.result()
+
+
+def rebuild(
+    loader: ElasticsearchLoader,
+    db_settings: DBSettings,
+    alias: str,
+    spec: IndexSpec,
+    load: LoadFunc,
+    snapshot_load: SnapshotLoadFunc | None = None,
+    after_load: AfterLoadFunc | None = None,
+) -> str:
+    index_name = f"{alias}_v{loader.next_index_version(alias)}"
+    loader.create_index(
+        index_name=index_name,
+        body=index_body(spec, loader.tuning, bulk=True),
+    )
+
+    conn = create_pg_connection(settings=db_settings)
+    psycopg2.extras.register_uuid(conn_or_curs=conn)
+    conn.set_session(
+        isolation_level=ISOLATION_LEVEL_REPEATABLE_READ,
+        readonly=True,
+    )
+    try:
+        extractor = PostgresExtractor(connection=conn)
+        started_at = extractor.fetch_snapshot_time()
+        # строки транзакций, открытых в момент снимка, в него не попали,
+        # а их updated_at раньше started_at: догрузка начинается раньше
+        catch_up_since = extractor.fetch_oldest_open_write() - CLOCK_SKEW
+        logger.info("Loading %s from snapshot at %s", index_name, started_at)
+        if snapshot_load is None:
+            load(loader, conn, index_name, db_settings.POSTGRES_ITERSIZE, None)
+        else:
+            # транзакция координатора держит снимок, пока его читают воркеры
+            snapshot_load(index_name, extractor.export_snapshot())
+        conn.rollback()
+        after_load_started_at = datetime.datetime.now(datetime.timezone.utc)
+        if after_load is not None:
+            after_load(loader, index_name, None)
+
+        loader.update_index_settings(
+            index_name=index_name,
+            settings=loader.tuning.serving_settings(),
+        )
+        loader.optimize_index(index_name=index_name)
+        old_indices = loader.swap_alias(alias=alias, index_name=index_name)
+
+        # пока шла загрузка, инкрементальный ETL писал в старый индекс;
+        # всё, что изменилось после снимка, догружаем уже через алиас
+        load(loader, conn, alias, db_settings.POSTGRES_ITERSIZE, catch_up_since)
+        if after_load is not None:
+            # то же для данных, скопированных после загрузки из Postgres
+            after_load(loader, alias, after_load_started_at - CLOCK_SKEW)
+    finally:
+        conn.close()
+
+    for old_index in old_indices:
+        loader.delete_index(index_name=old_index)
+
+    return index_name
+
+
+def main() -> None:
+    db_settings = DBSettings()
+    es_settings = EsSettings()
+
+    loader = create_loader(es_settings=es_settings)
+    targets: dict[str, tuple[str, IndexSpec, LoadFunc]] = {
+        "movies": (loader.movies_index_name, MOVIES_INDEX, load_movies),
+        "genres": (loader.genres_index_name, GENRES_INDEX, load_genres),
+        "persons": (loader.persons_index_name, PERSONS_INDEX, load_persons),
+    }
+
+    parser = argparse.ArgumentParser(description="Zero-downtime ES reindex")
+    parser.add_argument("target", choices=targets.keys())
+    parser.add_argument(
+        "--transform-workers",
+        type=int,
+        default=0,
+        help="processes for the movies transform stage (0 - in-process)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="worker processes loading movies by hash(id) mod N",
+    )
+    parser.add_argument(
+        "--copy-export",
+        action="store_true",
+        help="full-load movies via COPY of flat tables joined in memory",
+    )
+    args = parser.parse_args()
+    if args.shards > 1 and args.target != "movies":
+        parser.error("--shards is supported for movies only")
+    if args.shards > 1 and args.transform_workers > 0:
+        # процессы шардов сами выполняют преобразование
+        parser.error("--transform-workers cannot be combined with --shards")
+
+    alias, spec, load = targets[args.target]
+    transform_pool = None
+    if args.target == "movies":
+        if args.transform_workers > 0:
+            transform_pool = ProcessPoolExecutor(max_workers=args.transform_workers)
+        load = functools.partial(
+            load_movies,
+            transform_pool=transform_pool,
+            copy_export=args.copy_export,
+        )
+
+    after_load = None
+    if args.target == "movies" and ETL_RATINGS_SYNC:
+        after_load = load_ratings
+
+    snapshot_load = None
+    if args.shards > 1:
+        snapshot_load = functools.partial(
+            load_movies_sharded,
+            shards=args.shards,
+            copy_export=args.copy_export,
+        )
+
+    try:
+        index_name = rebuild(
+            loader=loader,
+            db_settings=db_settings,
+            alias=alias,
+            spec=spec,
+            load=load,
+            snapshot_load=snapshot_load,
+            after_load=after_load,
+        )
+    finally:
+        if transform_pool is not None:
+            transform_pool.shutdown()
+    logger.info("Rebuild of %s finished, alias now points to %s", alias, index_name)
+
+
+if __name__ == "__main__":
+    main()
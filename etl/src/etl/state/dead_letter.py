@@ -0,0 +1,86 @@
+import datetime
+import logging
+import sqlite3
+from collections.abc import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class DeadLetterQueue:
+    """
+    Очередь документов, которые Elasticsearch отклонил при bulk-загрузке.
+    Водяные знаки к этому моменту уже сдвинуты, поэтому id хранятся
+    отдельно и перезагружаются небольшими пачками в следующих циклах.
+    """
+
+    def __init__(self, file_name: str, max_attempts: int = 10) -> None:
+        self.conn = sqlite3.connect(file_name)
+        self.max_attempts = max_attempts
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                index_name TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                failed_at TEXT NOT NULL,
+                PRIMARY KEY (index_name, doc_id)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.conn.commit()
+
+    def add(self, index_name: str, doc_ids: Iterable[str]) -> None:
+        failed_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        rows = [(index_name, doc_id, failed_at) for doc_id in doc_ids]
+        if not rows:
+            return
+
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    """
+                    INSERT INTO dead_letter (index_name, doc_id, attempts, failed_at)
+                    VALUES (?, ?, 1, ?)
+                    ON CONFLICT (index_name, doc_id) DO UPDATE
+                        SET attempts = attempts + 1, failed_at = excluded.failed_at;
+                    """,
+                    rows,
+                )
+        except Exception:
+            logger.exception("Failed to save dead letters for %s", index_name)
+            raise
+        logger.warning("Queued %d failed documents of %s", len(rows), index_name)
+
+    def take(self, index_name: str, limit: int) -> list[str]:
+        # сначала давно упавшие; исчерпавшие попытки остаются в таблице
+        # для разбора вручную
+        rows = self.conn.execute(
+            """
+            SELECT doc_id
+            FROM dead_letter
+            WHERE index_name = ? AND attempts < ?
+            ORDER BY failed_at
+            LIMIT ?;
+            """,
+            (index_name, self.max_attempts, limit),
+        )
+        return [doc_id for (doc_id,) in rows.fetchall()]
+
+    def resolve(self, index_name: str, doc_ids: Iterable[str]) -> None:
+        rows = [(index_name, doc_id) for doc_id in doc_ids]
+        if not rows:
+            return
+
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM dead_letter WHERE index_name = ? AND doc_id = ?;",
+                rows,
+            )
+        logger.info("Resolved %d dead letters of %s", len(rows), index_name)
+
+    def count(self, index_name: str) -> int:
+        row = self.conn.execute(
+            "SELECT count(*) FROM dead_letter WHERE index_name = ?;",
+            (index_name,),
+        ).fetchone()
+        return row[0]
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from collections.abc import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentHashStore:
+    """
+    Хранит хэш последней отправленной в индекс версии каждого документа,
+    чтобы не отправлять в Elasticsearch документы, которые не изменились.
+    """
+
+    def __init__(self, file_name: str, lookup_batch_size: int = 500) -> None:
+        self.conn = sqlite3.connect(file_name)
+        self.lookup_batch_size = lookup_batch_size
+        self._pending: dict[str, dict[str, bytes]] = {}
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS document_hash (
+                index_name TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                PRIMARY KEY (index_name, doc_id)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def hash_document(document: dict) -> bytes:
+        payload = json.dumps(
+            document,
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+    def filter_changed(
+        self,
+        index_name: str,
+        documents: Iterable[dict],
+    ) -> Iterator[dict]:
+        # хэши пропущенных дальше документов запоминаются и сохраняются
+        # только в commit, после того как загрузка прошла; остатки
+        # прошлой неудачной загрузки не переносятся в новую
+        pending = self._pending[index_name] = {}
+        batch: list[dict] = []
+        skipped = 0
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= self.lookup_batch_size:
+                skipped += yield from self._filter_batch(index_name, batch, pending)
+                batch = []
+        if batch:
+            skipped += yield from self._filter_batch(index_name, batch, pending)
+
+        if skipped:
+            logger.info("Skipped %d unchanged documents in %s", skipped, index_name)
+
+    def commit(self, index_name: str, failed_ids: set[str]) -> None:
+        pending = self._pending.pop(index_name, {})
+        rows = [
+            (index_name, doc_id, doc_hash)
+            for doc_id, doc_hash in pending.items()
+            if doc_id not in failed_ids
+        ]
+        if not rows:
+            return
+
+        self.conn.executemany(
+            """
+            INSERT INTO document_hash (index_name, doc_id, hash)
+            VALUES (?, ?, ?)
+            ON CONFLICT (index_name, doc_id) DO UPDATE SET hash = excluded.hash;
+            """,
+            rows,
+        )
+        self.conn.commit()
+
+    def discard(self, index_name: str) -> None:
+        # загрузка упала целиком: ожидающие хэши не сохраняются
+        self._pending.pop(index_name, None)
+
+    def forget(self, index_name: str, doc_ids: Iterable[str]) -> None:
+        # документ удалён из индекса: если строка вернётся в базу,
+        # её документ надо отправить, даже если он не изменился
+        self.conn.executemany(
+            "DELETE FROM document_hash WHERE index_name = ? AND doc_id = ?;",
+            [(index_name, doc_id) for doc_id in doc_ids],
+        )
+        self.conn.commit()
+
+    def clear(self, index_name: str) -> None:
+        # индекс создан заново и пуст: все его документы надо отправить
+        self._pending.pop(index_name, None)
+        self.conn.execute(
+            "DELETE FROM document_hash WHERE index_name = ?;",
+            (index_name,),
+        )
+        self.conn.commit()
+        logger.info("Cleared document hashes of %s", index_name)
+
+    def _filter_batch(
+        self,
+        index_name: str,
+        batch: list[dict],
+        pending: dict[str, bytes],
+    ) -> Iterator[dict]:
+        known = self._get_hashes(index_name, [str(doc["id"]) for doc in batch])
+        skipped = 0
+        for document in batch:
+            doc_id = str(document["id"])
+            doc_hash = self.hash_document(document)
+            if known.get(doc_id) == doc_hash:
+                skipped += 1
+                continue
+            pending[doc_id] = doc_hash
+            yield document
+        return skipped
+
+    def _get_hashes(self, index_name: str, doc_ids: list[str]) -> dict[str, bytes]:
+        placeholders = ", ".join("?" * len(doc_ids))
+        rows = self.conn.execute(
+            f"""
+            SELECT doc_id, hash
+            FROM document_hash
+            WHERE index_name = ? AND doc_id IN ({placeholders});
+            """,
+            (index_name, *doc_ids),
+        )
+        return dict(rows.fetchall())
@@ -0,0 +1,13 @@
+from pydantic.v1 import BaseSettings
+
+
+class StateSettings(BaseSettings):
+    # json | sqlite | redis; redis позволяет делить состояние между репликами
+    STATE_STORAGE: str = "json"
+    STORAGE_FILE_NAME: str = "state.json"
+    STATE_REDIS_HOST: str = "localhost"
+    STATE_REDIS_PORT: int = 6379
+    STATE_REDIS_KEY: str = "etl:state"
+
+    class Config:
+        env_file = ".env"
@@ -1,22 +1,117 @@
+import contextlib
 import datetime
+import uuid
+from collections.abc import Iterator
 
-from etl.state.storage import JsonFileStorage
+from etl.dto.dto import Watermark
+from etl.state.storage import BaseStorage
+
+# ключи хранилища, в которых лежит водяной знак: время и id (может не быть)
+WatermarkKeys = tuple[str, str | None]
+
+
+def _order_key(watermark: Watermark) -> tuple:
+    # порядок ключа выборки (updated_at, id); пустой знак — начало данных
+    return (
+        watermark.updated_at is not None,
+        watermark.updated_at or datetime.datetime.min,
+        watermark.id.int if watermark.id is not None else -1,
+    )
+
+
+def _read(data: dict[str, str], keys: WatermarkKeys) -> Watermark:
+    ts_key, id_key = keys
+    updated_at = data.get(ts_key)
+    watermark_id = data.get(id_key) if id_key is not None else None
+    return Watermark(
+        updated_at=datetime.datetime.fromisoformat(updated_at) if updated_at else None,
+        id=uuid.UUID(watermark_id) if watermark_id else None,
+    )
+
+
+def _dump(keys: WatermarkKeys, watermark: Watermark | None) -> dict[str, str | None]:
+    ts_key, id_key = keys
+    if watermark is None:
+        watermark = Watermark()
+    changes = {
+        ts_key: (
+            None if watermark.updated_at is None else watermark.updated_at.isoformat()
+        ),
+    }
+    if id_key is not None:
+        changes[id_key] = None if watermark.id is None else str(watermark.id)
+    return changes
 
 
 class State:
-    def __init__(self, storage: JsonFileStorage):
+    """
+    Водяные знаки ETL. Хранилище общее для реплик, поэтому знак только
+    сдвигается вперёд: при сохранении он сравнивается со значением
+    в хранилище, и отстающая реплика не откатит чужой прогресс.
+    """
+
+    def __init__(self, storage: BaseStorage):
         self.storage = storage
         self._state: dict = self.storage.load()
+        # None — сбросить знак, иначе сдвинуть вперёд
+        self._pending: dict[WatermarkKeys, Watermark | None] = {}
+        self._depth = 0
 
     def get(self, name_ts: str) -> datetime.datetime | None:
-        value = self._state.get(name_ts)
-        if value is None:
-            return None
-        return datetime.datetime.fromisoformat(value)
+        return _read(self._state, (name_ts, None)).updated_at
 
     def set(self, key: str, value: datetime.datetime | None) -> None:
-        if value is None:
-            self._state.pop(key, None)
-        else:
-            self._state[key] = value.isoformat()
-        self.storage.save(self._state)
+        with self.transaction():
+            self._put((key, None), None if value is None else Watermark(value))
+
+    def get_watermark(self, name: str) -> Watermark:
+        return _read(self._state, (f"{name}_ts", f"{name}_id"))
+
+    def set_watermarks(self, watermarks: dict[str, Watermark]) -> None:
+        with self.transaction():
+            for name, watermark in watermarks.items():
+                self._put((f"{name}_ts", f"{name}_id"), watermark)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator["State"]:
+        # изменения внутри блока сохраняются одной записью в хранилище
+        # при выходе из внешнего блока; при ошибке они отбрасываются
+        if self._depth == 0:
+            # другие реплики могли сдвинуть знаки: внутри блока читаем
+            # текущее состояние хранилища
+            self._state = self.storage.load()
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self._pending.clear()
+                self._state = self.storage.load()
+            raise
+
+        self._depth -= 1
+        if self._depth == 0 and self._pending:
+            try:
+                self._state = self.storage.update(self._merge)
+            finally:
+                self._pending = {}
+
+    def _put(self, keys: WatermarkKeys, watermark: Watermark | None) -> None:
+        self._pending[keys] = watermark
+        for key, value in _dump(keys, watermark).items():
+            if value is None:
+                self._state.pop(key, None)
+            else:
+                self._state[key] = value
+
+    def _merge(self, current: dict[str, str]) -> dict[str, str | None]:
+        # вызывается хранилищем атомарно с чтением current
+        changes: dict[str, str | None] = {}
+        for keys, watermark in self._pending.items():
+            if watermark is not None and _order_key(watermark) <= _order_key(
+                _read(current, keys)
+            ):
+                continue
+            changes.update(_dump(keys, watermark))
+        return changes
@@ -1,19 +1,112 @@
+import abc
+import contextlib
+import fcntl
 import json
 import logging
+import os
+import sqlite3
+import tempfile
+from collections.abc import Callable, Iterator
 from pathlib import Path
 
+from redis import Redis
+from redis.client import Pipeline
+
+from etl.state.settings import StateSettings
+
 logger = logging.getLogger(__name__)
 
+# текущее состояние -> изменённые ключи
+Merge = Callable[[dict[str, str]], dict[str, str | None]]
+
+
+def apply_changes(data: dict[str, str], changes: dict[str, str | None]) -> None:
+    for key, value in changes.items():
+        if value is None:
+            data.pop(key, None)
+        else:
+            data[key] = value
+
+
+class BaseStorage(abc.ABC):
+    """
+    Хранилище состояния ETL. save получает только изменённые ключи
+    (None — удалить ключ) и применяет их атомарно, так что ключи,
+    записанные другими репликами ETL, не затираются.
+    """
+
+    @abc.abstractmethod
+    def save(self, changes: dict[str, str | None]) -> None: ...
+
+    @abc.abstractmethod
+    def load(self) -> dict[str, str]: ...
+
+    def update(self, merge: Merge) -> dict[str, str]:
+        # чтение, merge и запись; хранилища, которые делят реплики,
+        # выполняют их атомарно. Возвращает состояние после записи
+        data = self.load()
+        changes = merge(data)
+        if changes:
+            self.save(changes)
+        apply_changes(data, changes)
+        return data
+
+
+class JsonFileStorage(BaseStorage):
+    """
+    Состояние в JSON-файле. Чтение, merge и запись идут под flock на
+    соседнем файле .lock, так что реплики на одном хосте не теряют
+    записи друг друга; на общих сетевых дисках flock не надёжен.
+    """
 
-class JsonFileStorage:
     def __init__(self, file_name: str) -> None:
         self.file_name = Path(file_name)
+        self.lock_file_name = self.file_name.with_name(f"{self.file_name.name}.lock")
+
+    def save(self, changes: dict[str, str | None]) -> None:
+        with self._locked():
+            data = self.load()
+            apply_changes(data, changes)
+            self._write(data)
 
-    def save(self, data: dict) -> None:
+    def update(self, merge: Merge) -> dict[str, str]:
+        with self._locked():
+            data = self.load()
+            changes = merge(data)
+            if changes:
+                apply_changes(data, changes)
+                self._write(data)
+        return data
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        # сам файл состояния подменяется через os.replace, поэтому
+        # блокировка берётся на отдельном файле, который не меняется
+        with open(self.lock_file_name, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, data: dict[str, str]) -> None:
+        # пишем во временный файл рядом и подменяем им старый: при падении
+        # посреди записи на диске остаётся прежнее целое состояние
         try:
-            with open(self.file_name, "w") as file:
-                json.dump(data, file, ensure_ascii=False, indent=2)
-                logger.debug("Saved data to %s", self.file_name)
+            fd, tmp_name = tempfile.mkstemp(
+                dir=self.file_name.parent,
+                prefix=f".{self.file_name.name}.",
+            )
+            try:
+                with os.fdopen(fd, "w") as file:
+                    json.dump(data, file, ensure_ascii=False, indent=2)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_name, self.file_name)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+            logger.debug("Saved data to %s", self.file_name)
         except Exception:
             logger.exception(
                 "Failed to save data to %s",
@@ -21,7 +114,7 @@ class JsonFileStorage:
             )
             raise
 
-    def load(self) -> dict:
+    def load(self) -> dict[str, str]:
         if not self.file_name.exists():
             logger.info(
                 "State file %s does not exist, starting fresh",
@@ -39,3 +132,131 @@ class JsonFileStorage:
             )
             raise
         return data
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self.conn = sqlite3.connect(file_name)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS etl_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+
+    def save(self, changes: dict[str, str | None]) -> None:
+        try:
+            with self.conn:
+                self._write(changes)
+            logger.debug("Saved %d state keys to %s", len(changes), self.file_name)
+        except Exception:
+            logger.exception("Failed to save data to %s", self.file_name)
+            raise
+
+    def update(self, merge: Merge) -> dict[str, str]:
+        try:
+            with self.conn:
+                # IMMEDIATE сразу берёт блокировку на запись: между чтением
+                # и записью другая реплика состояние не изменит
+                self.conn.execute("BEGIN IMMEDIATE;")
+                data = self.load()
+                changes = merge(data)
+                self._write(changes)
+            logger.debug("Saved %d state keys to %s", len(changes), self.file_name)
+        except Exception:
+            logger.exception("Failed to save data to %s", self.file_name)
+            raise
+        apply_changes(data, changes)
+        return data
+
+    def _write(self, changes: dict[str, str | None]) -> None:
+        upserts = [(k, v) for k, v in changes.items() if v is not None]
+        deletes = [(k,) for k, v in changes.items() if v is None]
+        self.conn.executemany(
+            """
+            INSERT INTO etl_state (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value;
+            """,
+            upserts,
+        )
+        self.conn.executemany("DELETE FROM etl_state WHERE key = ?;", deletes)
+
+    def load(self) -> dict[str, str]:
+        try:
+            rows = self.conn.execute("SELECT key, value FROM etl_state;")
+            return dict(rows.fetchall())
+        except Exception:
+            logger.exception("Failed to load data from %s", self.file_name)
+            raise
+
+
+class RedisStorage(BaseStorage):
+    def __init__(self, redis: Redis, key: str = "etl:state") -> None:
+        self.redis = redis
+        self.key = key
+
+    def save(self, changes: dict[str, str | None]) -> None:
+        upserts = {k: v for k, v in changes.items() if v is not None}
+        deletes = [k for k, v in changes.items() if v is None]
+        try:
+            # MULTI/EXEC: все ключи применяются одной транзакцией
+            with self.redis.pipeline(transaction=True) as pipe:
+                if upserts:
+                    pipe.hset(self.key, mapping=upserts)
+                if deletes:
+                    pipe.hdel(self.key, *deletes)
+                pipe.execute()
+            logger.debug("Saved %d state keys to redis %s", len(changes), self.key)
+        except Exception:
+            logger.exception("Failed to save data to redis %s", self.key)
+            raise
+
+    def update(self, merge: Merge) -> dict[str, str]:
+        def apply(pipe: Pipeline) -> dict[str, str]:
+            # после WATCH pipe выполняет команды сразу; если ключ изменят
+            # до EXEC, redis-py повторит функцию с новым состоянием
+            data = self._decode(pipe.hgetall(self.key))
+            changes = merge(data)
+            upserts = {k: v for k, v in changes.items() if v is not None}
+            deletes = [k for k, v in changes.items() if v is None]
+            pipe.multi()
+            if upserts:
+                pipe.hset(self.key, mapping=upserts)
+            if deletes:
+                pipe.hdel(self.key, *deletes)
+            apply_changes(data, changes)
+            return data
+
+        try:
+            return self.redis.transaction(apply, self.key, value_from_callable=True)
+        except Exception:
+            logger.exception("Failed to save data to redis %s", self.key)
+            raise
+
+    def load(self) -> dict[str, str]:
+        try:
+            data = self.redis.hgetall(self.key)
+        except Exception:
+            logger.exception("Failed to load data from redis %s", self.key)
+            raise
+        return self._decode(data)
+
+    @staticmethod
+    def _decode(data: dict[bytes, bytes]) -> dict[str, str]:
+        return {k.decode(): v.decode() for k, v in data.items()}
+
+
+def create_storage(settings: StateSettings) -> BaseStorage:
+    if settings.STATE_STORAGE == "json":
+        return JsonFileStorage(file_name=settings.STORAGE_FILE_NAME)
+    if settings.STATE_STORAGE == "sqlite":
+        return SQLiteStorage(file_name=settings.STORAGE_FILE_NAME)
+    if settings.STATE_STORAGE == "redis":
+        redis = Redis(host=settings.STATE_REDIS_HOST, port=settings.STATE_REDIS_PORT)
+        return RedisStorage(redis=redis, key=settings.STATE_REDIS_KEY)
+    raise ValueError(f"Unknown state storage {settings.STATE_STORAGE}")
@@ -23,12 +23,52 @@ def transform_film_work(film_work: FilmWorkDTO) -> FilmEsDocument:
         genres=[EsGenre(id=g.id, name=g.name) for g in film_work.genres],
         title=film_work.title,
         description=film_work.description,
-        directors_names=list({p.full_name for p in directors}),
-        actors_names=list({p.full_name for p in actors}),
-        writers_names=list({p.full_name for p in writers}),
+        directors_names=list(dict.fromkeys(p.full_name for p in directors)),
+        actors_names=list(dict.fromkeys(p.full_name for p in actors)),
+        writers_names=list(dict.fromkeys(p.full_name for p in writers)),
         directors=[EsPerson(id=p.id, name=p.full_name) for p in directors],
         actors=[EsPerson(id=p.id, name=p.full_name) for p in actors],
         writers=[EsPerson(id=p.id, name=p.full_name) for p in writers],
         creation_date=film_work.creation_date or datetime.date(1900, 1, 1),
     )
     return document
+
+
+def film_work_row_to_document(row: dict) -> dict:
+    # быстрый путь: JSON-документ собирается прямо из строки запроса,
+    # без DTO и валидации pydantic; результат совпадает с
+    # transform_film_work(...).model_dump(mode="json")
+    directors: list[dict] = []
+    actors: list[dict] = []
+    writers: list[dict] = []
+    by_role = {
+        Roles.DIRECTOR: directors,
+        Roles.ACTOR: actors,
+        Roles.WRITER: writers,
+    }
+    for person in row["persons"]:
+        persons = by_role.get(person["role"])
+        if persons is not None:
+            persons.append({"id": person["id"], "name": person["full_name"]})
+
+    rating = row["rating"]
+    creation_date = row["creation_date"] or datetime.date(1900, 1, 1)
+    return {
+        "id": str(row["id"]),
+        "imdb_rating": float(rating) if rating is not None else None,
+        "genres": [{"id": g["id"], "name": g["name"]} for g in row["genres"]],
+        "title": row["title"],
+        "description": row["description"],
+        "directors_names": list(dict.fromkeys(p["name"] for p in directors)),
+        "actors_names": list(dict.fromkeys(p["name"] for p in actors)),
+        "writers_names": list(dict.fromkeys(p["name"] for p in writers)),
+        "directors": directors,
+        "actors": actors,
+        "writers": writers,
+        "creation_date": creation_date.isoformat(),
+    }
+
+
+def film_work_rows_to_documents(rows: list[dict]) -> list[dict]:
+    # единица работы для пула процессов
+    return [film_work_row_to_document(row) for row in rows]
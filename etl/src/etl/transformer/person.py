@@ -1,9 +1,10 @@
 from etl.dto.dto import PersonDTO
-from etl.es.model import EsPerson
+from etl.es.model import EsPersonDocument, EsPersonFilm
 
 
-def transform_person(person: PersonDTO) -> EsPerson:
-    return EsPerson(
+def transform_person(person: PersonDTO) -> EsPersonDocument:
+    return EsPersonDocument(
         id=person.id,
         name=person.full_name,
+        films=[EsPersonFilm(id=f.id, roles=f.roles) for f in person.films],
     )
@@ -0,0 +1,10 @@
+from etl.dto.dto import MovieRatingDTO
+from etl.es.model import EsMovieRating
+
+
+def transform_rating(rating: MovieRatingDTO) -> EsMovieRating:
+    return EsMovieRating(
+        id=rating.movie_id,
+        user_rating=rating.avg_score,
+        user_rating_count=rating.count,
+    )
@@ -1,3 +1,5 @@
+import asyncio
+import inspect
 import logging
 from functools import wraps
 from time import sleep
@@ -28,38 +30,54 @@ def backoff(
     :param max_tries: количество попыток перезапустить функцию
     :param exceptions кортеж перехватываемых исключений
     :return: результат выполнения функции
+
+    Корутины оборачиваются так же, но ждут через asyncio.sleep,
+    не блокируя цикл событий.
     """
 
+    def retry_delay(func, exc: Exception, attempt: int) -> float:
+        if attempt == max_tries:
+            logger.error(
+                "Max retries exceeded in %s",
+                func.__name__,
+                exc_info=True,
+            )
+            raise exc
+        sleep_time = min(
+            start_sleep_time * (factor**attempt),
+            border_sleep_time,
+        )
+        logger.warning(
+            "Error in %s: %s. Retry %d/%d in %.1f seconds",
+            func.__name__,
+            exc.__class__.__name__,
+            attempt,
+            max_tries,
+            sleep_time,
+            exc_info=False,
+        )
+        return sleep_time
+
     def func_wrapper(func):
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_inner(*args, **kwargs):
+                for attempt in range(1, max_tries + 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions as exc:
+                        await asyncio.sleep(retry_delay(func, exc, attempt))
+
+            return async_inner
+
         @wraps(func)
         def inner(*args, **kwargs):
-            attempt = 1
-            while attempt <= max_tries:
+            for attempt in range(1, max_tries + 1):
                 try:
                     return func(*args, **kwargs)
                 except exceptions as exc:
-                    if attempt == max_tries:
-                        logger.error(
-                            "Max retries exceeded in %s",
-                            func.__name__,
-                            exc_info=True,
-                        )
-                        raise
-                    sleep_time = min(
-                        start_sleep_time * (factor**attempt),
-                        border_sleep_time,
-                    )
-                    logger.warning(
-                        "Error in %s: %s. Retry %d/%d in %.1f seconds",
-                        func.__name__,
-                        exc.__class__.__name__,
-                        attempt,
-                        max_tries,
-                        sleep_time,
-                        exc_info=False,
-                    )
-                    sleep(sleep_time)
-                    attempt += 1
+                    sleep(retry_delay(func, exc, attempt))
 
         return inner
 
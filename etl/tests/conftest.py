@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# ETL запускается из etl/src и импортирует пакет etl оттуда
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,35 @@
+import re
+
+from etl.aio.extractor import CHANGE_FEED_QUERY, to_asyncpg_sql
+from etl.db.extractor import CHANGE_SOURCES
+
+
+def test_named_parameters_are_numbered_once():
+    sql, names = to_asyncpg_sql(
+        "WHERE %(ts)s IS NULL OR (updated_at, id) > (%(ts)s, %(id)s) LIMIT %(n)s",
+        {"ts": "timestamptz", "id": "uuid"},
+    )
+
+    assert sql == (
+        "WHERE $1::timestamptz IS NULL OR (updated_at, id) > "
+        "($1::timestamptz, $2::uuid) LIMIT $3"
+    )
+    assert names == ["ts", "id", "n"]
+
+
+def test_positional_parameters_keep_their_order():
+    sql, names = to_asyncpg_sql("WHERE id = ANY (%s::uuid[]) AND role = %s")
+
+    assert sql == "WHERE id = ANY ($1::uuid[]) AND role = $2"
+    assert names == ["0", "1"]
+
+
+def test_change_feed_query_has_a_parameter_per_name():
+    sql, names = CHANGE_FEED_QUERY
+
+    assert "%" not in sql
+    positions = {int(n) for n in re.findall(r"\$(\d+)", sql)}
+    assert positions == set(range(1, len(names) + 1))
+    for source in CHANGE_SOURCES:
+        position = names.index(f"{source}_ts") + 1
+        assert f"${position}::timestamptz" in sql
@@ -0,0 +1,131 @@
+import datetime
+import types
+import uuid
+
+from etl.db.extractor import CHANGE_SOURCES, PostgresExtractor
+from etl.dto.dto import Watermark
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def key(n: int) -> uuid.UUID:
+    return uuid.UUID(int=n)
+
+
+class FakeCursor:
+    """Выполняет CHANGE_FEED_SQL над строками источников в памяти."""
+
+    def __init__(self, sources: dict[str, list[tuple]], queries: list[dict]) -> None:
+        self.sources = sources
+        self.queries = queries
+        self.row: dict = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params):
+        self.queries.append(params)
+        film_work_ids = set()
+        for source in CHANGE_SOURCES:
+            ts, key_id = params[f"{source}_ts"], params[f"{source}_id"]
+            # строки источника: (updated_at, key_id, film_work_id)
+            page = sorted(
+                row
+                for row in self.sources.get(source, [])
+                if ts is None or (row[0], row[1]) > (ts, key_id)
+            )[: params["limit"]]
+            film_work_ids.update(row[2] for row in page)
+            self.row[f"{source}_count"] = len(page)
+            self.row[f"{source}_ts"] = page[-1][0] if page else None
+            self.row[f"{source}_id"] = page[-1][1] if page else None
+        self.row["film_work_ids"] = sorted(film_work_ids) or None
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeConnection:
+    def __init__(self, sources: dict[str, list[tuple]]) -> None:
+        self.sources = sources
+        self.queries: list[dict] = []
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self.sources, self.queries)
+
+
+def start_watermarks() -> dict[str, Watermark]:
+    return {source: Watermark() for source in CHANGE_SOURCES}
+
+
+def test_watermarks_advance_page_by_page():
+    # пять фильмов с одним updated_at: граница страниц проходит внутри него
+    films = [(START, key(n), key(n)) for n in range(1, 6)]
+    genre_links = [(START, key(10), key(1))]
+    conn = FakeConnection({"film_work": films, "genre_film_work": genre_links})
+    extractor = PostgresExtractor(connection=conn, itersize=2)
+
+    pages = list(extractor.iter_change_feed(after=start_watermarks()))
+
+    assert [ids for ids, _ in pages] == [{key(1), key(2)}, {key(3), key(4)}, {key(5)}]
+    assert [marks["film_work"].id for _, marks in pages] == [key(2), key(4), key(5)]
+    # дочитанный источник держит свой водяной знак, пока читаются остальные
+    assert all(
+        marks["genre_film_work"] == Watermark(START, key(10)) for _, marks in pages
+    )
+    assert pages[-1][1]["person_film_work"] == Watermark()
+
+
+def test_feed_resumes_after_the_saved_watermarks():
+    films = [(START, key(n), key(n)) for n in range(1, 6)]
+    conn = FakeConnection({"film_work": films})
+    extractor = PostgresExtractor(connection=conn, itersize=2)
+    first_ids, saved = next(extractor.iter_change_feed(after=start_watermarks()))
+
+    resumed = list(extractor.iter_change_feed(after=saved))
+
+    later_ids = set().union(*(ids for ids, _ in resumed))
+    assert first_ids | later_ids == {key(n) for n in range(1, 6)}
+    assert not first_ids & later_ids
+    assert resumed[-1][1]["film_work"] == Watermark(START, key(5))
+
+
+def test_empty_feed_yields_nothing():
+    extractor = PostgresExtractor(connection=FakeConnection({}), itersize=2)
+
+    assert list(extractor.iter_change_feed(after=start_watermarks())) == []
+
+
+class FakeIdsCursor:
+    """Страница id фильмов после params["after"] по возрастанию."""
+
+    def __init__(self, ids: list[uuid.UUID]) -> None:
+        self.ids = ids
+        self.rows: list[dict] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params):
+        after = params["after"]
+        self.rows = [{"id": i} for i in sorted(self.ids) if after is None or i > after][
+            : params["limit"]
+        ]
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_all_film_work_ids_are_read_in_keyset_pages():
+    ids = [key(n) for n in range(1, 6)]
+    conn = types.SimpleNamespace(cursor=lambda cursor_factory=None: FakeIdsCursor(ids))
+    extractor = PostgresExtractor(connection=conn, itersize=2)
+
+    pages = list(extractor.iter_all_film_work_ids())
+
+    assert pages == [{key(1), key(2)}, {key(3), key(4)}, {key(5)}]
@@ -0,0 +1,71 @@
+import uuid
+
+import etl.main as main_module
+from etl.dto.dto import ContentChanges, GenreDTO
+
+KEPT_ID, DELETED_ID = uuid.UUID(int=1), uuid.UUID(int=2)
+
+
+class FakeExtractor:
+    """В базе остались только строки с KEPT_ID."""
+
+    itersize = 100
+
+    def fetch_genres_by_ids(self, genre_ids):
+        return [GenreDTO(id=i, name="Drama") for i in genre_ids if i == KEPT_ID]
+
+    def fetch_persons_by_ids(self, person_ids):
+        return []
+
+    def fetch_film_work_ids_by_genres_and_persons(self, genre_ids, person_ids):
+        return set()
+
+    def fetch_film_work_rows(self, film_work_ids):
+        return [{"id": i} for i in film_work_ids if i == KEPT_ID]
+
+
+class FakeLoader:
+    movies_index_name = "movies"
+    genres_index_name = "genres"
+    persons_index_name = "persons"
+
+    def __init__(self) -> None:
+        self.actions: list[tuple[str, str, str]] = []
+
+    def ensure_movies_index(self):
+        pass
+
+    def ensure_genres_index(self):
+        pass
+
+    def ensure_persons_index(self):
+        pass
+
+    def bulk_load(self, documents, index_name, op_type="index", **kwargs):
+        self.actions.extend((op_type, index_name, str(doc["id"])) for doc in documents)
+        return set()
+
+
+def test_rows_missing_from_the_database_are_deleted(monkeypatch):
+    monkeypatch.setattr(
+        main_module,
+        "film_work_row_to_document",
+        lambda row: {"id": str(row["id"])},
+    )
+    loader = FakeLoader()
+
+    main_module.process_changes(
+        loader=loader,
+        extractor=FakeExtractor(),
+        changes=ContentChanges(
+            film_work_ids={KEPT_ID, DELETED_ID},
+            genre_ids={KEPT_ID, DELETED_ID},
+        ),
+    )
+
+    assert sorted(loader.actions) == [
+        ("delete", "genres", str(DELETED_ID)),
+        ("delete", "movies", str(DELETED_ID)),
+        ("index", "genres", str(KEPT_ID)),
+        ("upsert", "movies", str(KEPT_ID)),
+    ]
@@ -0,0 +1,154 @@
+import uuid
+
+import etl.main as main_module
+import pytest
+from etl.dto.dto import MovieRatingDTO
+from etl.state.dead_letter import DeadLetterQueue
+
+MOVIE_ID = str(uuid.UUID(int=1))
+
+
+class FakeLoader:
+    """
+    Частичные обновления проходят только для документов в индексе,
+    документы из rejected Elasticsearch отклоняет.
+    """
+
+    movies_index_name = "movies"
+    genres_index_name = "genres"
+    persons_index_name = "persons"
+
+    def __init__(self, dead_letters: DeadLetterQueue) -> None:
+        self.dead_letters = dead_letters
+        self.documents: dict[str, dict] = {}
+        self.rejected: set[str] = set()
+
+    def bulk_load(self, documents, index_name, op_type="index", dead_letter_queue=None):
+        failed_ids = set()
+        for doc in documents:
+            doc_id = str(doc["id"])
+            if doc_id in self.rejected or (
+                op_type == "update" and doc_id not in self.documents
+            ):
+                failed_ids.add(doc_id)
+            elif op_type == "delete":
+                self.documents.pop(doc_id, None)
+            else:
+                self.documents.setdefault(doc_id, {}).update(doc)
+        if failed_ids:
+            self.dead_letters.add(
+                index_name=dead_letter_queue or index_name,
+                doc_ids=failed_ids,
+            )
+        return failed_ids
+
+
+class FakeRatingsExtractor:
+    def __init__(self, pages) -> None:
+        self.pages = pages
+
+    def iter_changed_ratings(self, since):
+        yield from self.pages
+
+    def iter_deleted_ratings(self, since):
+        yield from ()
+
+    def fetch_ratings(self, movie_ids):
+        return [
+            MovieRatingDTO(movie_id=uuid.UUID(movie_id), avg_score=8.0, count=2)
+            for movie_id in movie_ids
+        ]
+
+
+class FakeState:
+    def __init__(self) -> None:
+        self.data: dict = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+@pytest.fixture
+def dead_letters(tmp_path):
+    return DeadLetterQueue(file_name=str(tmp_path / "dead.sqlite3"), max_attempts=3)
+
+
+def process_ratings(loader, extractor, state):
+    loader.ensure_movies_index = lambda: None
+    main_module.process_ratings(
+        loader=loader,
+        ratings_extractor=extractor,
+        state=state,
+    )
+
+
+def test_rating_of_a_movie_indexed_later_is_applied(dead_letters):
+    loader = FakeLoader(dead_letters)
+    rating = MovieRatingDTO(movie_id=uuid.UUID(MOVIE_ID), avg_score=8.0, count=2)
+    state = FakeState()
+
+    process_ratings(loader, FakeRatingsExtractor([([rating], "ts-1")]), state)
+    assert state.get("ratings_ts") == "ts-1"
+    assert dead_letters.take("movies:ratings", limit=10) == [MOVIE_ID]
+
+    # фильм попал в индекс; следующий цикл повторяет оценку из очереди
+    loader.documents[MOVIE_ID] = {"id": MOVIE_ID, "title": "Star Wars"}
+    process_ratings(loader, FakeRatingsExtractor([]), state)
+
+    assert loader.documents[MOVIE_ID]["user_rating"] == 8.0
+    assert dead_letters.count("movies:ratings") == 0
+    assert dead_letters.count("movies") == 0
+
+
+def test_ids_are_taken_until_attempts_run_out(dead_letters):
+    for _ in range(2):
+        dead_letters.add(index_name="movies", doc_ids=["1"])
+    dead_letters.add(index_name="movies", doc_ids=["2"])
+    assert sorted(dead_letters.take("movies", limit=10)) == ["1", "2"]
+
+    # третья неудача: max_attempts=3, id остаётся в таблице для разбора
+    dead_letters.add(index_name="movies", doc_ids=["1"])
+
+    assert dead_letters.take("movies", limit=10) == ["2"]
+    assert dead_letters.count("movies") == 2
+
+
+class FakeExtractor:
+    """В базе только фильм MOVIE_ID; остальные id удалены."""
+
+    def fetch_film_work_rows(self, film_work_ids):
+        return [{"id": i} for i in film_work_ids if str(i) == MOVIE_ID]
+
+    def fetch_genres_by_ids(self, genre_ids):
+        return []
+
+    def fetch_persons_by_ids(self, person_ids):
+        return []
+
+
+def test_retry_reloads_and_requeues_failures(dead_letters, monkeypatch):
+    monkeypatch.setattr(
+        main_module,
+        "film_work_row_to_document",
+        lambda row: {"id": str(row["id"]), "title": "Star Wars"},
+    )
+    loader = FakeLoader(dead_letters)
+    deleted_id = str(uuid.UUID(int=2))
+    loader.documents[deleted_id] = {"id": deleted_id}
+    loader.rejected.add(MOVIE_ID)
+    dead_letters.add(index_name="movies", doc_ids=[MOVIE_ID, deleted_id])
+
+    # фильм снова отклонён и тратит попытку, удалённый из базы
+    # удаляется из индекса и снимается с очереди
+    main_module.retry_dead_letters(loader, FakeExtractor(), dead_letters)
+    assert dead_letters.take("movies", limit=10) == [MOVIE_ID]
+    assert deleted_id not in loader.documents
+
+    loader.rejected.clear()
+    main_module.retry_dead_letters(loader, FakeExtractor(), dead_letters)
+
+    assert loader.documents[MOVIE_ID]["title"] == "Star Wars"
+    assert dead_letters.count("movies") == 0
@@ -0,0 +1,80 @@
+import datetime
+
+from etl.db.exporter import PostgresBulkExporter, parse_copy_line
+
+FILM_ID = "00000000-0000-0000-0000-000000000001"
+
+
+class FakeCursor:
+    """copy_expert пишет готовую выгрузку в текстовом формате COPY."""
+
+    def __init__(self, tables: dict[str, str]) -> None:
+        self.tables = tables
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def copy_expert(self, sql, file):
+        table = next(name for name in self.tables if f"FROM {name}" in sql)
+        assert "FORMAT text" in sql
+        file.write(self.tables[table])
+
+
+class FakeConnection:
+    def __init__(self, tables: dict[str, str]) -> None:
+        self.tables = tables
+
+    def cursor(self):
+        return FakeCursor(self.tables)
+
+
+def test_null_is_told_apart_from_text_values():
+    assert parse_copy_line("\\N\t\t\\\\N\tnull\n") == [None, "", "\\N", "null"]
+
+
+def test_escaped_characters_are_restored():
+    line = 'say "hi"\tline\\none\\ttab\tback\\\\slash\n'
+
+    assert parse_copy_line(line) == ['say "hi"', "line\none\ttab", "back\\slash"]
+
+
+def test_film_rows_are_assembled_from_tables():
+    genre_id, person_id = "g1", "p1"
+    exporter = PostgresBulkExporter(
+        FakeConnection(
+            {
+                "content.genre_film_work": f"{FILM_ID}\t{genre_id}\n",
+                "content.genre": f"{genre_id}\tDrama\n",
+                "content.person_film_work": f"{FILM_ID}\t{person_id}\tactor\n",
+                "content.person": f"{person_id}\tO'Brien\n",
+                "content.film_work": (
+                    f'{FILM_ID}\t"Quoted"\t\\N\t\\\\N\t2001-02-03\n'
+                    f"other\t\t7.5\t\t\\N\n"
+                ),
+            },
+        ),
+    )
+
+    [rows] = list(exporter.iter_film_work_rows())
+
+    assert rows[0] == {
+        "id": FILM_ID,
+        "title": '"Quoted"',
+        "rating": None,
+        "description": "\\N",
+        "creation_date": datetime.date(2001, 2, 3),
+        "genres": [{"id": genre_id, "name": "Drama"}],
+        "persons": [{"id": person_id, "full_name": "O'Brien", "role": "actor"}],
+    }
+    assert rows[1] == {
+        "id": "other",
+        "title": "",
+        "rating": 7.5,
+        "description": "",
+        "creation_date": None,
+        "genres": [],
+        "persons": [],
+    }
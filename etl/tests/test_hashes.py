@@ -0,0 +1,127 @@
+import pytest
+from etl.es.indices import MOVIES_INDEX
+from etl.es.loader import ElasticsearchLoader
+from etl.state.hashes import DocumentHashStore
+
+
+@pytest.fixture
+def hash_store(tmp_path):
+    store = DocumentHashStore(file_name=str(tmp_path / "hashes.sqlite3"))
+    yield store
+    store.conn.close()
+
+
+def load(store: DocumentHashStore, documents: list[dict], failed_ids=()) -> list:
+    sent = list(store.filter_changed(index_name="movies", documents=documents))
+    store.commit(index_name="movies", failed_ids=set(failed_ids))
+    return sent
+
+
+def test_unchanged_documents_are_skipped(hash_store):
+    docs = [{"id": "1", "title": "A"}, {"id": "2", "title": "B"}]
+    assert load(hash_store, docs) == docs
+
+    changed = [{"id": "1", "title": "A"}, {"id": "2", "title": "B2"}]
+    assert load(hash_store, changed) == [{"id": "2", "title": "B2"}]
+
+
+def test_failed_documents_are_sent_again(hash_store):
+    docs = [{"id": "1", "title": "A"}, {"id": "2", "title": "B"}]
+    load(hash_store, docs, failed_ids={"2"})
+
+    assert load(hash_store, docs) == [{"id": "2", "title": "B"}]
+
+
+def test_discarded_pending_hashes_are_not_committed(hash_store):
+    docs = [{"id": "1", "title": "A"}]
+    # загрузка упала: хэши, собранные filter_changed, не сохраняются
+    list(hash_store.filter_changed(index_name="movies", documents=docs))
+    hash_store.discard("movies")
+    hash_store.commit(index_name="movies", failed_ids=set())
+
+    assert load(hash_store, docs) == docs
+
+
+def test_pending_hashes_of_previous_pass_are_dropped(hash_store):
+    # прошлый проход не дошёл до commit; его хэши не должны попасть
+    # в commit следующего прохода
+    list(hash_store.filter_changed(index_name="movies", documents=[{"id": "1"}]))
+    load(hash_store, [{"id": "2"}])
+
+    assert load(hash_store, [{"id": "1"}]) == [{"id": "1"}]
+
+
+def test_clear_forgets_index_hashes(hash_store):
+    docs = [{"id": "1", "title": "A"}]
+    load(hash_store, docs)
+    list(hash_store.filter_changed(index_name="genres", documents=docs))
+    hash_store.commit(index_name="genres", failed_ids=set())
+
+    hash_store.clear("movies")
+
+    assert load(hash_store, docs) == docs
+    assert list(hash_store.filter_changed(index_name="genres", documents=docs)) == []
+
+
+def test_deleted_document_is_sent_when_it_returns(hash_store):
+    docs = [{"id": "1", "title": "A"}, {"id": "2", "title": "B"}]
+    load(hash_store, docs)
+
+    hash_store.forget("movies", ["1"])
+
+    assert load(hash_store, docs) == [{"id": "1", "title": "A"}]
+
+
+class FakeIndices:
+    def __init__(self, existing: set[str]) -> None:
+        self.existing = existing
+        self.created: list[str] = []
+
+    def exists(self, index: str) -> bool:
+        return index in self.existing
+
+    def create(self, index: str, body: dict) -> None:
+        self.existing.add(index)
+        self.created.append(index)
+
+    def get_mapping(self, index: str) -> dict:
+        return {index: {"mappings": {"_meta": {"version": MOVIES_INDEX.version}}}}
+
+
+class FakeClient:
+    def __init__(self, existing: set[str]) -> None:
+        self.indices = FakeIndices(existing)
+
+
+def make_loader(client: FakeClient, hash_store: DocumentHashStore):
+    return ElasticsearchLoader(
+        client=client,
+        movies_index_name="movies",
+        genres_index_name="genres",
+        persons_index_name="persons",
+        hash_store=hash_store,
+    )
+
+
+def test_recreated_index_clears_hashes(hash_store):
+    docs = [{"id": "1", "title": "A"}]
+    load(hash_store, docs)
+
+    # индекс удалили в обход ETL: при создании заново хэши сбрасываются,
+    # и все документы уходят в новый индекс
+    client = FakeClient(existing=set())
+    make_loader(client, hash_store).ensure_movies_index()
+
+    assert client.indices.created == ["movies"]
+    assert load(hash_store, docs) == docs
+
+
+def test_existing_index_keeps_hashes(hash_store):
+    docs = [{"id": "1", "title": "A"}]
+    load(hash_store, docs)
+
+    client = FakeClient(existing={"movies"})
+    make_loader(client, hash_store).ensure_movies_index()
+
+    assert client.indices.created == []
+    assert load(hash_store, docs) == []
@@ -0,0 +1,72 @@
+from etl.es.loader import bulk_action, record_bulk_result
+
+DOC = {"id": "1", "title": "Star Wars"}
+
+
+def test_index_action_replaces_the_whole_document():
+    assert bulk_action(DOC, "movies") == {
+        "_index": "movies",
+        "_id": "1",
+        "_source": DOC,
+    }
+
+
+def test_update_action_is_partial():
+    assert bulk_action(DOC, "movies", op_type="update") == {
+        "_index": "movies",
+        "_id": "1",
+        "_op_type": "update",
+        "doc": DOC,
+    }
+
+
+def test_upsert_action_creates_missing_documents():
+    action = bulk_action(DOC, "movies", op_type="upsert")
+
+    assert action["_op_type"] == "update"
+    assert action["doc_as_upsert"] is True
+
+
+def test_failed_ids_are_returned():
+    errors = [
+        {"index": {"_id": "1", "status": 429}},
+        {"index": {"_id": "2", "status": 400}},
+    ]
+
+    failed = record_bulk_result("movies", "index", 3, errors, elapsed=1.0)
+
+    assert failed == {"1", "2"}
+
+
+def test_updates_of_missing_documents_are_failures():
+    errors = [
+        {"update": {"_id": "1", "status": 404}},
+        {"update": {"_id": "2", "status": 429}},
+    ]
+
+    failed = record_bulk_result("movies", "update", 0, errors, elapsed=0.0)
+
+    assert failed == {"1", "2"}
+
+
+def test_missing_documents_fail_an_upsert():
+    errors = [{"update": {"_id": "1", "status": 404}}]
+
+    assert record_bulk_result("movies", "upsert", 0, errors, elapsed=0.0) == {"1"}
+
+
+def test_delete_action_has_no_body():
+    assert bulk_action({"id": "1"}, "movies", op_type="delete") == {
+        "_index": "movies",
+        "_id": "1",
+        "_op_type": "delete",
+    }
+
+
+def test_deletes_of_missing_documents_are_not_failures():
+    errors = [
+        {"delete": {"_id": "1", "status": 404}},
+        {"delete": {"_id": "2", "status": 429}},
+    ]
+
+    assert record_bulk_result("movies", "delete", 0, errors, elapsed=0.0) == {"2"}
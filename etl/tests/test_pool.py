@@ -0,0 +1,82 @@
+import psycopg2
+import pytest
+from etl.db.pool import PostgresConnectionPool
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.sessions = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def set_session(self, isolation_level=None, readonly=None):
+        self.sessions.append((isolation_level, readonly))
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.returned = []
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn, close=False):
+        self.returned.append(close)
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection()
+
+
+@pytest.fixture
+def pool(conn):
+    pool = PostgresConnectionPool(settings=None)
+    pool._pool = FakePool(conn)
+    return pool
+
+
+def test_session_is_set_on_checkout_and_reset_on_return(pool, conn):
+    with pool.connection(
+        isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True
+    ):
+        assert conn.sessions == [(ISOLATION_LEVEL_REPEATABLE_READ, True)]
+
+    assert conn.sessions[-1] == ("DEFAULT", "DEFAULT")
+    assert pool._pool.returned == [False]
+
+
+def test_default_checkout_does_not_inherit_previous_mode(pool, conn):
+    with pool.connection(
+        isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True
+    ):
+        pass
+    with pool.connection():
+        assert conn.sessions[-1] == ("DEFAULT", False)
+
+
+def test_broken_connection_is_closed(pool, conn):
+    with pytest.raises(psycopg2.OperationalError), pool.connection():
+        raise psycopg2.OperationalError
+
+    assert conn.sessions[-1] != ("DEFAULT", "DEFAULT")
+    assert pool._pool.returned == [True]
@@ -0,0 +1,136 @@
+import datetime
+import types
+
+import etl.rebuild as rebuild_module
+import pytest
+from etl.es.indices import MOVIES_INDEX
+
+SNAPSHOT_AT = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+class FakeDatabase:
+    """Строки с updated_at; строка видна снимку, только если закоммичена."""
+
+    def __init__(self) -> None:
+        self.rows: dict[str, tuple[datetime.datetime, bool]] = {}
+        # начало самой старой пишущей транзакции в момент снимка
+        self.oldest_open_write = SNAPSHOT_AT
+
+    def write(self, row_id: str, updated_at: datetime.datetime, committed=True):
+        self.rows[row_id] = (updated_at, committed)
+
+    def commit(self, row_id: str) -> None:
+        updated_at, _ = self.rows[row_id]
+        self.rows[row_id] = (updated_at, True)
+
+
+class FakeExtractor:
+    def __init__(self, database: FakeDatabase) -> None:
+        self.database = database
+
+    def fetch_snapshot_time(self):
+        return SNAPSHOT_AT
+
+    def fetch_oldest_open_write(self):
+        return self.database.oldest_open_write
+
+
+class FakeConnection:
+    def set_session(self, **kwargs):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeLoader:
+    def __init__(self) -> None:
+        self.tuning = types.SimpleNamespace(serving_settings=dict)
+        self.indices: dict[str, set[str]] = {}
+        self.aliases: dict[str, str] = {}
+
+    def next_index_version(self, alias):
+        return 2
+
+    def create_index(self, index_name, body):
+        self.indices[index_name] = set()
+
+    def update_index_settings(self, index_name, settings):
+        pass
+
+    def optimize_index(self, index_name):
+        pass
+
+    def swap_alias(self, alias, index_name):
+        self.aliases[alias] = index_name
+        return []
+
+    def write(self, index_name: str, row_ids) -> None:
+        self.indices[self.aliases.get(index_name, index_name)].update(row_ids)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(
+        rebuild_module, "create_pg_connection", lambda settings: FakeConnection()
+    )
+    monkeypatch.setattr(rebuild_module.psycopg2.extras, "register_uuid", dict)
+    monkeypatch.setattr(
+        rebuild_module, "PostgresExtractor", lambda connection: FakeExtractor(database)
+    )
+    monkeypatch.setattr(rebuild_module, "index_body", lambda *args, **kwargs: {})
+    return database
+
+
+def run_rebuild(database: FakeDatabase, during_load=None) -> FakeLoader:
+    loader = FakeLoader()
+
+    def load(loader, conn, index_name, itersize, since):
+        if since is None:
+            # полная загрузка видит только закоммиченное к снимку
+            ids = {row_id for row_id, (_, done) in database.rows.items() if done}
+            loader.write(index_name, ids)
+            if during_load is not None:
+                during_load()
+            return
+        loader.write(
+            index_name,
+            {
+                row_id
+                for row_id, (updated_at, done) in database.rows.items()
+                if done and updated_at >= since
+            },
+        )
+
+    rebuild_module.rebuild(
+        loader=loader,
+        db_settings=types.SimpleNamespace(POSTGRES_ITERSIZE=100),
+        alias="movies",
+        spec=MOVIES_INDEX,
+        load=load,
+    )
+    return loader
+
+
+def test_row_committed_during_load_reaches_new_index(database):
+    database.write("old", SNAPSHOT_AT - datetime.timedelta(days=1))
+    # транзакция открыта до снимка, а коммитится, пока идёт загрузка
+    database.write("late", SNAPSHOT_AT - datetime.timedelta(seconds=30), False)
+    database.oldest_open_write = SNAPSHOT_AT - datetime.timedelta(minutes=10)
+
+    loader = run_rebuild(database, during_load=lambda: database.commit("late"))
+
+    assert loader.indices["movies_v2"] == {"old", "late"}
+
+
+def test_app_clock_skew_is_covered_without_visible_transactions(database):
+    # xact_start чужих транзакций не виден, updated_at поставлен до now()
+    database.write("late", SNAPSHOT_AT - datetime.timedelta(seconds=5), False)
+
+    loader = run_rebuild(database, during_load=lambda: database.commit("late"))
+
+    assert "late" in loader.indices["movies_v2"]
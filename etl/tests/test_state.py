@@ -0,0 +1,98 @@
+import datetime
+import threading
+import uuid
+
+import pytest
+from etl.dto.dto import Watermark
+from etl.state.state import State
+from etl.state.storage import JsonFileStorage, SQLiteStorage
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "json":
+        return JsonFileStorage(file_name=str(tmp_path / "state.json"))
+    return SQLiteStorage(file_name=str(tmp_path / "state.db"))
+
+
+def test_watermarks_survive_restart(storage):
+    State(storage).set_watermarks({"genre": Watermark(START, ID)})
+
+    assert State(storage).get_watermark("genre") == Watermark(START, ID)
+
+
+def test_lagging_replica_does_not_move_watermark_back(storage):
+    lagging = State(storage)
+    leading = State(storage)
+    later = START + datetime.timedelta(minutes=5)
+
+    leading.set_watermarks({"genre": Watermark(later, ID)})
+    lagging.set_watermarks({"genre": Watermark(START, ID)})
+
+    assert State(storage).get_watermark("genre") == Watermark(later, ID)
+    assert lagging.get_watermark("genre") == Watermark(later, ID)
+
+
+def test_watermark_id_breaks_ties(storage):
+    state = State(storage)
+    next_id = uuid.UUID(int=ID.int + 1)
+
+    state.set_watermarks({"genre": Watermark(START, next_id)})
+    state.set_watermarks({"genre": Watermark(START, ID)})
+
+    assert State(storage).get_watermark("genre") == Watermark(START, next_id)
+
+
+def test_timestamp_moves_forward_only_and_resets(storage):
+    state = State(storage)
+    state.set("ratings_ts", START)
+    state.set("ratings_ts", START - datetime.timedelta(days=1))
+    assert State(storage).get("ratings_ts") == START
+
+    state.set("ratings_ts", None)
+    assert State(storage).get("ratings_ts") is None
+
+
+def test_transaction_saves_once_and_discards_on_error(storage):
+    state = State(storage)
+    with state.transaction():
+        state.set_watermarks({"genre": Watermark(START, ID)})
+        state.set_watermarks({"person": Watermark(START, ID)})
+        assert State(storage).get_watermark("genre") == Watermark()
+
+    assert State(storage).get_watermark("person") == Watermark(START, ID)
+
+    later = START + datetime.timedelta(minutes=5)
+    with pytest.raises(RuntimeError), state.transaction():
+        state.set_watermarks({"genre": Watermark(later, ID)})
+        raise RuntimeError
+
+    assert state.get_watermark("genre") == Watermark(START, ID)
+    assert State(storage).get_watermark("genre") == Watermark(START, ID)
+
+
+def test_json_update_waits_for_a_running_update(tmp_path):
+    storage = JsonFileStorage(file_name=str(tmp_path / "state.json"))
+    other = JsonFileStorage(file_name=str(tmp_path / "state.json"))
+
+    def forward_to(value):
+        def merge(data):
+            return {"genre": value} if data.get("genre", "") < value else {}
+
+        return merge
+
+    writer = threading.Thread(target=other.update, args=(forward_to("2"),))
+
+    def merge(data):
+        # другая реплика пишет, пока эта держит прочитанное состояние
+        writer.start()
+        writer.join(timeout=0.1)
+        return forward_to("1")(data)
+
+    storage.update(merge)
+    writer.join()
+
+    assert storage.load() == {"genre": "2"}
@@ -1,4 +1,5 @@
 from db.elastic import get_elastic
+from db.local_cache import LocalCache, get_local_cache
 from db.redis import get_redis
 from elasticsearch import AsyncElasticsearch
 from fastapi.params import Depends
@@ -6,6 +7,7 @@ from redis.asyncio import Redis
 from repositories.cache.film_cache import FilmCacheRepository
 from repositories.cache.genre_cache import GenreCacheRepository
 from repositories.cache.person_cache import PersonCacheRepository
+from repositories.cache.response_cache import ResponseCacheRepository
 from repositories.elastic.film_elastic import FilmElasticRepository
 from repositories.elastic.genre_elastic import GenreElasticRepository
 from repositories.elastic.person_elastic import PersonElasticRepository
@@ -22,8 +24,16 @@ def create_film_elastic_repository(
 
 def create_film_cache_repository(
     redis: Redis = Depends(get_redis),
+    local_cache: LocalCache | None = Depends(get_local_cache),
 ) -> FilmCacheRepository:
-    return FilmCacheRepository(redis=redis)
+    return FilmCacheRepository(redis=redis, local_cache=local_cache)
+
+
+def create_response_cache_repository(
+    redis: Redis = Depends(get_redis),
+    local_cache: LocalCache | None = Depends(get_local_cache),
+) -> ResponseCacheRepository:
+    return ResponseCacheRepository(redis=redis, local_cache=local_cache)
 
 
 def create_film_service(
@@ -46,8 +56,9 @@ def create_genre_elastic_repository(
 
 def create_genre_cache_repository(
     redis: Redis = Depends(get_redis),
+    local_cache: LocalCache | None = Depends(get_local_cache),
 ) -> GenreCacheRepository:
-    return GenreCacheRepository(redis=redis)
+    return GenreCacheRepository(redis=redis, local_cache=local_cache)
 
 
 def create_genre_service(
@@ -70,8 +81,9 @@ def create_person_elastic_repository(
 
 def create_person_cache_repository(
     redis: Redis = Depends(get_redis),
+    local_cache: LocalCache | None = Depends(get_local_cache),
 ) -> PersonCacheRepository:
-    return PersonCacheRepository(redis=redis)
+    return PersonCacheRepository(redis=redis, local_cache=local_cache)
 
 
 def create_person_service(
@@ -9,3 +9,13 @@ class PaginationQuery:
     ):
         self.page_number = page_number
         self.page_size = page_size
+
+
+class CursorQuery:
+    # курсорная пагинация вместо page_number: пустой cursor — первая
+    # страница, дальше — next_cursor из предыдущего ответа
+    def __init__(
+        self,
+        cursor: str | None = Query(None),
+    ):
+        self.cursor = cursor
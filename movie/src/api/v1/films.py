@@ -1,8 +1,10 @@
 from http import HTTPStatus
 from uuid import UUID
 
+import orjson
 from core.auth import TokenData
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from models.film import Film
 from models.schemas import (
     FilmListResponse,
     FilmResponse,
@@ -10,30 +12,40 @@ from models.schemas import (
     GenreResponse,
     PersonsResponse,
 )
+from pydantic import BaseModel
+from repositories.cache.base import LIST_CACHE_TTL
+from repositories.cache.response_cache import ResponseCacheRepository
+from repositories.elastic.cursor import InvalidCursorError
 from services.film import FilmService
 
-from api.v1.container import create_film_service
-from api.v1.dependencies.pagination import PaginationQuery
+from api.v1.container import create_film_service, create_response_cache_repository
+from api.v1.dependencies.pagination import CursorQuery, PaginationQuery
 from api.v1.dependencies.user import require_roles
 from api.v1.sorting import FilmSortOptions
 
 router = APIRouter()
 
 
-@router.get("/new", response_model=FilmListResponse)
-async def film_new(
-    pagination: PaginationQuery = Depends(),
-    sort: FilmSortOptions | None = Query(None),
-    genre: UUID | None = Query(None),
-    service: FilmService = Depends(create_film_service),
-    current_user: TokenData = Depends(require_roles(["subscriber"])),
+class JSONBytesResponse(Response):
+    # готовое тело JSON: роут отдаёт байты из кэша без сериализации,
+    # схема ответа для OpenAPI задаётся через responses=
+    media_type = "application/json"
+
+
+def _json_response(body: bytes) -> Response:
+    return JSONBytesResponse(content=body)
+
+
+def _render(response: BaseModel) -> bytes:
+    return orjson.dumps(response.model_dump())
+
+
+def _film_list_response(
+    total: int,
+    films: list[Film],
+    pagination: PaginationQuery,
+    next_cursor: str | None = None,
 ) -> FilmListResponse:
-    total, films = await service.get_new(
-        sort=sort,
-        genre=genre,
-        page=pagination.page_number,
-        size=pagination.page_size,
-    )
     return FilmListResponse(
         count=total,
         page_number=pagination.page_number,
@@ -46,81 +58,162 @@ async def film_new(
             )
             for film in films
         ],
+        next_cursor=next_cursor,
     )
 
 
-@router.get("/search", response_model=FilmListResponse)
-async def films_search(
-    query: str = Query(..., min_length=1),
+@router.get("/new", response_model=FilmListResponse)
+async def film_new(
     pagination: PaginationQuery = Depends(),
+    sort: FilmSortOptions | None = Query(None),
+    genre: UUID | None = Query(None),
     service: FilmService = Depends(create_film_service),
+    current_user: TokenData = Depends(require_roles(["subscriber"])),
 ) -> FilmListResponse:
-    total, films = await service.search(
-        query=query,
+    total, films = await service.get_new(
+        sort=sort,
+        genre=genre,
         page=pagination.page_number,
         size=pagination.page_size,
     )
-    return FilmListResponse(
-        count=total,
-        page_number=pagination.page_number,
-        page_size=pagination.page_size,
-        results=[
-            FilmShort(
-                uuid=film.id,
-                title=film.title,
-                imdb_rating=film.imdb_rating or 0.0,
-            )
-            for film in films
-        ],
+    return _film_list_response(total, films, pagination)
+
+
+@router.get(
+    "/search",
+    response_class=JSONBytesResponse,
+    responses={HTTPStatus.OK.value: {"model": FilmListResponse}},
+)
+async def films_search(
+    query: str = Query(..., min_length=1),
+    pagination: PaginationQuery = Depends(),
+    service: FilmService = Depends(create_film_service),
+    response_cache: ResponseCacheRepository = Depends(
+        create_response_cache_repository,
+    ),
+) -> Response:
+    async def render() -> bytes:
+        # тело кэшируется целиком: кэш списков в сервисе не нужен
+        total, films = await service.search(
+            query=query,
+            page=pagination.page_number,
+            size=pagination.page_size,
+            cached=not response_cache.enabled,
+        )
+        return _render(_film_list_response(total, films, pagination))
+
+    normalized_query = " ".join(query.strip().lower().split())
+    body = await response_cache.get_or_render(
+        key=(
+            "films:search:"
+            f"query={normalized_query}:"
+            f"page={pagination.page_number}:"
+            f"size={pagination.page_size}"
+        ),
+        render=render,
+        ttl=LIST_CACHE_TTL,
     )
+    return _json_response(body)
 
 
-@router.get("/{film_id}", response_model=FilmResponse)
+@router.get(
+    "/{film_id}",
+    response_class=JSONBytesResponse,
+    responses={HTTPStatus.OK.value: {"model": FilmResponse}},
+)
 async def film_details(
     film_id: UUID,
     service: FilmService = Depends(create_film_service),
-) -> FilmResponse:
-    film = await service.get_by_id(film_id=film_id)
-    if not film:
+    response_cache: ResponseCacheRepository = Depends(
+        create_response_cache_repository,
+    ),
+) -> Response:
+    async def render() -> bytes | None:
+        film = await service.get_by_id(
+            film_id=film_id,
+            cached=not response_cache.enabled,
+        )
+        if not film:
+            return None
+        return _render(
+            FilmResponse(
+                uuid=film.id,
+                imdb_rating=film.imdb_rating,
+                user_rating=film.user_rating,
+                user_rating_count=film.user_rating_count,
+                genres=[GenreResponse(uuid=g.id, name=g.name) for g in film.genres],
+                title=film.title,
+                description=film.description,
+                directors=[
+                    PersonsResponse(uuid=d.id, name=d.name) for d in film.directors
+                ],
+                actors=[PersonsResponse(uuid=a.id, name=a.name) for a in film.actors],
+                writers=[PersonsResponse(uuid=w.id, name=w.name) for w in film.writers],
+            )
+        )
+
+    body = await response_cache.get_or_render(key=f"film:{film_id}", render=render)
+    if body is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail=f"Film with id={film_id} not found",
         )
-    return FilmResponse(
-        uuid=film.id,
-        imdb_rating=film.imdb_rating,
-        genres=[GenreResponse(uuid=g.id, name=g.name) for g in film.genres],
-        title=film.title,
-        description=film.description,
-        directors=[PersonsResponse(uuid=d.id, name=d.name) for d in film.directors],
-        actors=[PersonsResponse(uuid=a.id, name=a.name) for a in film.actors],
-        writers=[PersonsResponse(uuid=w.id, name=w.name) for w in film.writers],
-    )
+    return _json_response(body)
 
 
-@router.get("/", response_model=FilmListResponse)
+@router.get(
+    "/",
+    response_class=JSONBytesResponse,
+    responses={HTTPStatus.OK.value: {"model": FilmListResponse}},
+)
 async def film_list(
     pagination: PaginationQuery = Depends(),
     sort: FilmSortOptions | None = Query(None),
     genre: UUID | None = Query(None),
+    cursor: CursorQuery = Depends(),
     service: FilmService = Depends(create_film_service),
-) -> FilmListResponse:
-    total, films = await service.get_list(
-        sort=sort,
-        genre=genre,
-        page=pagination.page_number,
-        size=pagination.page_size,
-    )
-    return FilmListResponse(
-        count=total,
-        page_number=pagination.page_number,
-        page_size=pagination.page_size,
-        results=[
-            FilmShort(
-                uuid=film.id,
-                title=film.title,
-                imdb_rating=film.imdb_rating or 0.0,
+    response_cache: ResponseCacheRepository = Depends(
+        create_response_cache_repository,
+    ),
+) -> Response:
+    if cursor.cursor is not None:
+        # страницы курсора не кэшируются: цепочка принадлежит одному
+        # клиенту, а ключ по курсору из запроса плодил бы записи без меры
+        try:
+            total, films, next_cursor = await service.get_list_after(
+                sort=sort,
+                genre=genre,
+                cursor=cursor.cursor,
+                size=pagination.page_size,
             )
-            for film in films
-        ],
+        except InvalidCursorError as exc:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail=str(exc),
+            ) from exc
+        return _json_response(
+            _render(_film_list_response(total, films, pagination, next_cursor)),
+        )
+
+    async def render() -> bytes:
+        total, films = await service.get_list(
+            sort=sort,
+            genre=genre,
+            page=pagination.page_number,
+            size=pagination.page_size,
+            cached=not response_cache.enabled,
+        )
+        return _render(_film_list_response(total, films, pagination))
+
+    body = await response_cache.get_or_render(
+        key=(
+            "films:list:"
+            f"sort={sort.value if sort else 'default'}:"
+            f"genre={genre or 'all'}:"
+            f"page={pagination.page_number}:"
+            f"size={pagination.page_size}"
+        ),
+        render=render,
+        ttl=LIST_CACHE_TTL,
     )
+    return _json_response(body)
@@ -1,3 +1,4 @@
+from http import HTTPStatus
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -7,10 +8,11 @@ from models.schemas import (
     PersonListResponse,
     PersonResponse,
 )
+from repositories.elastic.cursor import InvalidCursorError
 from services.person import PersonService
 
 from api.v1.container import create_person_service
-from api.v1.dependencies.pagination import PaginationQuery
+from api.v1.dependencies.pagination import CursorQuery, PaginationQuery
 from api.v1.sorting import PersonSortOptions
 
 router = APIRouter()
@@ -94,13 +96,28 @@ async def get_person(
 async def persons_list(
     pagination: PaginationQuery = Depends(),
     sort: PersonSortOptions | None = Query(None),
+    cursor: CursorQuery = Depends(),
     service: PersonService = Depends(create_person_service),
 ) -> PersonListResponse:
-    total, persons = await service.get_list(
-        page=pagination.page_number,
-        size=pagination.page_size,
-        sort=sort,
-    )
+    next_cursor = None
+    if cursor.cursor is not None:
+        try:
+            total, persons, next_cursor = await service.get_list_after(
+                sort=sort,
+                cursor=cursor.cursor,
+                size=pagination.page_size,
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail=str(exc),
+            ) from exc
+    else:
+        total, persons = await service.get_list(
+            page=pagination.page_number,
+            size=pagination.page_size,
+            sort=sort,
+        )
     return PersonListResponse(
         count=total,
         page_number=pagination.page_number,
@@ -112,4 +129,5 @@ async def persons_list(
             )
             for person in persons
         ],
+        next_cursor=next_cursor,
     )
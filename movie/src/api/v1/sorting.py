@@ -4,6 +4,8 @@ from enum import Enum
 class FilmSortOptions(str, Enum):
     imdb_rating_asc = "imdb_rating"
     imdb_rating_desc = "-imdb_rating"
+    user_rating_asc = "user_rating"
+    user_rating_desc = "-user_rating"
     title_asc = "title"
     title_desc = "-title"
 
@@ -13,9 +13,51 @@ PROJECT_NAME = os.getenv("PROJECT_NAME", "movies")
 REDIS_HOST = os.getenv("REDIS_HOST", "127.0.0.1")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
+# кэш процесса перед Redis: число записей (0 — выключен) и TTL в секундах
+# по префиксам ключей; TTL короче, чем в Redis: сообщение об инвалидации
+# может потеряться при переподключении
+LOCAL_CACHE_MAX_SIZE = int(os.getenv("LOCAL_CACHE_MAX_SIZE", 10_000))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", 30))
+LOCAL_CACHE_LIST_TTL = float(os.getenv("LOCAL_CACHE_LIST_TTL", 5))
+LOCAL_CACHE_TTLS = {
+    "film:": LOCAL_CACHE_TTL,
+    "genre:": LOCAL_CACHE_TTL,
+    "person:": LOCAL_CACHE_TTL,
+    "films:": LOCAL_CACHE_LIST_TTL,
+    "genre:list:": LOCAL_CACHE_LIST_TTL,
+    "person:list:": LOCAL_CACHE_LIST_TTL,
+    "person:search:": LOCAL_CACHE_LIST_TTL,
+    "response:film:": LOCAL_CACHE_TTL,
+    "response:films:": LOCAL_CACHE_LIST_TTL,
+}
+
+# защита от лавины промахов: блокировка пересчёта ключа на весь кластер
+# (мс, 0 — только в пределах воркера) и коэффициент вероятностного
+# обновления до истечения TTL (0 — выключено)
+CACHE_LOCK_TTL_MS = int(os.getenv("CACHE_LOCK_TTL_MS", 0))
+CACHE_EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", 1.0))
+
+# stale-while-revalidate для списков и поиска: столько секунд после
+# LIST_CACHE_TTL список отдаётся устаревшим и обновляется в фоне (0 — выключено)
+LIST_CACHE_STALE_TTL = int(os.getenv("LIST_CACHE_STALE_TTL", 0))
+
+# кэш готовых тел ответов фильмов; уровень сжатия zstd в Redis
+# (0 — без сжатия)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_ZSTD_LEVEL = int(os.getenv("RESPONSE_CACHE_ZSTD_LEVEL", 0))
+
 ELASTIC_HOST = os.getenv("ES_HOST", "127.0.0.1")
 ELASTIC_PORT = int(os.getenv("ES_PORT", 9200))
 
+# имена алиасов: ETL переключает их на новый индекс после переиндексации
+MOVIES_ES_INDEX = os.getenv("MOVIES_ES_INDEX", "movies")
+GENRES_ES_INDEX = os.getenv("GENRES_ES_INDEX", "genres")
+PERSONS_ES_INDEX = os.getenv("PERSONS_ES_INDEX", "persons")
+
+# срок жизни point-in-time для курсорной пагинации ("1m"; пусто — без PIT,
+# страницы курсора читают текущее состояние индекса)
+ES_CURSOR_PIT_KEEP_ALIVE = os.getenv("ES_CURSOR_PIT_KEEP_ALIVE", "")
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 JWT_PUBLIC_KEY_PATH = ("JWT_PUBLIC_KEY_PATH", "/run/secrets/jwt/public.pem")
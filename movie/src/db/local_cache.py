@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class LocalCache:
+    """
+    Ограниченный LRU-кэш процесса перед Redis. Хранит готовые объекты
+    моделей, так что попадание — это поиск в словаре без обращения к Redis
+    и без валидации pydantic. Запись живёт не дольше TTL своего префикса
+    ключа, при переполнении вытесняются давно не читанные записи.
+    Объекты отдаются всем читателям одни и те же, поэтому модели заморожены.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttls: dict[str, float],
+        default_ttl: float,
+    ) -> None:
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        # более длинный префикс точнее: "person:list:" раньше "person:"
+        self._ttls = sorted(ttls.items(), key=lambda item: len(item[0]), reverse=True)
+        # ключ -> (истечение по monotonic, мягкий срок по time.time, значение)
+        self._entries: OrderedDict[str, tuple[float, float | None, Any]] = OrderedDict()
+        # свои сообщения об инвалидации процесс пропускает
+        self.origin = uuid.uuid4().hex
+
+    def ttl_for(self, key: str) -> float:
+        for prefix, ttl in self._ttls:
+            if key.startswith(prefix):
+                return ttl
+        return self.default_ttl
+
+    def get(self, key: str) -> Any | None:
+        entry = self.lookup(key)
+        return None if entry is None else entry[0]
+
+    def lookup(self, key: str) -> tuple[Any, float] | None:
+        # значение и сколько секунд оно ещё свежее: мягкий срок записи
+        # в Redis переносится сюда, чтобы раннее обновление и отдача
+        # устаревшего срабатывали и для горячих ключей
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, fresh_until, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        if fresh_until is None:
+            return value, float("inf")
+        return value, fresh_until - time.time()
+
+    def set(self, key: str, value: Any, fresh_for: float | None = None) -> None:
+        ttl = self.ttl_for(key)
+        if self.max_size <= 0 or ttl <= 0:
+            return
+
+        fresh_until = None if fresh_for is None else time.time() + fresh_for
+        self._entries[key] = (time.monotonic() + ttl, fresh_until, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def invalidation_message(self, keys: Iterable[str]) -> str:
+        return json.dumps({"origin": self.origin, "keys": list(keys)})
+
+    def handle_invalidation(self, data: bytes | str) -> None:
+        # битое сообщение не должно останавливать подписку
+        try:
+            payload = json.loads(data)
+            if payload["origin"] != self.origin:
+                self.delete(payload["keys"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Malformed cache invalidation message: %r", data[:200])
+
+    async def listen_invalidations(
+        self,
+        redis: Redis,
+        retry_delay: float = 1.0,
+    ) -> None:
+        # каждый процесс, записавший новое значение в Redis, сообщает ключ
+        # остальным воркерам; после переподключения неизвестно, какие
+        # сообщения пропущены, поэтому кэш очищается целиком
+        while True:
+            try:
+                async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    self.clear()
+                    async for message in pubsub.listen():
+                        self.handle_invalidation(message["data"])
+            except RedisError:
+                logger.warning("Cache invalidation channel lost, reconnecting")
+                self.clear()
+                await asyncio.sleep(retry_delay)
+
+
+local_cache: Optional[LocalCache] = None
+
+
+async def get_local_cache() -> LocalCache | None:
+    return local_cache
@@ -1,9 +1,10 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from api.v1 import films, genres, persons
 from core import config
 from core.config import setup_logging
-from db import elastic, redis
+from db import elastic, local_cache, redis
 from elasticsearch import AsyncElasticsearch
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
@@ -22,7 +23,21 @@ async def lifespan(app: FastAPI):
     elastic.es = AsyncElasticsearch(
         hosts=[f"http://{config.ELASTIC_HOST}:{config.ELASTIC_PORT}"],
     )
+    invalidations = None
+    if config.LOCAL_CACHE_MAX_SIZE > 0:
+        local_cache.local_cache = local_cache.LocalCache(
+            max_size=config.LOCAL_CACHE_MAX_SIZE,
+            ttls=config.LOCAL_CACHE_TTLS,
+            default_ttl=config.LOCAL_CACHE_TTL,
+        )
+        invalidations = asyncio.create_task(
+            local_cache.local_cache.listen_invalidations(redis.redis),
+        )
     yield
+    if invalidations is not None:
+        invalidations.cancel()
+        with suppress(asyncio.CancelledError):
+            await invalidations
     await redis.redis.close()
     await elastic.es.close()
 
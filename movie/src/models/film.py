@@ -1,19 +1,31 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+# модели из кэша процесса общие для всех запросов воркера,
+# поэтому их поля нельзя присваивать
+FROZEN = ConfigDict(frozen=True)
 
 
 class Persons(BaseModel):
+    model_config = FROZEN
+
     id: str
     name: str
 
 
 class Genre(BaseModel):
+    model_config = FROZEN
+
     id: str
     name: str
 
 
 class Film(BaseModel):
+    model_config = FROZEN
+
     id: str
     imdb_rating: float | None
+    user_rating: float | None = None
+    user_rating_count: int = 0
     genres: list[Genre]
 
     title: str
@@ -28,6 +40,16 @@ class Film(BaseModel):
     writers: list[Persons]
 
 
+class PersonFilm(BaseModel):
+    model_config = FROZEN
+
+    id: str
+    roles: list[str]
+
+
 class Person(BaseModel):
+    model_config = FROZEN
+
     id: str
     name: str
+    films: list[PersonFilm] = []
@@ -14,6 +14,8 @@ class GenreResponse(BaseModel):
 class FilmResponse(BaseModel):
     uuid: str
     imdb_rating: float | None
+    user_rating: float | None = None
+    user_rating_count: int = 0
     genres: list[GenreResponse]
 
     title: str
@@ -35,6 +37,7 @@ class FilmListResponse(BaseModel):
     page_number: int
     page_size: int
     results: list[FilmShort]
+    next_cursor: str | None = None
 
 
 class PersonResponse(BaseModel):
@@ -54,3 +57,4 @@ class PersonListResponse(BaseModel):
     page_number: int
     page_size: int
     results: list[PersonResponse]
+    next_cursor: str | None = None
@@ -1,11 +1,37 @@
+import asyncio
 import json
-from typing import Generic, Type, TypeVar
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any, Generic, Type, TypeVar
 
+from core import config
+from db.local_cache import INVALIDATION_CHANNEL, LocalCache
 from redis.asyncio import Redis
 
+from repositories.cache.coalescing import EarlyRefresh, SingleFlight
+
+logger = logging.getLogger(__name__)
+
 T = TypeVar("T")
+V = TypeVar("V")
 CACHE_TTL = 60 * 5  # 5 минут
 LIST_CACHE_TTL = 60  # 1 минута
+LOCK_POLL_INTERVAL = 0.05
+
+# снимает блокировку, только если она всё ещё наша
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# общие на воркер: промахи по одному ключу объединяются
+# между всеми репозиториями и запросами
+single_flight = SingleFlight()
+early_refresh = EarlyRefresh(beta=config.CACHE_EARLY_REFRESH_BETA)
 
 
 class BaseCacheRepository(Generic[T]):
@@ -15,48 +41,68 @@ class BaseCacheRepository(Generic[T]):
         model: Type[T],
         key_prefix: str,
         id_field: str = "id",
+        local_cache: LocalCache | None = None,
+        lock_ttl_ms: int = config.CACHE_LOCK_TTL_MS,
+        list_stale_ttl: int = config.LIST_CACHE_STALE_TTL,
     ) -> None:
         self.redis = redis
         self.model = model
         self.key_prefix = key_prefix
         self.id_field = id_field
+        self.local_cache = local_cache
+        self.lock_ttl_ms = lock_ttl_ms
+        self.list_stale_ttl = list_stale_ttl
 
     async def get(self, entity_id: str) -> T | None:
         key = f"{self.key_prefix}:{entity_id}"
-        data = await self.redis.get(key)
-        if data is None:
-            return None
-
-        if isinstance(data, bytes):
-            data = data.decode()
-
-        result = self.model.model_validate_json(data)
+        result, _ = await self._fetch(key, self._decode)
         return result
 
+    async def get_or_load(
+        self,
+        entity_id: str,
+        load: Callable[[], Awaitable[T | None]],
+    ) -> T | None:
+        key = f"{self.key_prefix}:{entity_id}"
+        return await self._get_or_load(
+            key=key,
+            group=self.key_prefix,
+            decode=self._decode,
+            load=load,
+            store=self.put,
+        )
+
     async def put(self, data: T) -> None:
         entity_id = getattr(data, self.id_field, None)
         if entity_id is None:
             raise AttributeError(
                 f"{self.model.__name__} has no field {self.id_field}",
             )
-        await self.redis.set(
-            f"{self.key_prefix}:{entity_id}",
-            data.model_dump_json(),
-            CACHE_TTL,
-        )
+        key = f"{self.key_prefix}:{entity_id}"
+        await self._set(key, data.model_dump_json(), CACHE_TTL, data, CACHE_TTL)
 
     async def get_list(self, key: str) -> tuple[int, list[T]] | None:
-        data = await self.redis.get(key)
-        if data is None:
-            return None
+        result, _ = await self._fetch(key, self._decode_list)
+        return result
 
-        if isinstance(data, bytes):
-            data = data.decode()
+    async def get_list_or_load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[tuple[int, list[T]]]],
+        ttl: int = LIST_CACHE_TTL,
+    ) -> tuple[int, list[T]]:
+        async def store(value: tuple[int, list[T]]) -> None:
+            await self.put_list(key, value, ttl)
 
-        obj = json.loads(data)
-        total = obj.get("total", 0)
-        results = [self.model.model_validate(r) for r in obj.get("results", [])]
-        return total, results
+        # "films:search:query=...:page=1" -> "films:search"
+        group = ":".join(key.split(":", 2)[:2])
+        return await self._get_or_load(
+            key=key,
+            group=group,
+            decode=self._decode_list,
+            load=load,
+            store=store,
+        )
 
     async def put_list(
         self,
@@ -64,9 +110,168 @@ class BaseCacheRepository(Generic[T]):
         value: tuple[int, list[T]],
         ttl: int = LIST_CACHE_TTL,
     ) -> None:
+        # ttl — мягкий срок: после него список ещё list_stale_ttl секунд
+        # отдаётся как устаревший, пока фоновая задача его обновляет
         total, results = value
         payload = {
             "total": total,
             "results": [r.model_dump() for r in results],
+            "soft_expires_at": time.time() + ttl,
         }
-        await self.redis.set(key, json.dumps(payload), ttl)
+        await self._set(
+            key,
+            json.dumps(payload),
+            ttl + self.list_stale_ttl,
+            (total, results),
+            ttl,
+        )
+
+    def _decode(self, data: bytes) -> tuple[T, float | None]:
+        return self.model.model_validate_json(data), None
+
+    def _decode_list(self, data: bytes) -> tuple[tuple[int, list[T]], float | None]:
+        obj = json.loads(data)
+        total = obj.get("total", 0)
+        results = [self.model.model_validate(r) for r in obj.get("results", [])]
+        return (total, results), obj.get("soft_expires_at")
+
+    async def _fetch(
+        self,
+        key: str,
+        decode: Callable[[bytes], tuple[V, float | None]],
+    ) -> tuple[V | None, float]:
+        # возвращает значение и сколько секунд оно ещё свежее:
+        # до мягкого срока, если он записан, иначе до конца TTL в Redis
+        if self.local_cache is not None:
+            entry = self.local_cache.lookup(key)
+            if entry is not None:
+                # копия процесса помнит срок записи в Redis, из которой взята
+                return entry
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            data, pttl = await pipe.execute()
+        if data is None:
+            return None, 0.0
+
+        # тело отдаётся декодеру байтами: pydantic и json читают их
+        # без промежуточной строки, ответы бывают сжаты
+        result, soft_expires_at = decode(data)
+        if soft_expires_at is not None:
+            fresh_for = soft_expires_at - time.time()
+        else:
+            # -1: ключ без срока жизни
+            fresh_for = pttl / 1000 if pttl >= 0 else float("inf")
+        if self.local_cache is not None:
+            self.local_cache.set(key, result, fresh_for)
+        return result, fresh_for
+
+    async def _get_or_load(
+        self,
+        key: str,
+        group: str,
+        decode: Callable[[bytes], tuple[V, float | None]],
+        load: Callable[[], Awaitable[V]],
+        store: Callable[[V], Awaitable[None]],
+    ) -> V:
+        cached, fresh_for = await self._fetch(key, decode)
+
+        def refresh() -> Awaitable[V]:
+            return self._load(key, group, decode, load, store, stale=cached)
+
+        if cached is not None and fresh_for <= 0:
+            # мягкий срок прошёл: отдаём устаревшее значение сразу,
+            # запрос в Elasticsearch уходит в фоновую задачу
+            single_flight.start(key, refresh)
+            return cached
+
+        if cached is not None and not early_refresh.should_refresh(group, fresh_for):
+            return cached
+
+        # промах или раннее обновление: в воркере значение считает одна
+        # корутина, остальные ждут её результата
+        return await single_flight.do(key, refresh)
+
+    async def _load(
+        self,
+        key: str,
+        group: str,
+        decode: Callable[[bytes], tuple[V, float | None]],
+        load: Callable[[], Awaitable[V]],
+        store: Callable[[V], Awaitable[None]],
+        stale: V | None,
+    ) -> V:
+        lock_key = f"lock:{key}"
+        token: str | None = None
+        if self.lock_ttl_ms > 0:
+            token = uuid.uuid4().hex
+            acquired = await self.redis.set(
+                lock_key, token, nx=True, px=self.lock_ttl_ms
+            )
+            if not acquired:
+                # значение уже считает другой воркер: отдаём старое
+                # или ждём, пока он положит новое в Redis
+                if stale is not None:
+                    return stale
+                value = await self._wait_for(key, lock_key, decode)
+                if value is not None:
+                    return value
+                token = None
+
+        try:
+            started = time.monotonic()
+            value = await load()
+            early_refresh.record(group, time.monotonic() - started)
+            if value is not None:
+                await store(value)
+            return value
+        except Exception:
+            if stale is None:
+                raise
+            logger.warning("Cache refresh failed for %s, serving stale", key)
+            return stale
+        finally:
+            if token is not None:
+                await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    async def _wait_for(
+        self,
+        key: str,
+        lock_key: str,
+        decode: Callable[[bytes], tuple[V, float | None]],
+    ) -> V | None:
+        deadline = time.monotonic() + self.lock_ttl_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value, _ = await self._fetch(key, decode)
+            if value is not None:
+                return value
+            # блокировку сняли, а значения нет: сущность не найдена
+            # или держатель упал — считаем сами
+            if not await self.redis.exists(lock_key):
+                return None
+        return None
+
+    async def _set(
+        self,
+        key: str,
+        payload: str | bytes,
+        ttl: int,
+        value: Any,
+        fresh_for: float,
+    ) -> None:
+        if self.local_cache is None:
+            await self.redis.set(key, payload, ttl)
+            return
+
+        # новое значение в Redis и сообщение другим воркерам уходят одним
+        # запросом; их локальные копии ключа устарели
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, payload, ttl)
+            pipe.publish(
+                INVALIDATION_CHANNEL,
+                self.local_cache.invalidation_message([key]),
+            )
+            await pipe.execute()
+        self.local_cache.set(key, value, fresh_for)
@@ -0,0 +1,65 @@
+import asyncio
+import math
+import random
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+V = TypeVar("V")
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные промахи кэша по одному ключу: значение
+    считает одна задача, остальные корутины воркера ждут её результата.
+    Задача не привязана к запросу, который её запустил: если клиент
+    отключился, остальные всё равно получат результат.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[V]]) -> V:
+        return await asyncio.shield(self.start(key, fn))
+
+    def start(self, key: str, fn: Callable[[], Awaitable[V]]) -> asyncio.Task:
+        # запускает вычисление, если по ключу оно ещё не идёт; ссылку на
+        # задачу держит словарь, так что результат можно и не ждать
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # ошибку уже получили ожидающие; если их не осталось,
+        # asyncio не должен ругаться на непрочитанное исключение
+        if not task.cancelled():
+            task.exception()
+
+
+class EarlyRefresh:
+    """
+    Вероятностное обновление до истечения TTL (XFetch): чем ближе конец
+    TTL и чем дольше считается значение, тем выше шанс, что очередной
+    запрос пересчитает его заранее, пока остальные читают старое.
+    Время пересчёта — скользящее среднее по группе ключей в этом воркере.
+    """
+
+    def __init__(self, beta: float, default_delta: float = 0.05) -> None:
+        self.beta = beta
+        self.default_delta = default_delta
+        self._deltas: dict[str, float] = {}
+
+    def record(self, group: str, seconds: float) -> None:
+        delta = self._deltas.get(group)
+        self._deltas[group] = seconds if delta is None else delta * 0.8 + seconds * 0.2
+
+    def should_refresh(self, group: str, ttl_seconds: float) -> bool:
+        if self.beta <= 0 or ttl_seconds <= 0:
+            return False
+        delta = self._deltas.get(group, self.default_delta)
+        # 1 - random() лежит в (0, 1], логарифм определён
+        return -delta * self.beta * math.log(1.0 - random.random()) >= ttl_seconds
@@ -1,3 +1,4 @@
+from db.local_cache import LocalCache
 from models.film import Film
 from redis.asyncio import Redis
 
@@ -5,9 +6,10 @@ from repositories.cache.base import BaseCacheRepository
 
 
 class FilmCacheRepository(BaseCacheRepository[Film]):
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: Redis, local_cache: LocalCache | None = None):
         super().__init__(
             redis,
             model=Film,
             key_prefix="film",
+            local_cache=local_cache,
         )
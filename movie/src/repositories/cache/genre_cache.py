@@ -1,3 +1,4 @@
+from db.local_cache import LocalCache
 from models.film import Genre
 from redis.asyncio import Redis
 
@@ -5,9 +6,10 @@ from repositories.cache.base import BaseCacheRepository
 
 
 class GenreCacheRepository(BaseCacheRepository[Genre]):
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: Redis, local_cache: LocalCache | None = None):
         super().__init__(
             redis,
             model=Genre,
             key_prefix="genre",
+            local_cache=local_cache,
         )
@@ -0,0 +1,86 @@
+import struct
+import time
+from collections.abc import Awaitable, Callable
+
+import zstandard
+from core import config
+from db.local_cache import LocalCache
+from redis.asyncio import Redis
+
+from repositories.cache.base import CACHE_TTL, BaseCacheRepository
+
+# начало кадра zstd: по нему сжатое тело отличается от JSON
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# заголовок с мягким сроком: маркер и время истечения (double, big-endian);
+# тело JSON или кадр zstd с нулевого байта не начинаются
+SOFT_EXPIRY_MARKER = b"\x00"
+SOFT_EXPIRY_HEADER = struct.Struct(">d")
+
+
+class ResponseCacheRepository(BaseCacheRepository[bytes]):
+    """
+    Кэш готовых тел ответов по нормализованным параметрам запроса.
+    Попадание уходит клиенту как есть: без разбора JSON, валидации
+    pydantic и повторной сериализации. В Redis тело можно сжимать zstd.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_cache: LocalCache | None = None,
+        enabled: bool = config.RESPONSE_CACHE_ENABLED,
+        zstd_level: int = config.RESPONSE_CACHE_ZSTD_LEVEL,
+        list_stale_ttl: int = config.LIST_CACHE_STALE_TTL,
+    ):
+        super().__init__(
+            redis,
+            model=bytes,
+            key_prefix="response",
+            local_cache=local_cache,
+            list_stale_ttl=list_stale_ttl,
+        )
+        self.enabled = enabled
+        self.zstd_level = zstd_level
+
+    async def get_or_render(
+        self,
+        key: str,
+        render: Callable[[], Awaitable[bytes | None]],
+        ttl: int = CACHE_TTL,
+    ) -> bytes | None:
+        if not self.enabled:
+            return await render()
+
+        key = f"{self.key_prefix}:{key}"
+
+        async def store(body: bytes) -> None:
+            # ttl — мягкий срок, как у списков: после него тело ещё
+            # list_stale_ttl секунд отдаётся, пока фоновая задача его обновляет;
+            # в кэш процесса кладётся несжатое тело
+            header = SOFT_EXPIRY_HEADER.pack(time.time() + ttl)
+            payload = SOFT_EXPIRY_MARKER + header + self._compress(body)
+            await self._set(key, payload, ttl + self.list_stale_ttl, body, ttl)
+
+        # "response:films:search:query=..." -> "response:films:search"
+        group = ":".join(key.split(":", 3)[:3])
+        return await self._get_or_load(
+            key=key,
+            group=group,
+            decode=self._decode_body,
+            load=render,
+            store=store,
+        )
+
+    def _compress(self, body: bytes) -> bytes:
+        if self.zstd_level <= 0:
+            return body
+        return zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+
+    def _decode_body(self, data: bytes) -> tuple[bytes, float | None]:
+        soft_expires_at = None
+        if data.startswith(SOFT_EXPIRY_MARKER):
+            (soft_expires_at,) = SOFT_EXPIRY_HEADER.unpack_from(data, 1)
+            data = data[1 + SOFT_EXPIRY_HEADER.size :]
+        if data.startswith(ZSTD_MAGIC):
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return data, soft_expires_at
@@ -1,9 +1,19 @@
 from typing import Generic, Type, TypeVar
 
+from core import config
 from elasticsearch import AsyncElasticsearch, NotFoundError
 
+from repositories.elastic.cursor import decode_cursor, encode_cursor
+
 T = TypeVar("T")
 
+# последний ключ сортировки: значения sort последнего документа
+# однозначно задают начало следующей страницы
+TIEBREAKER = {"id": {"order": "asc"}}
+# с PIT ES сам добавляет к сортировке _shard_doc, и у документа становится
+# на одно значение sort больше; задаём его явно, чтобы длина была известна
+PIT_TIEBREAKER = {"_shard_doc": {"order": "asc"}}
+
 
 class BaseElasticRepository(Generic[T]):
     def __init__(
@@ -11,10 +21,12 @@ class BaseElasticRepository(Generic[T]):
         elastic: AsyncElasticsearch,
         index: str,
         model: Type[T],
+        pit_keep_alive: str = config.ES_CURSOR_PIT_KEEP_ALIVE,
     ) -> None:
         self.elastic = elastic
         self.index = index
         self.model = model
+        self.pit_keep_alive = pit_keep_alive
 
     async def get_by_id(self, entity_id: str) -> T | None:
         try:
@@ -23,6 +35,22 @@ class BaseElasticRepository(Generic[T]):
             return None
         return self.model(**doc["_source"])
 
+    async def get_by_ids(self, entity_ids: list[str]) -> list[T]:
+        if not entity_ids:
+            return []
+
+        try:
+            response = await self.elastic.mget(index=self.index, ids=entity_ids)
+        except NotFoundError:
+            return []
+
+        # порядок ответа совпадает с порядком entity_ids
+        return [
+            self.model(**doc["_source"])
+            for doc in response.get("docs", [])
+            if doc.get("found")
+        ]
+
     async def get_list(
         self,
         query: dict,
@@ -49,6 +77,76 @@ class BaseElasticRepository(Generic[T]):
 
         return self._parse_response(response)
 
+    async def get_page_after(
+        self,
+        query: dict,
+        size: int,
+        sort: list | None,
+        cursor: str,
+    ) -> tuple[int, list[T], str | None]:
+        # search_after вместо from/size: ES не собирает page * size
+        # документов на шард, время ответа не зависит от глубины страницы;
+        # пустой курсор — первая страница
+        sort = [*(sort or []), TIEBREAKER]
+        search_after, pit_id = decode_cursor(cursor, sort) if cursor else (None, None)
+
+        try:
+            # снимок открывает первая страница; цепочка, которая уже
+            # перешла на текущий индекс, продолжается без PIT
+            if self.pit_keep_alive and search_after is None:
+                pit = await self.elastic.open_point_in_time(
+                    index=self.index,
+                    keep_alive=self.pit_keep_alive,
+                )
+                pit_id = pit["id"]
+            response = await self._search_after(query, size, sort, search_after, pit_id)
+        except NotFoundError:
+            if pit_id is None:
+                return 0, [], None
+            # снимок истёк между страницами: дочитываем по текущему индексу,
+            # _shard_doc без PIT не существует
+            pit_id = None
+            if search_after is not None:
+                search_after = search_after[: len(sort)]
+            try:
+                response = await self._search_after(
+                    query, size, sort, search_after, pit_id
+                )
+            except NotFoundError:
+                return 0, [], None
+
+        total, items = self._parse_response(response)
+        hits = response["hits"]["hits"]
+        next_cursor = None
+        if len(hits) == size:
+            next_cursor = encode_cursor(
+                hits[-1]["sort"], sort, response.get("pit_id", pit_id)
+            )
+        return total, items, next_cursor
+
+    async def _search_after(
+        self,
+        query: dict,
+        size: int,
+        sort: list,
+        search_after: list | None,
+        pit_id: str | None,
+    ) -> dict:
+        params = {
+            "query": query,
+            "size": size,
+            "sort": sort,
+        }
+        if search_after is not None:
+            params["search_after"] = search_after
+        if pit_id is not None:
+            # с PIT индекс не указывается: он зашит в снимок
+            params["pit"] = {"id": pit_id, "keep_alive": self.pit_keep_alive}
+            params["sort"] = [*sort, PIT_TIEBREAKER]
+        else:
+            params["index"] = self.index
+        return await self.elastic.search(**params)
+
     def _parse_response(self, response) -> tuple[int, list[T]]:
         hits = response.get("hits", {})
         total = hits.get("total", {}).get("value", 0)
@@ -0,0 +1,42 @@
+import base64
+import json
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def sort_signature(sort: list[dict]) -> str:
+    # курсор действителен только для той сортировки, которой он выдан
+    return ",".join(
+        f"{field}:{spec['order']}" for clause in sort for field, spec in clause.items()
+    )
+
+
+def encode_cursor(search_after: list, sort: list[dict], pit_id: str | None) -> str:
+    payload = {"a": search_after, "s": sort_signature(sort)}
+    if pit_id:
+        payload["p"] = pit_id
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: list[dict]) -> tuple[list, str | None]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        search_after = payload["a"]
+        signature = payload["s"]
+        pit_id = payload.get("p")
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+
+    # с PIT в конце значений идёт ещё _shard_doc
+    expected_length = len(sort) + 1 if pit_id else len(sort)
+    if (
+        signature != sort_signature(sort)
+        or not isinstance(search_after, list)
+        or len(search_after) != expected_length
+    ):
+        raise InvalidCursorError("Cursor does not match sort order")
+    return search_after, pit_id
@@ -1,3 +1,4 @@
+from core import config
 from elasticsearch import AsyncElasticsearch
 from models.film import Film
 
@@ -7,15 +8,22 @@ from repositories.elastic.sort_builder import SortBuilder
 
 SORT_FIELDS = {
     "imdb_rating": "imdb_rating",
+    "user_rating": "user_rating",
     "title": "title.raw",
 }
 
+# user_rating появился в MOVIES_INDEX v2: пока алиас смотрит на индекс v1,
+# сортировка по нему идёт как по пустому полю
+UNMAPPED_TYPES = {
+    "user_rating": "float",
+}
+
 
 class FilmElasticRepository(BaseElasticRepository[Film]):
     def __init__(self, elastic: AsyncElasticsearch) -> None:
         super().__init__(
             elastic=elastic,
-            index="movies",
+            index=config.MOVIES_ES_INDEX,
             model=Film,
         )
 
@@ -26,36 +34,25 @@ class FilmElasticRepository(BaseElasticRepository[Film]):
         page: int,
         size: int,
     ) -> tuple[int, list[Film]]:
-        query_builder = QueryBuilder()
-
-        if genre:
-            query_builder.filter_nested(
-                path="genres",
-                field="genres.id",
-                value=genre,
-            )
-
-        query = query_builder.build()
-
-        field, order = self._parse_sort(sort)
-
-        sort_clause = None
-
-        if field and order:
-            sort_builder = SortBuilder(set(SORT_FIELDS.values()))
-            mapped_field = SORT_FIELDS.get(field)
-            if mapped_field:
-                sort_builder.add(
-                    field=mapped_field,
-                    order=order,
-                )
-                sort_clause = sort_builder.build()
-
         return await super().get_list(
-            query=query,
+            query=self._build_list_query(genre),
             page=page,
             size=size,
-            sort=sort_clause,
+            sort=self._build_sort(sort),
+        )
+
+    async def get_films_page_after(
+        self,
+        sort: str | None,
+        genre: str | None,
+        cursor: str,
+        size: int,
+    ) -> tuple[int, list[Film], str | None]:
+        return await super().get_page_after(
+            query=self._build_list_query(genre),
+            size=size,
+            sort=self._build_sort(sort),
+            cursor=cursor,
         )
 
     async def search(
@@ -84,49 +81,36 @@ class FilmElasticRepository(BaseElasticRepository[Film]):
             sort=None,
         )
 
-    async def get_by_person_id(
+    async def get_new_films(
         self,
-        person_id: str,
+        sort: str | None,
+        genre: str | None,
         page: int,
         size: int,
     ) -> tuple[int, list[Film]]:
         query_builder = QueryBuilder()
 
-        query_builder.should_nested(
-            path="actors",
-            field="actors.id",
-            value=person_id,
-        )
-        query_builder.should_nested(
-            path="directors",
-            field="directors.id",
-            value=person_id,
-        )
-        query_builder.should_nested(
-            path="writers",
-            field="writers.id",
-            value=person_id,
-        )
+        query_builder.filter_range("creation_date", gte="now-3y")
+
+        if genre:
+            query_builder.filter_nested(
+                path="genres",
+                field="genres.id",
+                value=genre,
+            )
+
         query = query_builder.build()
 
         return await super().get_list(
             query=query,
             page=page,
             size=size,
-            sort=None,
+            sort=self._build_sort(sort),
         )
 
-    async def get_new_films(
-        self,
-        sort: str | None,
-        genre: str | None,
-        page: int,
-        size: int,
-    ) -> tuple[int, list[Film]]:
+    def _build_list_query(self, genre: str | None) -> dict:
         query_builder = QueryBuilder()
 
-        query_builder.filter_range("creation_date", gte="now-3y")
-
         if genre:
             query_builder.filter_nested(
                 path="genres",
@@ -134,25 +118,21 @@ class FilmElasticRepository(BaseElasticRepository[Film]):
                 value=genre,
             )
 
-        query = query_builder.build()
+        return query_builder.build()
 
+    def _build_sort(self, sort: str | None) -> list[dict] | None:
         field, order = self._parse_sort(sort)
-
-        sort_clause = None
-
-        if field and order:
-            sort_builder = SortBuilder(set(SORT_FIELDS.values()))
-            mapped_field = SORT_FIELDS.get(field)
-            if mapped_field:
-                sort_builder.add(
-                    field=mapped_field,
-                    order=order,
-                )
-                sort_clause = sort_builder.build()
-
-        return await super().get_list(
-            query=query,
-            page=page,
-            size=size,
-            sort=sort_clause,
+        if not field or not order:
+            return None
+
+        mapped_field = SORT_FIELDS.get(field)
+        if not mapped_field:
+            return None
+
+        sort_builder = SortBuilder(set(SORT_FIELDS.values()))
+        sort_builder.add(
+            field=mapped_field,
+            order=order,
+            unmapped_type=UNMAPPED_TYPES.get(mapped_field),
         )
+        return sort_builder.build()
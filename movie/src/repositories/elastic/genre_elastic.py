@@ -1,3 +1,4 @@
+from core import config
 from elasticsearch import AsyncElasticsearch
 from models.film import Genre
 
@@ -14,7 +15,7 @@ class GenreElasticRepository(BaseElasticRepository[Genre]):
     def __init__(self, elastic: AsyncElasticsearch) -> None:
         super().__init__(
             elastic=elastic,
-            index="genres",
+            index=config.GENRES_ES_INDEX,
             model=Genre,
         )
 
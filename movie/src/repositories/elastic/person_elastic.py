@@ -1,3 +1,4 @@
+from core import config
 from elasticsearch import AsyncElasticsearch
 from models.film import Person
 
@@ -14,7 +15,7 @@ class PersonElasticRepository(BaseElasticRepository[Person]):
     def __init__(self, elastic: AsyncElasticsearch) -> None:
         super().__init__(
             elastic=elastic,
-            index="persons",
+            index=config.PERSONS_ES_INDEX,
             model=Person,
         )
 
@@ -24,27 +25,24 @@ class PersonElasticRepository(BaseElasticRepository[Person]):
         page: int,
         size: int,
     ) -> tuple[int, list[Person]]:
-        query = QueryBuilder().build()
-
-        field, order = self._parse_sort(sort)
-
-        sort_clause = None
-
-        if field and order:
-            sort_builder = SortBuilder(set(SORT_FIELDS.values()))
-            mapped_field = SORT_FIELDS.get(field)
-            if mapped_field:
-                sort_builder.add(
-                    field=mapped_field,
-                    order=order,
-                )
-                sort_clause = sort_builder.build()
-
         return await super().get_list(
-            query=query,
+            query=QueryBuilder().build(),
             page=page,
             size=size,
-            sort=sort_clause,
+            sort=self._build_sort(sort),
+        )
+
+    async def get_persons_page_after(
+        self,
+        sort: str | None,
+        cursor: str,
+        size: int,
+    ) -> tuple[int, list[Person], str | None]:
+        return await super().get_page_after(
+            query=QueryBuilder().build(),
+            size=size,
+            sort=self._build_sort(sort),
+            cursor=cursor,
         )
 
     async def search(
@@ -67,3 +65,19 @@ class PersonElasticRepository(BaseElasticRepository[Person]):
             size=size,
             sort=None,
         )
+
+    def _build_sort(self, sort: str | None) -> list[dict] | None:
+        field, order = self._parse_sort(sort)
+        if not field or not order:
+            return None
+
+        mapped_field = SORT_FIELDS.get(field)
+        if not mapped_field:
+            return None
+
+        sort_builder = SortBuilder(set(SORT_FIELDS.values()))
+        sort_builder.add(
+            field=mapped_field,
+            order=order,
+        )
+        return sort_builder.build()
@@ -8,6 +8,7 @@ class SortBuilder:
         field: str,
         order: str = "asc",
         missing: str = "_last",
+        unmapped_type: str | None = None,
     ) -> "SortBuilder":
         if field not in self._allowed_fields:
             raise ValueError(f"Field {field} not in allowed fields")
@@ -15,14 +16,14 @@ class SortBuilder:
         if order not in {"asc", "desc"}:
             raise ValueError(f"Order {order} not in allowed orders")
 
-        self._sort.append(
-            {
-                field: {
-                    "order": order,
-                    "missing": missing,
-                },
-            },
-        )
+        options = {
+            "order": order,
+            "missing": missing,
+        }
+        if unmapped_type is not None:
+            # поле есть не во всех версиях маппинга: без типа ES отвечает 400
+            options["unmapped_type"] = unmapped_type
+        self._sort.append({field: options})
         return self
 
     def build(self) -> list[dict] | None:
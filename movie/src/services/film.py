@@ -1,7 +1,7 @@
+from collections.abc import Awaitable
 from uuid import UUID
 
 from attrs import frozen
-from elasticsearch import NotFoundError
 from models.film import Film
 from repositories.cache.film_cache import FilmCacheRepository
 from repositories.elastic.film_elastic import FilmElasticRepository
@@ -12,21 +12,17 @@ class FilmService:
     elastic_repo: FilmElasticRepository
     cache_repo: FilmCacheRepository
 
-    async def get_by_id(self, film_id: UUID) -> Film | None:
-        # Пытаемся получить данные из кеша
+    async def get_by_id(self, film_id: UUID, cached: bool = True) -> Film | None:
+        # Пытаемся получить данные из кеша, при промахе ищем в Elasticsearch;
+        # если фильма нет и там, значит, его вообще нет в базе.
+        # cached=False — ответ уже кэширует вызывающий код целиком
         film_id_str = str(film_id)
-        film = await self.cache_repo.get(entity_id=film_id_str)
-        if not film:
-            # Если фильма нет в кеше, то ищем его в Elasticsearch
-            film = await self.elastic_repo.get_by_id(entity_id=film_id_str)
-            if not film:
-                # Если он отсутствует в Elasticsearch,
-                # значит, фильма вообще нет в базе
-                return None
-            # Сохраняем фильм в кеш
-            await self.cache_repo.put(data=film)
-
-        return film
+        if not cached:
+            return await self.elastic_repo.get_by_id(entity_id=film_id_str)
+        return await self.cache_repo.get_or_load(
+            entity_id=film_id_str,
+            load=lambda: self.elastic_repo.get_by_id(entity_id=film_id_str),
+        )
 
     async def get_list(
         self,
@@ -34,68 +30,72 @@ class FilmService:
         genre: UUID | None,
         page: int,
         size: int,
+        cached: bool = True,
     ) -> tuple[int, list[Film]]:
+        # cached=False — ответ уже кэширует вызывающий код целиком
+        def load() -> Awaitable[tuple[int, list[Film]]]:
+            return self.elastic_repo.get_films_list(
+                sort=sort,
+                genre=str(genre) if genre else None,
+                page=page,
+                size=size,
+            )
+
+        if not cached:
+            return await load()
+
         cache_key = self._build_list_cache_key(
             sort=sort or "",
             genre=str(genre) if genre else "",
             page=page,
             size=size,
         )
-        cached = await self.cache_repo.get_list(cache_key)
-        if cached is not None:
-            return cached
+        return await self.cache_repo.get_list_or_load(cache_key, load=load)
 
-        result = await self.elastic_repo.get_films_list(
+    async def get_list_after(
+        self,
+        sort: str | None,
+        genre: UUID | None,
+        cursor: str,
+        size: int,
+    ) -> tuple[int, list[Film], str | None]:
+        # страницы курсора не кэшируются: цепочка принадлежит одному
+        # клиенту, повторных чтений того же курсора почти не бывает
+        return await self.elastic_repo.get_films_page_after(
             sort=sort,
             genre=str(genre) if genre else None,
-            page=page,
+            cursor=cursor,
             size=size,
         )
 
-        await self.cache_repo.put_list(cache_key, result)
-
-        return result
-
     async def search(
         self,
         query: str,
         page: int,
         size: int,
+        cached: bool = True,
     ) -> tuple[int, list[Film]]:
+        def load() -> Awaitable[tuple[int, list[Film]]]:
+            return self.elastic_repo.search(text=query, page=page, size=size)
+
+        if not cached:
+            return await load()
+
         cache_key = self._build_search_cache_key(
             query=query,
             page=page,
             size=size,
         )
-
-        cached = await self.cache_repo.get_list(cache_key)
-
-        if cached is not None:
-            return cached
-
-        try:
-            result = await self.elastic_repo.search(
-                text=query,
-                page=page,
-                size=size,
-            )
-        except NotFoundError:
-            cached = await self.cache_repo.get_list(cache_key)
-            if cached is not None:
-                return cached
-            raise
-
-        await self.cache_repo.put_list(
+        return await self.cache_repo.get_list_or_load(
             key=cache_key,
-            value=result,
+            load=load,
             ttl=60,
         )
 
-        return result
-
     async def get_by_person(
         self,
         person_id: UUID,
+        film_ids: list[str],
         page: int,
         size: int,
     ) -> tuple[int, list[Film]]:
@@ -107,26 +107,17 @@ class FilmService:
             size=size,
         )
 
-        cached = await self.cache_repo.get_list(cache_key)
-
-        if cached is not None:
-            return cached
-
-        try:
-            result = await self.elastic_repo.get_by_person_id(
-                person_id=person_id_str,
-                page=page,
-                size=size,
-            )
-        except NotFoundError:
-            cached = await self.cache_repo.get_list(cache_key)
-            if cached is not None:
-                return cached
-            raise
+        async def load() -> tuple[int, list[Film]]:
+            # id фильмов персоны уже лежат в её документе: страница
+            # собирается одним mget вместо nested-поиска по movies
+            page_ids = film_ids[(page - 1) * size : page * size]
+            films = await self.elastic_repo.get_by_ids(entity_ids=page_ids)
 
-        await self.cache_repo.put_list(cache_key, result)
+            # фильмов страницы нет в индексе — индекс пуст или ещё не загружен
+            total = len(film_ids) if films or not page_ids else 0
+            return total, films
 
-        return result
+        return await self.cache_repo.get_list_or_load(cache_key, load=load)
 
     async def get_new(
         self,
@@ -141,21 +132,16 @@ class FilmService:
             page=page,
             size=size,
         )
-        cached = await self.cache_repo.get_list(cache_key)
-        if cached is not None:
-            return cached
-
-        result = await self.elastic_repo.get_new_films(
-            sort=sort,
-            genre=str(genre) if genre else None,
-            page=page,
-            size=size,
+        return await self.cache_repo.get_list_or_load(
+            cache_key,
+            load=lambda: self.elastic_repo.get_new_films(
+                sort=sort,
+                genre=str(genre) if genre else None,
+                page=page,
+                size=size,
+            ),
         )
 
-        await self.cache_repo.put_list(cache_key, result)
-
-        return result
-
     def _build_list_cache_key(
         self,
         sort: str,
@@ -1,5 +1,4 @@
 from attrs import frozen
-from elasticsearch import NotFoundError
 from models.film import Genre
 from repositories.cache.genre_cache import GenreCacheRepository
 from repositories.elastic.genre_elastic import GenreElasticRepository
@@ -14,15 +13,10 @@ class GenreService:
         self,
         genre_id: str,
     ) -> Genre | None:
-        genre = await self.cache_repo.get(entity_id=genre_id)
-        if not genre:
-            genre = await self.elastic_repo.get_by_id(entity_id=genre_id)
-            if not genre:
-                return None
-
-            await self.cache_repo.put(data=genre)
-
-        return genre
+        return await self.cache_repo.get_or_load(
+            entity_id=genre_id,
+            load=lambda: self.elastic_repo.get_by_id(entity_id=genre_id),
+        )
 
     async def get_list(
         self,
@@ -37,26 +31,15 @@ class GenreService:
             page=page,
             size=size,
         )
-        cached = await self.cache_repo.get_list(cache_key)
-        if cached:
-            return cached
-
-        try:
-            result = await self.elastic_repo.get_genres_list(
+        return await self.cache_repo.get_list_or_load(
+            cache_key,
+            load=lambda: self.elastic_repo.get_genres_list(
                 sort=sort,
                 search=search,
                 page=page,
                 size=size,
-            )
-        except NotFoundError:
-            cached = await self.cache_repo.get_list(cache_key)
-            if cached:
-                return cached
-            raise
-
-        await self.cache_repo.put_list(cache_key, result)
-
-        return result
+            ),
+        )
 
     def _build_cache_key(
         self,
@@ -1,7 +1,6 @@
 from uuid import UUID
 
 from attrs import frozen
-from elasticsearch import NotFoundError
 from models.film import Film, Person
 from repositories.cache.person_cache import PersonCacheRepository
 from repositories.elastic.person_elastic import PersonElasticRepository
@@ -21,14 +20,10 @@ class PersonService:
 
     async def get_by_id(self, person_id: UUID) -> Person | None:
         person_id_str = str(person_id)
-        person = await self.cache_repo.get(entity_id=person_id_str)
-        if not person:
-            person = await self.elastic_repo.get_by_id(entity_id=person_id_str)
-            if not person:
-                return None
-            await self.cache_repo.put(data=person)
-
-        return person
+        return await self.cache_repo.get_or_load(
+            entity_id=person_id_str,
+            load=lambda: self.elastic_repo.get_by_id(entity_id=person_id_str),
+        )
 
     async def get_list(
         self,
@@ -41,25 +36,26 @@ class PersonService:
             page=page,
             size=size,
         )
-        cached = await self.cache_repo.get_list(cache_key)
-        if cached:
-            return cached
-
-        try:
-            result = await self.elastic_repo.get_persons_list(
+        return await self.cache_repo.get_list_or_load(
+            cache_key,
+            load=lambda: self.elastic_repo.get_persons_list(
                 sort=sort,
                 page=page,
                 size=size,
-            )
-        except NotFoundError:
-            cached = await self.cache_repo.get_list(cache_key)
-            if cached is not None:
-                return cached
-            raise
-
-        await self.cache_repo.put_list(cache_key, result)
+            ),
+        )
 
-        return result
+    async def get_list_after(
+        self,
+        sort: str | None,
+        cursor: str,
+        size: int,
+    ) -> tuple[int, list[Person], str | None]:
+        return await self.elastic_repo.get_persons_page_after(
+            sort=sort,
+            cursor=cursor,
+            size=size,
+        )
 
     async def get_films(
         self,
@@ -67,8 +63,13 @@ class PersonService:
         page: int,
         size: int,
     ) -> tuple[int, list[Film]]:
+        person = await self.get_by_id(person_id=person_id)
+        if not person:
+            return 0, []
+
         return await self.film_service.get_by_person(
             person_id=person_id,
+            film_ids=[film.id for film in person.films],
             page=page,
             size=size,
         )
@@ -84,26 +85,14 @@ class PersonService:
             page=page_number,
             size=page_size,
         )
-
-        cached = await self.cache_repo.get_list(cache_key)
-        if cached is not None:
-            return cached
-
-        try:
-            result = await self.elastic_repo.search(
+        return await self.cache_repo.get_list_or_load(
+            key=cache_key,
+            load=lambda: self.elastic_repo.search(
                 text=query,
                 page=page_number,
                 size=page_size,
-            )
-        except NotFoundError:
-            cached = await self.cache_repo.get_list(cache_key)
-            if cached is not None:
-                return cached
-            raise
-
-        await self.cache_repo.put_list(key=cache_key, value=result)
-
-        return result
+            ),
+        )
 
     def _build_cache_list_key(
         self,
@@ -0,0 +1,89 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# сервис запускается из movie/src и импортирует модули оттуда
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return command
+
+    async def execute(self):
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class FakeRedis:
+    """Словарь со сроками жизни вместо Redis: команды, которые нужны кэшу."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[bytes, float | None]] = {}
+        self.published: list[tuple[str, str]] = []
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    async def pttl(self, key):
+        if await self.get(key) is None:
+            return -2
+        expires_at = self.data[key][1]
+        if expires_at is None:
+            return -1
+        return int((expires_at - time.time()) * 1000)
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and await self.get(key) is not None:
+            return None
+        if isinstance(value, str):
+            value = value.encode()
+        ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+        self.data[key] = (value, None if ttl is None else time.time() + ttl)
+        return True
+
+    async def exists(self, key):
+        return int(await self.get(key) is not None)
+
+    async def eval(self, script, numkeys, key, token):
+        # единственный скрипт кэша снимает блокировку владельца
+        if await self.get(key) == token.encode():
+            del self.data[key]
+            return 1
+        return 0
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+from db.local_cache import LocalCache
+from models.film import Genre
+from pydantic import ValidationError
+from repositories.cache import base
+from repositories.cache.base import BaseCacheRepository
+from repositories.cache.coalescing import EarlyRefresh
+
+GENRE = Genre(id="1", name="Drama")
+
+
+class CountingLoader:
+    """Загрузка из Elasticsearch: считает вызовы, может упасть."""
+
+    def __init__(self, value=GENRE, delay: float = 0.01) -> None:
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self.error: Exception | None = None
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+@pytest.fixture(autouse=True)
+def no_early_refresh(monkeypatch):
+    monkeypatch.setattr(base, "early_refresh", EarlyRefresh(beta=0))
+
+
+def make_repository(redis, **kwargs) -> BaseCacheRepository[Genre]:
+    return BaseCacheRepository(redis, model=Genre, key_prefix="genre", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once(redis):
+    repository = make_repository(redis)
+    load = CountingLoader()
+
+    results = await asyncio.gather(
+        *(repository.get_or_load("1", load) for _ in range(10)),
+    )
+
+    assert results == [GENRE] * 10
+    assert load.calls == 1
+    assert await repository.get("1") == GENRE
+
+
+@pytest.mark.asyncio
+async def test_hit_does_not_load(redis):
+    repository = make_repository(redis)
+    await repository.put(GENRE)
+    load = CountingLoader()
+
+    assert await repository.get_or_load("1", load) == GENRE
+    assert load.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_miss_error_reaches_the_caller(redis):
+    repository = make_repository(redis)
+    load = CountingLoader()
+    load.error = ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        await repository.get_or_load("1", load)
+
+
+@pytest.mark.asyncio
+async def test_refresh_error_serves_stale_value(redis, monkeypatch):
+    monkeypatch.setattr(base, "early_refresh", EarlyRefresh(beta=1e9))
+    repository = make_repository(redis)
+    await repository.put(GENRE)
+    load = CountingLoader(value=Genre(id="1", name="Comedy"))
+    load.error = ConnectionError()
+
+    assert await repository.get_or_load("1", load) == GENRE
+    assert load.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_without_lock_waits_for_the_holder(redis):
+    repository = make_repository(redis, lock_ttl_ms=1000)
+    await redis.set("lock:genre:1", "other-worker", px=1000)
+    load = CountingLoader()
+
+    waiter = asyncio.ensure_future(repository.get_or_load("1", load))
+    await asyncio.sleep(0.1)
+    await redis.set("genre:1", GENRE.model_dump_json(), ex=60)
+
+    assert await waiter == GENRE
+    assert load.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_lock_is_released_after_load(redis):
+    repository = make_repository(redis, lock_ttl_ms=1000)
+
+    await repository.get_or_load("1", CountingLoader())
+
+    assert not await redis.exists("lock:genre:1")
+
+
+@pytest.mark.asyncio
+async def test_soft_expired_list_is_served_while_one_refresh_runs(redis):
+    repository = make_repository(redis, list_stale_ttl=60)
+    key = "genre:list:page=1"
+    # мягкий срок уже прошёл, запись ещё в Redis
+    await repository.put_list(key, (1, [GENRE]), ttl=-1)
+    fresh = Genre(id="1", name="Comedy")
+    load = CountingLoader(value=(1, [fresh]), delay=0.05)
+
+    results = await asyncio.gather(
+        *(repository.get_list_or_load(key, load) for _ in range(5)),
+    )
+
+    assert results == [(1, [GENRE])] * 5
+    await asyncio.sleep(0.1)
+    assert load.calls == 1
+    assert await repository.get_list(key) == (1, [fresh])
+
+
+@pytest.mark.asyncio
+async def test_failed_background_refresh_keeps_stale_list(redis):
+    repository = make_repository(redis, list_stale_ttl=60)
+    key = "genre:list:page=1"
+    await repository.put_list(key, (1, [GENRE]), ttl=-1)
+    load = CountingLoader()
+    load.error = ConnectionError()
+
+    assert await repository.get_list_or_load(key, load) == (1, [GENRE])
+    await asyncio.sleep(0.05)
+    assert load.calls == 1
+    assert await repository.get_list(key) == (1, [GENRE])
+
+
+@pytest.mark.asyncio
+async def test_soft_expired_local_copy_is_refreshed(redis):
+    local_cache = LocalCache(max_size=10, ttls={}, default_ttl=30)
+    repository = make_repository(redis, local_cache=local_cache, list_stale_ttl=60)
+    key = "genre:list:page=1"
+    await repository.put_list(key, (1, [GENRE]), ttl=-1)
+    fresh = Genre(id="1", name="Comedy")
+    load = CountingLoader(value=(1, [fresh]))
+
+    # попадание в кэш процесса, мягкий срок которого уже прошёл
+    assert await repository.get_list_or_load(key, load) == (1, [GENRE])
+    await asyncio.sleep(0.05)
+    assert load.calls == 1
+    assert local_cache.get(key) == (1, [fresh])
+
+
+def test_cached_models_are_frozen():
+    with pytest.raises(ValidationError):
+        GENRE.name = "Comedy"
@@ -0,0 +1,117 @@
+import pytest
+from elasticsearch import NotFoundError
+from repositories.elastic.base import BaseElasticRepository
+from repositories.elastic.cursor import InvalidCursorError
+
+SORT = [{"imdb_rating": {"order": "asc"}}]
+
+
+class FakeElastic:
+    """Поиск с search_after по списку документов; PIT можно «истечь»."""
+
+    def __init__(self, docs: list[dict]) -> None:
+        self.docs = docs
+        self.expired_pits: set[str] = set()
+        self.opened_pits = 0
+        self.requests: list[dict] = []
+
+    async def open_point_in_time(self, index, keep_alive):
+        self.opened_pits += 1
+        return {"id": f"pit-{self.opened_pits}"}
+
+    async def search(self, **params):
+        self.requests.append(params)
+        pit = params.get("pit")
+        if pit is not None and pit["id"] in self.expired_pits:
+            raise NotFoundError("search_context_missing_exception", None, {})
+
+        fields = [next(iter(clause)) for clause in params["sort"]]
+        if pit is None:
+            assert "_shard_doc" not in fields, "_shard_doc needs a PIT"
+        elif "_shard_doc" not in fields:
+            # с PIT ES добавляет _shard_doc к сортировке сам
+            fields.append("_shard_doc")
+
+        def sort_values(position: int, doc: dict) -> list:
+            return [
+                position if field == "_shard_doc" else doc[field] for field in fields
+            ]
+
+        rows = sorted(
+            (sort_values(position, doc), doc) for position, doc in enumerate(self.docs)
+        )
+        search_after = params.get("search_after")
+        if search_after is not None:
+            assert len(search_after) == len(fields)
+            rows = [row for row in rows if row[0] > search_after]
+
+        hits = [
+            {"_source": doc, "sort": values} for values, doc in rows[: params["size"]]
+        ]
+        response = {"hits": {"total": {"value": len(self.docs)}, "hits": hits}}
+        if pit is not None:
+            response["pit_id"] = pit["id"]
+        return response
+
+
+def make_docs(count: int) -> list[dict]:
+    return [{"id": f"{i:04d}", "imdb_rating": float(i % 7)} for i in range(count)]
+
+
+def make_repository(elastic: FakeElastic, pit_keep_alive: str = "1m"):
+    return BaseElasticRepository(
+        elastic, index="movies", model=dict, pit_keep_alive=pit_keep_alive
+    )
+
+
+async def read_all(repository, size: int) -> tuple[list[dict], int]:
+    items, cursor, pages = [], "", 0
+    while True:
+        _, page, cursor = await repository.get_page_after({}, size, SORT, cursor)
+        items.extend(page)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pit_keep_alive", ["1m", ""])
+async def test_pages_cover_all_documents_in_order(pit_keep_alive):
+    docs = make_docs(25)
+    elastic = FakeElastic(docs)
+
+    items, pages = await read_all(make_repository(elastic, pit_keep_alive), 10)
+
+    assert pages == 3
+    assert items == sorted(docs, key=lambda doc: (doc["imdb_rating"], doc["id"]))
+    assert elastic.opened_pits == (1 if pit_keep_alive else 0)
+
+
+@pytest.mark.asyncio
+async def test_expired_pit_continues_on_the_live_index():
+    docs = make_docs(30)
+    elastic = FakeElastic(docs)
+    repository = make_repository(elastic)
+
+    _, first, cursor = await repository.get_page_after({}, 10, SORT, "")
+    elastic.expired_pits.add("pit-1")
+    _, second, cursor = await repository.get_page_after({}, 10, SORT, cursor)
+    _, third, _ = await repository.get_page_after({}, 10, SORT, cursor)
+
+    assert first + second + third == sorted(
+        docs, key=lambda doc: (doc["imdb_rating"], doc["id"])
+    )
+    # после истечения снимок заново не открывается
+    assert elastic.opened_pits == 1
+    assert "pit" not in elastic.requests[-1]
+
+
+@pytest.mark.asyncio
+async def test_cursor_for_another_sort_is_rejected():
+    repository = make_repository(FakeElastic(make_docs(20)))
+    _, _, cursor = await repository.get_page_after({}, 5, SORT, "")
+
+    with pytest.raises(InvalidCursorError):
+        await repository.get_page_after(
+            {}, 5, [{"imdb_rating": {"order": "desc"}}], cursor
+        )
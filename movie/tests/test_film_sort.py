@@ -0,0 +1,21 @@
+from repositories.elastic.film_elastic import FilmElasticRepository
+
+
+def test_user_rating_sort_tolerates_indices_without_the_field():
+    sort = FilmElasticRepository(elastic=None)._build_sort("-user_rating")
+
+    assert sort == [
+        {
+            "user_rating": {
+                "order": "desc",
+                "missing": "_last",
+                "unmapped_type": "float",
+            },
+        },
+    ]
+
+
+def test_mapped_fields_sort_without_unmapped_type():
+    sort = FilmElasticRepository(elastic=None)._build_sort("imdb_rating")
+
+    assert sort == [{"imdb_rating": {"order": "asc", "missing": "_last"}}]
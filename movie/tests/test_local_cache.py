@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from db.local_cache import LocalCache
+
+
+@pytest.fixture
+def cache():
+    return LocalCache(max_size=2, ttls={"film:": 30, "films:": 0}, default_ttl=10)
+
+
+def test_least_recently_read_entry_is_evicted(cache):
+    cache.set("film:1", "a")
+    cache.set("film:2", "b")
+    cache.get("film:1")
+    cache.set("film:3", "c")
+
+    assert cache.get("film:1") == "a"
+    assert cache.get("film:2") is None
+    assert cache.get("film:3") == "c"
+
+
+def test_entry_expires_after_prefix_ttl(cache, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("db.local_cache.time.monotonic", lambda: now)
+    cache.set("film:1", "a")
+
+    now += 31
+    assert cache.get("film:1") is None
+
+
+def test_prefix_with_zero_ttl_is_not_cached(cache):
+    cache.set("films:search", "a")
+
+    assert cache.get("films:search") is None
+
+
+def test_message_from_another_node_evicts_keys(cache):
+    other = LocalCache(max_size=2, ttls={}, default_ttl=10)
+    cache.set("film:1", "a")
+    cache.set("film:2", "b")
+
+    cache.handle_invalidation(other.invalidation_message(["film:1"]))
+
+    assert cache.get("film:1") is None
+    assert cache.get("film:2") == "b"
+
+
+def test_own_message_is_ignored(cache):
+    cache.set("film:1", "a")
+
+    cache.handle_invalidation(cache.invalidation_message(["film:1"]))
+
+    assert cache.get("film:1") == "a"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"not json", b"[]", json.dumps({"keys": ["film:1"]}).encode()],
+)
+def test_malformed_message_is_skipped(cache, data):
+    cache.set("film:1", "a")
+
+    cache.handle_invalidation(data)
+
+    assert cache.get("film:1") == "a"
+
+
+def test_lookup_returns_time_left_until_soft_expiry(cache, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("db.local_cache.time.time", lambda: now)
+    cache.set("film:1", "a", fresh_for=5)
+    cache.set("film:2", "b")
+
+    now += 2
+    assert cache.lookup("film:1") == ("a", 3)
+    assert cache.lookup("film:2") == ("b", float("inf"))
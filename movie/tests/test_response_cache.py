@@ -0,0 +1,101 @@
+import asyncio
+
+import orjson
+import pytest
+from db.local_cache import LocalCache
+from repositories.cache import base
+from repositories.cache.coalescing import EarlyRefresh
+from repositories.cache.response_cache import ZSTD_MAGIC, ResponseCacheRepository
+
+BODY = orjson.dumps({"count": 1, "results": [{"uuid": "1", "title": "Star Wars"}]})
+KEY = "films:search:query=star:page=1:size=50"
+
+
+class Renderer:
+    def __init__(self, body: bytes | None = BODY) -> None:
+        self.body = body
+        self.calls = 0
+
+    async def __call__(self) -> bytes | None:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return self.body
+
+
+@pytest.fixture(autouse=True)
+def no_early_refresh(monkeypatch):
+    monkeypatch.setattr(base, "early_refresh", EarlyRefresh(beta=0))
+
+
+@pytest.mark.asyncio
+async def test_hit_returns_rendered_bytes(redis):
+    cache = ResponseCacheRepository(redis, enabled=True)
+    render = Renderer()
+
+    assert await cache.get_or_render(KEY, render) == BODY
+    assert await cache.get_or_render(KEY, render) == BODY
+    assert render.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_body_is_compressed_in_redis_only(redis):
+    local_cache = LocalCache(max_size=10, ttls={}, default_ttl=30)
+    cache = ResponseCacheRepository(
+        redis, local_cache=local_cache, enabled=True, zstd_level=3
+    )
+    body = orjson.dumps({"results": [{"uuid": str(i)} for i in range(100)]})
+
+    await cache.get_or_render(KEY, Renderer(body))
+
+    stored = await redis.get(f"response:{KEY}")
+    assert ZSTD_MAGIC in stored
+    assert len(stored) < len(body)
+    assert local_cache.get(f"response:{KEY}") == body
+
+    local_cache.clear()
+    assert await cache.get_or_render(KEY, Renderer()) == body
+
+
+@pytest.mark.asyncio
+async def test_uncompressed_legacy_body_is_read(redis):
+    await redis.set(f"response:{KEY}", BODY, ex=60)
+    cache = ResponseCacheRepository(redis, enabled=True, zstd_level=3)
+    render = Renderer()
+
+    assert await cache.get_or_render(KEY, render) == BODY
+    assert render.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_soft_expired_body_is_served_while_refreshing(redis):
+    cache = ResponseCacheRepository(redis, enabled=True, list_stale_ttl=60)
+    await cache.get_or_render(KEY, Renderer(), ttl=-1)
+    fresh = orjson.dumps({"count": 0, "results": []})
+    render = Renderer(fresh)
+
+    assert await cache.get_or_render(KEY, render) == BODY
+    await asyncio.sleep(0.05)
+    assert render.calls == 1
+    assert await cache.get_or_render(KEY, render, ttl=60) == fresh
+
+
+@pytest.mark.asyncio
+async def test_missing_entity_is_not_cached(redis):
+    cache = ResponseCacheRepository(redis, enabled=True)
+    render = Renderer(body=None)
+
+    assert await cache.get_or_render("film:1", render) is None
+    assert await cache.get_or_render("film:1", render) is None
+    assert render.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_renders_every_time(redis):
+    cache = ResponseCacheRepository(redis, enabled=False)
+    render = Renderer()
+
+    await cache.get_or_render(KEY, render)
+    await cache.get_or_render(KEY, render)
+
+    assert render.calls == 2
+    assert not redis.data
@@ -17,7 +17,7 @@ CREATE INDEX film_work_creation_date_idx
 	ON content.film_work (creation_date);
 
 CREATE INDEX idx_film_work_updated_at
-ON content.film_work (updated_at);
+ON content.film_work (updated_at, id);
 
 CREATE TABLE IF NOT EXISTS content.genre (
 	id uuid PRIMARY KEY,
@@ -28,7 +28,7 @@ CREATE TABLE IF NOT EXISTS content.genre (
 );
 
 CREATE INDEX idx_genre_updated_at
-ON content.genre (updated_at);
+ON content.genre (updated_at, id);
 
 CREATE TABLE IF NOT EXISTS content.person (
 	id uuid PRIMARY KEY,
@@ -38,7 +38,7 @@ CREATE TABLE IF NOT EXISTS content.person (
 );
 
 CREATE INDEX idx_person_updated_at
-ON content.person (updated_at);
+ON content.person (updated_at, id);
 
 CREATE TABLE IF NOT EXISTS content.genre_film_work (
 	id uuid PRIMARY KEY,
@@ -64,6 +64,9 @@ ON content.genre_film_work (film_work_id);
 CREATE INDEX idx_genre_film_work_genre_id
 ON content.genre_film_work (genre_id);
 
+CREATE INDEX idx_genre_film_work_updated_at
+ON content.genre_film_work (updated_at, id);
+
 CREATE TABLE content.person_film_work (
 	id uuid PRIMARY KEY,
 	person_id uuid NOT NULL,
@@ -86,6 +89,9 @@ CREATE TABLE content.person_film_work (
 CREATE INDEX idx_person_film_work_film_work_id
 ON content.person_film_work (film_work_id);
 
+CREATE INDEX idx_person_film_work_updated_at
+ON content.person_film_work (updated_at, id);
+
 
 COPY content.film_work (id, title, description, creation_date, rating, type, created_at, updated_at) FROM stdin;
 3d825f60-9fff-4dfe-b294-1a45fa1e115d	Star Wars: Episode IV - A New Hope	The Imperial Forces, under orders from cruel Darth Vader, hold Princess Leia hostage in their efforts to quell the rebellion against the Galactic Empire. Luke Skywalker and Han Solo, captain of the Millennium Falcon, work together with the companionable droid duo R2-D2 and C-3PO to rescue the beautiful princess, help the Rebel Alliance and restore freedom and justice to the Galaxy.	\N	8.6	movie	2021-06-16 20:14:09.221838	2021-06-16 20:14:09.221855
@@ -13326,3 +13332,55 @@ c789099a-d49f-4895-b250-bc8064094073	7f09d631-5423-4b0e-b4ee-687717be6774	17bc0c
 f67bbd77-67a4-4872-a343-40b97497c006	0f5df313-bfe5-450b-942c-3844214b7c41	2dd036a4-f5d0-4e81-8073-a36da2a684b7	actor	2021-06-16 20:14:09.934673
 73d0f092-06ed-48d5-bb02-8da8933fbfe2	97568425-6959-4b86-b81d-d3198eabfdac	83af8d01-580a-462e-8c96-2171385935cc	writer	2021-06-16 20:14:09.93471
 \.
+
+
+CREATE OR REPLACE FUNCTION content.notify_content_change()
+RETURNS trigger AS $$
+DECLARE
+    changed_row jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_row := to_jsonb(OLD);
+    ELSE
+        changed_row := to_jsonb(NEW);
+    END IF;
+    PERFORM pg_notify(
+        'content_changes',
+        TG_ARGV[0] || ':' || (changed_row ->> TG_ARGV[1])
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- удалённую строку ETL не находит в базе и удаляет её документ из индекса
+CREATE TRIGGER film_work_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON content.film_work
+FOR EACH ROW EXECUTE FUNCTION content.notify_content_change('film_work', 'id');
+
+CREATE TRIGGER genre_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON content.genre
+FOR EACH ROW EXECUTE FUNCTION content.notify_content_change('genre', 'id');
+
+CREATE TRIGGER person_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON content.person
+FOR EACH ROW EXECUTE FUNCTION content.notify_content_change('person', 'id');
+
+CREATE TRIGGER genre_film_work_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON content.genre_film_work
+FOR EACH ROW EXECUTE FUNCTION content.notify_content_change(
+    'film_work', 'film_work_id'
+);
+
+CREATE TRIGGER person_film_work_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON content.person_film_work
+FOR EACH ROW EXECUTE FUNCTION content.notify_content_change(
+    'film_work', 'film_work_id'
+);
+
+-- связь меняет только список фильмов персоны: 'person_films' обновляет
+-- документ персоны, не переиндексируя всю её фильмографию
+CREATE TRIGGER person_film_work_notify_person_change
+AFTER INSERT OR UPDATE OR DELETE ON content.person_film_work
+FOR EACH ROW EXECUTE FUNCTION content.notify_content_change(
+    'person_films', 'person_id'
+);
@@ -59,6 +59,7 @@ def generate_movies():
         film_id: str | None = None,
         rating: float = 8.5,
         genres: list[dict] | None = None,
+        user_rating: float | None = None,
     ) -> list[dict]:
         if genres is None:
             genres = [
@@ -75,6 +76,8 @@ def generate_movies():
             {
                 "id": film_id if film_id is not None else str(uuid.uuid4()),
                 "imdb_rating": rating,
+                "user_rating": user_rating,
+                "user_rating_count": 0 if user_rating is None else 1,
                 "genres": genres,
                 "title": title,
                 "description": "New World",
@@ -165,6 +168,7 @@ def generate_persons():
         count: int = 10,
         person_id: str | None = None,
         name_prefix: str | None = "Person",
+        films: list[dict] | None = None,
     ) -> list[dict]:
         genres = []
 
@@ -173,6 +177,7 @@ def generate_persons():
                 {
                     "id": person_id if person_id else str(uuid.uuid4()),
                     "name": f"{name_prefix} {i}",
+                    "films": films or [],
                 },
             )
 
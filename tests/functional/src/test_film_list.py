@@ -1,3 +1,6 @@
+import base64
+import json
+
 import pytest
 
 from tests.functional.settings import test_settings
@@ -268,6 +271,40 @@ async def test_film_list_sort_rating_desc(
     assert rating == [10, 9, 8, 7, 6]
 
 
+@pytest.mark.asyncio
+async def test_film_list_sort_user_rating_desc(
+    es_write_data,
+    generate_movies,
+    make_bulk,
+    make_get_request,
+):
+    es_data = generate_movies(1, "Unrated")
+    for r in range(1, 6):
+        es_data.extend(generate_movies(1, f"Rated {r}", user_rating=float(r)))
+    bulk = make_bulk(
+        docs=es_data,
+        index="movies",
+    )
+    await es_write_data(
+        index="movies",
+        mapping=MAPPING_MOVIES,
+        data=bulk,
+    )
+
+    query = {
+        "page_number": 1,
+        "page_size": 6,
+        "sort": "-user_rating",
+    }
+    body, status, _ = await make_get_request(BASE_URL, query)
+
+    assert status == 200
+    assert body["count"] == 6
+
+    titles = [film["title"] for film in body["results"]]
+    assert titles == ["Rated 5", "Rated 4", "Rated 3", "Rated 2", "Rated 1", "Unrated"]
+
+
 @pytest.mark.asyncio
 async def test_film_list_filter_by_genre(
     es_write_data,
@@ -403,3 +440,120 @@ async def test_film_list_cache_isolation_pagination(
     body, status, _ = await make_get_request(BASE_URL, query)
     assert status == 200
     assert body["results"] == []
+
+
+@pytest.mark.asyncio
+async def test_film_list_cursor_pagination(
+    es_write_data,
+    generate_movies,
+    make_bulk,
+    make_get_request,
+):
+    es_data = generate_movies(1, "The Star", rating=1.0)
+    for r in range(2, 26):
+        es_data.extend(generate_movies(1, "The Star", rating=float(r)))
+    bulk = make_bulk(
+        docs=es_data,
+        index="movies",
+    )
+    await es_write_data(
+        index="movies",
+        mapping=MAPPING_MOVIES,
+        data=bulk,
+    )
+
+    # пустой курсор — первая страница, дальше next_cursor предыдущего ответа
+    query = {"page_size": 10, "sort": "imdb_rating", "cursor": ""}
+    rating = []
+    pages = 0
+    while True:
+        body, status, _ = await make_get_request(BASE_URL, query)
+        assert status == 200
+        assert body["count"] == 25
+        rating.extend(film["imdb_rating"] for film in body["results"])
+        pages += 1
+        if body["next_cursor"] is None:
+            break
+        query["cursor"] = body["next_cursor"]
+
+    assert pages == 3
+    assert rating == [float(r) for r in range(1, 26)]
+
+
+@pytest.mark.asyncio
+async def test_film_list_cursor_invalid(
+    es_write_data,
+    generate_movies,
+    make_bulk,
+    make_get_request,
+):
+    es_data = generate_movies(20, "The Star")
+    bulk = make_bulk(
+        docs=es_data,
+        index="movies",
+    )
+    await es_write_data(
+        index="movies",
+        mapping=MAPPING_MOVIES,
+        data=bulk,
+    )
+
+    body, status, _ = await make_get_request(BASE_URL, {"cursor": "", "page_size": 5})
+    assert status == 200
+
+    # курсор выдан для другой сортировки
+    query = {"cursor": body["next_cursor"], "sort": "-imdb_rating"}
+    _, status, _ = await make_get_request(BASE_URL, query)
+    assert status == 422
+
+    _, status, _ = await make_get_request(BASE_URL, {"cursor": "not-a-cursor"})
+    assert status == 422
+
+
+@pytest.mark.asyncio
+async def test_film_list_cursor_pagination_with_pit(
+    es_write_data,
+    generate_movies,
+    make_get_request,
+    make_bulk,
+    es_client,
+):
+    # равные рейтинги: порядок внутри страницы задают id и _shard_doc
+    es_data = generate_movies(35, "The Star", rating=5.0)
+    bulk = make_bulk(
+        docs=es_data,
+        index="movies",
+    )
+    await es_write_data(
+        index="movies",
+        mapping=MAPPING_MOVIES,
+        data=bulk,
+    )
+
+    query = {"page_size": 10, "sort": "imdb_rating", "cursor": ""}
+    ids = []
+    pages = 0
+    while True:
+        body, status, _ = await make_get_request(BASE_URL, query)
+        assert status == 200
+        ids.extend(film["uuid"] for film in body["results"])
+        pages += 1
+        if body["next_cursor"] is None:
+            break
+        cursor = body["next_cursor"]
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        assert json.loads(raw).get("p"), "cursor pages must be read from a PIT"
+        query["cursor"] = cursor
+        if pages == 1:
+            # документы, добавленные после первой страницы, снимок не видит
+            late = generate_movies(1, "Late", rating=9.0)[0]
+            await es_client.index(
+                index="movies",
+                id=late["id"],
+                document=late,
+                refresh=True,
+            )
+
+    assert pages == 4
+    assert len(ids) == 35
+    assert sorted(ids) == sorted(doc["id"] for doc in es_data)
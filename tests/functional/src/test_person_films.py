@@ -18,13 +18,6 @@ async def test_persons_film_success(
 ):
     person_id = str(uuid.uuid4())
 
-    # Создаём person
-    persons = generate_persons(
-        count=1,
-        person_id=person_id,
-        name_prefix="Test Person",
-    )
-
     # Создаём фильмы с этим person
     movies = generate_movies_with_person(
         person_id=person_id,
@@ -32,6 +25,14 @@ async def test_persons_film_success(
         role=role,
     )
 
+    # Создаём person с его фильмами
+    persons = generate_persons(
+        count=1,
+        person_id=person_id,
+        name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": [role]} for movie in movies],
+    )
+
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
@@ -165,13 +166,6 @@ async def test_persons_film_pagination(
 ):
     person_id = str(uuid.uuid4())
 
-    # Создаём person
-    persons = generate_persons(
-        count=1,
-        person_id=person_id,
-        name_prefix="Test Person",
-    )
-
     # Создаём фильмы с этим person
     movies = generate_movies_with_person(
         person_id=person_id,
@@ -179,6 +173,14 @@ async def test_persons_film_pagination(
         role="actor",
     )
 
+    # Создаём person с его фильмами
+    persons = generate_persons(
+        count=1,
+        person_id=person_id,
+        name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": ["actor"]} for movie in movies],
+    )
+
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
@@ -218,13 +220,6 @@ async def test_persons_film_default_pagination(
 ):
     person_id = str(uuid.uuid4())
 
-    # Создаём person
-    persons = generate_persons(
-        count=1,
-        person_id=person_id,
-        name_prefix="Test Person",
-    )
-
     # Создаём фильмы с этим person
     movies = generate_movies_with_person(
         person_id=person_id,
@@ -232,6 +227,14 @@ async def test_persons_film_default_pagination(
         role="actor",
     )
 
+    # Создаём person с его фильмами
+    persons = generate_persons(
+        count=1,
+        person_id=person_id,
+        name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": ["actor"]} for movie in movies],
+    )
+
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
@@ -309,13 +312,6 @@ async def test_persons_film_invalid_pagination(
 ):
     person_id = str(uuid.uuid4())
 
-    # Создаём person
-    persons = generate_persons(
-        count=1,
-        person_id=person_id,
-        name_prefix="Test Person",
-    )
-
     # Создаём фильмы с этим person
     movies = generate_movies_with_person(
         person_id=person_id,
@@ -323,6 +319,14 @@ async def test_persons_film_invalid_pagination(
         role="actor",
     )
 
+    # Создаём person с его фильмами
+    persons = generate_persons(
+        count=1,
+        person_id=person_id,
+        name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": ["actor"]} for movie in movies],
+    )
+
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
@@ -359,13 +363,6 @@ async def test_persons_film_cache_works(
 ):
     person_id = str(uuid.uuid4())
 
-    # Создаём person
-    persons = generate_persons(
-        count=1,
-        person_id=person_id,
-        name_prefix="Test Person",
-    )
-
     # Создаём фильмы с этим person
     movies = generate_movies_with_person(
         person_id=person_id,
@@ -373,6 +370,14 @@ async def test_persons_film_cache_works(
         role="actor",
     )
 
+    # Создаём person с его фильмами
+    persons = generate_persons(
+        count=1,
+        person_id=person_id,
+        name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": ["actor"]} for movie in movies],
+    )
+
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
@@ -423,13 +428,6 @@ async def test_persons_film_cache_cleared(
 ):
     person_id = str(uuid.uuid4())
 
-    # Создаём person
-    persons = generate_persons(
-        count=1,
-        person_id=person_id,
-        name_prefix="Test Person",
-    )
-
     # Создаём фильмы с этим person
     movies = generate_movies_with_person(
         person_id=person_id,
@@ -437,6 +435,14 @@ async def test_persons_film_cache_cleared(
         role="actor",
     )
 
+    # Создаём person с его фильмами
+    persons = generate_persons(
+        count=1,
+        person_id=person_id,
+        name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": ["actor"]} for movie in movies],
+    )
+
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
@@ -488,13 +494,6 @@ async def test_persons_film_cache_isolation_by_pagination(
 ):
     person_id = str(uuid.uuid4())
 
-    # Создаём person
-    persons = generate_persons(
-        count=1,
-        person_id=person_id,
-        name_prefix="Test Person",
-    )
-
     # Создаём фильмы с этим person
     movies = generate_movies_with_person(
         person_id=person_id,
@@ -502,6 +501,14 @@ async def test_persons_film_cache_isolation_by_pagination(
         role="actor",
     )
 
+    # Создаём person с его фильмами
+    persons = generate_persons(
+        count=1,
+        person_id=person_id,
+        name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": ["actor"]} for movie in movies],
+    )
+
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
@@ -562,11 +569,19 @@ async def test_persons_film_cache_isolation_by_person(
     person_id = str(uuid.uuid4())
     person_id2 = str(uuid.uuid4())
 
-    # Создаём person
+    # Создаём фильмы с этим person
+    movies = generate_movies_with_person(
+        person_id=person_id,
+        count=5,
+        role="actor",
+    )
+
+    # Создаём person с его фильмами
     persons = generate_persons(
         count=1,
         person_id=person_id,
         name_prefix="Test Person",
+        films=[{"id": movie["id"], "roles": ["actor"]} for movie in movies],
     )
 
     persons.extend(
@@ -577,13 +592,6 @@ async def test_persons_film_cache_isolation_by_person(
         ),
     )
 
-    # Создаём фильмы с этим person
-    movies = generate_movies_with_person(
-        person_id=person_id,
-        count=5,
-        role="actor",
-    )
-
     persons_bulk = make_bulk(docs=persons, index="persons")
     movies_bulk = make_bulk(docs=movies, index="movies")
 
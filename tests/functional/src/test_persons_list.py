@@ -454,3 +454,39 @@ async def test_persons_list_es_down_initially(
     assert status == 200
     assert body["count"] == 0
     assert body["results"] == []
+
+
+@pytest.mark.asyncio
+async def test_persons_list_cursor_pagination(
+    generate_persons,
+    make_bulk,
+    es_write_data,
+    make_get_request,
+):
+    es_data = generate_persons(
+        count=25,
+        name_prefix="Test Actor",
+    )
+    bulk = make_bulk(
+        docs=es_data,
+        index="persons",
+    )
+    await es_write_data(
+        index="persons",
+        mapping=MAPPING_PERSONS,
+        data=bulk,
+    )
+
+    query = {"page_size": 10, "cursor": ""}
+    seen = []
+    while True:
+        body, status, _ = await make_get_request(BASE_URL, query)
+        assert status == 200
+        assert body["count"] == 25
+        seen.extend(person["uuid"] for person in body["results"])
+        if body["next_cursor"] is None:
+            break
+        query["cursor"] = body["next_cursor"]
+
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
@@ -3,6 +3,8 @@ MAPPING_MOVIES = {
         "properties": {
             "id": {"type": "keyword"},
             "imdb_rating": {"type": "float"},
+            "user_rating": {"type": "float"},
+            "user_rating_count": {"type": "integer"},
             "title": {"type": "text"},
             "description": {"type": "text"},
             "genres": {
@@ -74,6 +76,13 @@ MAPPING_PERSONS = {
                     },
                 },
             },
+            "films": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "roles": {"type": "keyword"},
+                },
+            },
         },
     },
 }
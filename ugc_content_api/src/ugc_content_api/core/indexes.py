@@ -1,5 +1,7 @@
 from pymongo.asynchronous.database import AsyncDatabase
 
+RATING_DELETIONS_TTL = 60 * 60 * 24 * 7  # неделя
+
 
 async def create_indexes(db: AsyncDatabase) -> None:
     await db.movie_ratings.create_index(
@@ -8,6 +10,13 @@ async def create_indexes(db: AsyncDatabase) -> None:
     )
     await db.movie_ratings.create_index([("movie_id", 1), ("score", 1)])
     await db.movie_ratings.create_index([("user_id", 1)])
+    await db.movie_ratings.create_index([("updated_at", 1), ("_id", 1)])
+    await db.movie_rating_deletions.create_index([("updated_at", 1), ("_id", 1)])
+    # записи об удалениях нужны ETL, пока он их не прочитал
+    await db.movie_rating_deletions.create_index(
+        [("updated_at", 1)],
+        expireAfterSeconds=RATING_DELETIONS_TTL,
+    )
 
     await db.reviews.create_index(
         [("movie_id", 1), ("user_id", 1)],
@@ -91,9 +91,18 @@ class MovieRatingRepo(IMovieRatingRepo):
         user_id: uuid.UUID,
         movie_id: uuid.UUID,
     ) -> None:
-        await self.db.movie_ratings.delete_one(
+        result = await self.db.movie_ratings.delete_one(
             {"movie_id": str(movie_id), "user_id": str(user_id)},
         )
+        if result.deleted_count:
+            # ETL находит удаления по этой записи и пересчитывает рейтинг
+            # фильма в поиске; сама оценка следа не оставляет
+            await self.db.movie_rating_deletions.insert_one(
+                {
+                    "movie_id": str(movie_id),
+                    "updated_at": datetime.datetime.now(datetime.timezone.utc),
+                },
+            )
 
     @staticmethod
     def _map_rating(document: dict) -> MovieRating: